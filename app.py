@@ -1,8 +1,13 @@
 import streamlit as st
 
 from backend.bootstrap import bootstrap_db_from_csv
+from backend.services import ensure_schema
+from backend.tracing import begin_trace, end_trace, render_trace_panel
+
+begin_trace("app")
 
 bootstrap_db_from_csv()
+ensure_schema()
 
 st.set_page_config(
     page_title="Beer Tracker 9000",
@@ -23,3 +28,6 @@ st.markdown(
 
     """
 )
+
+end_trace()
+render_trace_panel()
@@ -1,52 +1,183 @@
 import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Optional
+
 import pandas as pd
 
-from backend.db import SQLiteStore
-from backend.models import DrinkEvent
+from backend.db import SQLiteStore, EVENT_COLUMNS, frame_rows
+from backend.frames import parse_timestamps
+from backend.snapshot import SNAPSHOT_PATH, iter_snapshot_batches, snapshot_exists
+from backend.tracing import traced
 
 
 DB_PATH = "data/beer_tracker.db"
 CSV_PATH = "data/beer_events.csv"
 
+# Rows parsed and inserted per batch; bounds memory on large backups.
+CHUNK_SIZE = 50_000
 
-def bootstrap_db_from_csv():
+_TEXT_COLUMNS = ["beer_type", "bar_name", "city", "state", "country"]
+_FLOAT_COLUMNS = ["latitude", "longitude"]
+
+ProgressCallback = Callable[["ImportStats"], None]
+
+
+@dataclass
+class ImportStats:
+    rows_read: int = 0
+    rows_written: int = 0
+    rows_skipped: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_written / self.seconds if self.seconds > 0 else 0.0
+
+
+def _prepare_chunk(df: pd.DataFrame) -> pd.DataFrame:
     """
-    If SQLite DB is missing but CSV backup exists,
-    rebuild the DB by replaying events.
+    Vectorized clean-up of one CSV chunk.
 
     Backwards compatible:
     - If CSV does not contain 'country', defaults to 'United States'
+    - Missing optional columns are treated as empty
+    Rows with an unparseable timestamp or beer_count are dropped.
     """
-    if os.path.exists(DB_PATH):
-        return
+    # Any ISO 8601 shape, mixed within a chunk; only non-timestamps skip.
+    df["timestamp_utc"] = parse_timestamps(df["timestamp_utc"])
+    df["beer_count"] = pd.to_numeric(df["beer_count"], errors="coerce")
+    df = df.dropna(subset=["timestamp_utc", "beer_count"])
 
-    if not os.path.exists(CSV_PATH):
-        return
+    if "country" not in df.columns:
+        df["country"] = "United States"
+    df["country"] = df["country"].fillna("United States")
 
-    store = SQLiteStore()
+    for col in _TEXT_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    for col in _FLOAT_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce") if col in df.columns else float("nan")
 
-    df = pd.read_csv(CSV_PATH)
+    df["event_id"] = df["event_id"].astype(str)
+    df["user_name"] = df["user_name"].astype(str)
+    df["beer_count"] = df["beer_count"].astype("int64")
 
-    if "country" not in df.columns:
-        df["country"] = "United States"
+    return df[EVENT_COLUMNS]
+
+
+def iter_csv_chunks(csv_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[int, pd.DataFrame]]:
+    """
+    Yield (rows_read, cleaned_chunk) pairs from a CSV backup.
+    """
+    for raw in pd.read_csv(csv_path, chunksize=chunk_size):
+        yield len(raw), _prepare_chunk(raw)
+
+
+def _as_records(df: pd.DataFrame) -> pd.DataFrame:
+    # DB drivers want None, not NaN, for missing values.
+    return df.astype(object).where(df.notna(), None)
+
+
+def _import_chunks(
+    chunks: Iterable[tuple[int, pd.DataFrame]],
+    target: str,
+    store: Optional[SQLiteStore],
+    progress: Optional[ProgressCallback],
+) -> ImportStats:
+    """
+    Bulk-load (rows_read, cleaned_chunk) pairs inside a single transaction.
+    """
+    stats = ImportStats()
+    started = time.perf_counter()
+
+    def batches(to_batch: Callable[[pd.DataFrame], list]):
+        for rows_read, chunk in chunks:
+            stats.rows_read += rows_read
+            stats.rows_skipped += rows_read - len(chunk)
+            yield to_batch(chunk)
+            stats.rows_written += len(chunk)
+            stats.seconds = time.perf_counter() - started
+            if progress is not None:
+                progress(stats)
+
+    if target == "sqlite":
+        store = store or SQLiteStore()
+
+        store.insert_batches(batches(frame_rows))
+
+    elif target == "postgres":
+        # Imported lazily: the hosted DB settings are only needed here.
+        from backend.services import bulk_insert_events
+
+        def to_dicts(chunk: pd.DataFrame) -> list:
+            chunk = chunk.drop(columns=["event_id"])
+            return _as_records(chunk).to_dict("records")
+
+        bulk_insert_events(batches(to_dicts))
+
+    else:
+        raise ValueError(f"Unknown import target: {target!r}")
+
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def import_csv(
+    csv_path: str = CSV_PATH,
+    target: str = "sqlite",
+    store: Optional[SQLiteStore] = None,
+    chunk_size: int = CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+) -> ImportStats:
+    """
+    Bulk-load a CSV backup in chunks, inside a single transaction.
+
+    target="sqlite" writes to `store` (default SQLiteStore()).
+    target="postgres" writes to the hosted beer_events table; event ids
+    are reassigned by the database there.
+    `progress` is called after every chunk with the running ImportStats.
+    """
+    return _import_chunks(iter_csv_chunks(csv_path, chunk_size), target, store, progress)
+
+
+def iter_snapshot_chunks(
+    snapshot_path: str = SNAPSHOT_PATH,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[tuple[int, pd.DataFrame]]:
+    """
+    Yield (rows_read, chunk) pairs from a Parquet snapshot. Columns are
+    already typed, so nothing is parsed or dropped.
+    """
+    for chunk in iter_snapshot_batches(snapshot_path, chunk_size):
+        yield len(chunk), chunk[EVENT_COLUMNS]
+
+
+def import_snapshot(
+    snapshot_path: str = SNAPSHOT_PATH,
+    target: str = "sqlite",
+    store: Optional[SQLiteStore] = None,
+    chunk_size: int = CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+) -> ImportStats:
+    """
+    Bulk-load a Parquet snapshot (see backend.snapshot). Same targets and
+    progress reporting as import_csv.
+    """
+    return _import_chunks(iter_snapshot_chunks(snapshot_path, chunk_size), target, store, progress)
+
+
+@traced()
+def bootstrap_db_from_csv():
+    """
+    If SQLite DB is missing but a backup exists, rebuild the DB by
+    bulk-loading it. A Parquet snapshot is preferred; the CSV backup is
+    the fallback.
+    """
+    if os.path.exists(DB_PATH):
+        return
 
-    for _, row in df.iterrows():
-        timestamp = pd.to_datetime(row["timestamp_utc"], utc=True, errors="coerce")
-        if pd.isna(timestamp):
-            continue
-
-        event = DrinkEvent(
-            event_id=str(row["event_id"]),
-            timestamp_utc=timestamp.to_pydatetime(),
-            user_name=str(row["user_name"]),
-            beer_count=int(row["beer_count"]),
-            beer_type=(row["beer_type"] if "beer_type" in df.columns and pd.notna(row["beer_type"]) else None),
-            bar_name=(row["bar_name"] if "bar_name" in df.columns and pd.notna(row["bar_name"]) else None),
-            city=(row["city"] if "city" in df.columns and pd.notna(row["city"]) else None),
-            state=(row["state"] if "state" in df.columns and pd.notna(row["state"]) else None),
-            country=(row["country"] if pd.notna(row["country"]) else "United States"),
-            latitude=(float(row["latitude"]) if "latitude" in df.columns and pd.notna(row["latitude"]) else None),
-            longitude=(float(row["longitude"]) if "longitude" in df.columns and pd.notna(row["longitude"]) else None),
-        )
-
-        store.insert_event(event)
+    if snapshot_exists(SNAPSHOT_PATH):
+        import_snapshot(SNAPSHOT_PATH, target="sqlite")
+    elif os.path.exists(CSV_PATH):
+        import_csv(CSV_PATH, target="sqlite")
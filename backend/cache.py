@@ -0,0 +1,160 @@
+"""
+In-process result cache keyed by data version.
+
+Every entry remembers the data version it was computed for. A lookup
+with any other version is a miss and the entry is replaced, so a write
+that bumps the version invalidates exactly the results that depended on
+it and nothing else. Entries are also evicted least-recently-used past
+CACHE_MAX_ENTRIES and expire after CACHE_TTL seconds.
+
+Keys are tuples whose first element is a namespace ("stats.compute_stats",
+"services.get_all_events", ...); metrics are kept per namespace.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import os
+import threading
+import time
+
+
+CACHE_MAX_ENTRIES = int(os.environ.get("BEER_TRACKER_CACHE_SIZE", "256"))
+CACHE_TTL = float(os.environ.get("BEER_TRACKER_CACHE_TTL", "600"))
+
+_MISSING = object()
+
+
+@dataclass
+class CacheMetrics:
+    hits: int = 0
+    misses: int = 0
+    # Misses that found an entry for another data version, or a too old one.
+    stale: int = 0
+    expired: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return round(self.hits / lookups, 3) if lookups else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "hit_rate": self.hit_rate}
+
+
+@dataclass
+class _Entry:
+    version: Hashable
+    value: Any
+    expires_at: float
+
+
+class VersionedCache:
+    """
+    LRU + TTL cache whose entries are only valid for one data version.
+    """
+
+    def __init__(self, maxsize: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._metrics: Dict[str, CacheMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _metrics_for(self, key: Tuple) -> CacheMetrics:
+        namespace = str(key[0])
+        metrics = self._metrics.get(namespace)
+        if metrics is None:
+            metrics = self._metrics[namespace] = CacheMetrics()
+        return metrics
+
+    def _lookup(self, key: Tuple, version: Hashable) -> Any:
+        with self._lock:
+            metrics = self._metrics_for(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                metrics.misses += 1
+                return _MISSING
+            if entry.version != version:
+                metrics.misses += 1
+                metrics.stale += 1
+                del self._entries[key]
+                return _MISSING
+            if entry.expires_at <= time.monotonic():
+                metrics.misses += 1
+                metrics.expired += 1
+                del self._entries[key]
+                return _MISSING
+            metrics.hits += 1
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def put(self, key: Tuple, version: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = _Entry(version, value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self._metrics_for(evicted).evictions += 1
+
+    def get_or_compute(
+        self,
+        key: Tuple,
+        version: Hashable,
+        compute: Callable[[], Any],
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """
+        Cached value for (key, version), computing and storing it on a
+        miss. compute() runs outside the lock; concurrent misses on the
+        same key may both compute, and the last one is kept.
+        """
+        value = self._lookup(key, version)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, version, value, ttl=ttl)
+        return value
+
+    def invalidate(self, namespace: Optional[str] = None) -> int:
+        """
+        Drop every entry, or only those in `namespace`. Returns the count.
+        """
+        with self._lock:
+            if namespace is None:
+                keys = list(self._entries)
+            else:
+                keys = [key for key in self._entries if key[0] == namespace]
+            for key in keys:
+                del self._entries[key]
+                self._metrics_for(key).invalidations += 1
+            return len(keys)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Counters per namespace, plus "total" and the current entry count.
+        """
+        with self._lock:
+            out = {namespace: m.to_dict() for namespace, m in sorted(self._metrics.items())}
+            total = CacheMetrics()
+            for m in self._metrics.values():
+                for name, value in asdict(m).items():
+                    setattr(total, name, getattr(total, name) + value)
+            out["total"] = {**total.to_dict(), "entries": len(self._entries)}
+            return out
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache = VersionedCache()
+
+
+def get_cache() -> VersionedCache:
+    """
+    The process-wide cache shared by backend.services and backend.stats.
+    """
+    return _cache
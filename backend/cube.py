@@ -0,0 +1,206 @@
+"""
+Per-day cumulative beer totals for every leaderboard dimension.
+
+TimeCube bins the events once into (day x value) counts for each
+dimension (person, city, beer type, bar) and keeps the running sum down
+the days, with a leading row of zeros. The totals for any range of days
+are then one subtraction of two prefix rows, so an arbitrary window's
+leaderboard costs O(distinct values) instead of a scan of its events.
+"""
+from __future__ import annotations
+
+from typing import Dict, Hashable, List, Optional, Tuple
+import os
+
+import numpy as np
+import pandas as pd
+
+from backend import stats
+from backend.cache import get_cache
+from backend.stats import (
+    LEADERBOARD_KEYS,
+    Events,
+    EventTimeline,
+    benchmarks_from_total,
+    city_keys,
+    dominance_from_totals,
+    group_codes,
+    rank_rows,
+    top_rows,
+    with_gallons,
+)
+from backend.tracing import traced
+
+
+# Leaderboard name -> key columns, as in backend.stats.
+DIMENSIONS: Dict[str, List[str]] = LEADERBOARD_KEYS
+
+# Largest (days x values) prefix matrix kept for one dimension. Bigger
+# dimensions are grouped from the window's events instead.
+CUBE_MAX_CELLS = int(os.environ.get("BEER_TRACKER_CUBE_MAX_CELLS", "20000000"))
+
+
+def _to_day(value) -> np.datetime64:
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC")
+    return np.datetime64(ts.date(), "D")
+
+
+class _Dimension:
+    __slots__ = ("keys", "values", "prefix")
+
+    def __init__(self, keys: List[str], values: pd.DataFrame, prefix: Optional[np.ndarray]):
+        self.keys = keys
+        self.values = values
+        # (n_days + 1, n_values) running totals, or None when too large.
+        self.prefix = prefix
+
+
+class TimeCube:
+    """
+    Prefix sums of beers per UTC day, overall and per dimension value,
+    built from one events frame. Read-only once built.
+    """
+
+    def __init__(self, events: Events):
+        timeline = events if isinstance(events, EventTimeline) else EventTimeline(events)
+        frame = timeline.frame
+        self._timeline = timeline
+        self._dimensions: Dict[str, _Dimension] = {}
+
+        if frame.empty:
+            self.first_day = self.last_day = _to_day(pd.Timestamp.now(tz="UTC"))
+            self._total = np.zeros(2, dtype="int64")
+            return
+
+        # Rows are sorted by time, so the first and last rows bound the days.
+        day = frame["timestamp_utc"].values.astype("datetime64[D]")
+        self.first_day, self.last_day = day[0], day[-1]
+        offset = (day - self.first_day).astype("int64")
+        n_days = int(offset[-1]) + 1
+        beers = frame["beer_count"].to_numpy(dtype="float64")
+
+        self._total = np.zeros(n_days + 1, dtype="int64")
+        np.cumsum(np.bincount(offset, weights=beers, minlength=n_days), out=self._total[1:])
+
+        for name, keys in DIMENSIONS.items():
+            if name == "city_leaderboard":
+                required = ["city", "country"]
+            else:
+                required = keys
+            if not set(required).issubset(frame.columns):
+                continue
+            source = city_keys(frame) if name == "city_leaderboard" else frame
+            self._dimensions[name] = self._build(source, keys, offset, beers, n_days)
+
+    @staticmethod
+    def _build(
+        frame: pd.DataFrame,
+        keys: List[str],
+        offset: np.ndarray,
+        beers: np.ndarray,
+        n_days: int,
+    ) -> _Dimension:
+        valid, codes, values = group_codes(frame, keys)
+        n_values = len(values)
+        if n_days * n_values > CUBE_MAX_CELLS:
+            return _Dimension(keys, values, None)
+
+        # One bincount over (day, value) cells, then run down the days.
+        # int32 holds any realistic running total of beers.
+        cells = np.bincount(
+            offset[valid] * n_values + codes,
+            weights=beers[valid],
+            minlength=n_days * n_values,
+        ).reshape(n_days, n_values)
+        prefix = np.zeros((n_days + 1, n_values), dtype="int32")
+        np.cumsum(cells, axis=0, out=prefix[1:])
+        return _Dimension(keys, values, prefix)
+
+    # -- windows -------------------------------------------------------
+
+    def _rows(self, start=None, end=None) -> Tuple[int, int]:
+        # Prefix rows bounding the UTC days start..end, both inclusive.
+        n_days = len(self._total) - 1
+        lo = 0 if start is None else int((_to_day(start) - self.first_day).astype("int64"))
+        hi = n_days if end is None else int((_to_day(end) - self.first_day).astype("int64")) + 1
+        lo = min(max(lo, 0), n_days)
+        hi = min(max(hi, lo), n_days)
+        return lo, hi
+
+    def total_beers(self, start=None, end=None) -> int:
+        lo, hi = self._rows(start, end)
+        return int(self._total[hi] - self._total[lo])
+
+    def _window(self, lo: int, hi: int) -> EventTimeline:
+        return self._timeline.between(
+            pd.Timestamp(self.first_day + lo, tz="UTC"),
+            pd.Timestamp(self.first_day + hi, tz="UTC"),
+        )
+
+    def _totals(self, dim: _Dimension, start, end) -> np.ndarray:
+        lo, hi = self._rows(start, end)
+        return (dim.prefix[hi] - dim.prefix[lo]).astype("int64")
+
+    def leaderboard(
+        self, name: str, start=None, end=None, limit: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        The `name` leaderboard (a DIMENSIONS key) over the UTC days
+        start..end, both inclusive and either open-ended, with the same
+        columns and order as the backend.stats function of that name,
+        top `limit` rows only when given. Values with no beers in the
+        window are left out.
+        """
+        dim = self._dimensions.get(name)
+        keys = DIMENSIONS[name]
+        if dim is None:
+            return pd.DataFrame(columns=keys + ["total_beers", "total_gallons"])
+
+        if dim.prefix is None:
+            # Too many values to cube; group the window's rows.
+            return getattr(stats, name)(self._window(*self._rows(start, end)), limit=limit)
+
+        totals = self._totals(dim, start, end)
+        present = np.flatnonzero(totals)
+        df = dim.values.iloc[present].reset_index(drop=True)
+        df["total_beers"] = totals[present]
+        ranked = rank_rows(top_rows(df, limit), keys)
+        return with_gallons(ranked if limit is None else ranked.head(limit))
+
+    def leaderboard_count(self, name: str, start=None, end=None) -> int:
+        """
+        Rows in the full `name` leaderboard over start..end.
+        """
+        dim = self._dimensions.get(name)
+        if dim is None:
+            return 0
+        if dim.prefix is None:
+            return stats.leaderboard_count(self._window(*self._rows(start, end)), name)
+        return int(np.count_nonzero(self._totals(dim, start, end)))
+
+    def fun_benchmarks(self, start=None, end=None) -> Dict[str, float]:
+        return benchmarks_from_total(self.total_beers(start, end))
+
+    def dominance_stats(self, start=None, end=None) -> Dict[str, float]:
+        totals = self.leaderboard("user_leaderboard", start, end)["total_beers"]
+        return dominance_from_totals(
+            top1=totals.iloc[:1].sum(),
+            top3=totals.iloc[:3].sum(),
+            total=totals.sum(),
+        )
+
+
+@traced()
+def time_cube(events: Events, version: Optional[Hashable] = None) -> TimeCube:
+    """
+    TimeCube of `events`, cached per `version` (default: the timeline's)
+    so reruns on unchanged data only pay for the subtractions.
+    """
+    timeline = events if isinstance(events, EventTimeline) else EventTimeline(events)
+    return get_cache().get_or_compute(
+        ("cube.time_cube", timeline.slot),
+        (timeline.version if version is None else version, timeline.window),
+        lambda: TimeCube(timeline),
+    )
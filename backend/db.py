@@ -1,24 +1,142 @@
 import sqlite3
+import threading
+import weakref
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional, Sequence
 import pandas as pd
+from sqlalchemy import create_engine
 
+from backend.frames import compact_events
+from backend.geocode import GEOCODE_CACHE_DDL, GeocodeCache
 from backend.models import DrinkEvent
+from backend.tracing import sqlite_factory
 
 
 DB_PATH = Path("data/beer_tracker.db")
 
+EVENT_COLUMNS = [
+    "event_id",
+    "timestamp_utc",
+    "user_name",
+    "beer_count",
+    "beer_type",
+    "bar_name",
+    "city",
+    "state",
+    "country",
+    "latitude",
+    "longitude",
+]
+
+_INSERT_SQL = (
+    f"INSERT INTO drink_events ({', '.join(EVENT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in EVENT_COLUMNS)})"
+)
+_UPSERT_SQL = _INSERT_SQL.replace("INSERT INTO", "INSERT OR REPLACE INTO", 1)
+
+# How timestamp_utc is stored: ISO 8601 with a fixed UTC offset, so text
+# comparisons and ORDER BY follow time order.
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f+00:00"
+
+
+# Applied to every connection. WAL lets readers run alongside the single
+# writer; NORMAL sync is durable across app crashes in WAL mode.
+_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+]
+
+# Seconds a writer waits on a locked database before raising.
+BUSY_TIMEOUT = 5.0
+
+
+class _ThreadConnection:
+    # Lives only in one thread's threading.local; when the thread ends
+    # the local is cleared, this is collected, and its finalizer closes
+    # the connection.
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+def _release(conn: sqlite3.Connection, connections: set, lock: threading.Lock) -> None:
+    with lock:
+        connections.discard(conn)
+    conn.close()
+
 
 class SQLiteStore:
+    """
+    SQLite-backed event store.
+
+    Each thread gets one long-lived connection, reused for every insert
+    and fetch, so Streamlit sessions reading in parallel never block on
+    each other or on the writer. A thread's connection is closed when the
+    thread finishes.
+    """
+
     def __init__(self, db_path: Path = DB_PATH):
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections: set[sqlite3.Connection] = set()
+        self._connections_lock = threading.Lock()
+        self._geocode_cache: Optional[GeocodeCache] = None
         self._init_db()
 
     def _get_connection(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            # check_same_thread=False only so close() can run from any
+            # thread; each connection is otherwise used by its owner only.
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=BUSY_TIMEOUT,
+                check_same_thread=False,
+                factory=sqlite_factory(),
+            )
+            conn.row_factory = sqlite3.Row
+            for pragma in _PRAGMAS:
+                conn.execute(pragma)
+            holder = self._local.holder = _ThreadConnection(conn)
+            with self._connections_lock:
+                self._connections.add(conn)
+            weakref.finalize(holder, _release, conn, self._connections, self._connections_lock)
+        return holder.conn
+
+    def close(self) -> None:
+        """
+        Close every connection this store has opened, in any thread.
+        """
+        with self._connections_lock:
+            connections = list(self._connections)
+            self._connections.clear()
+            geocode_cache, self._geocode_cache = self._geocode_cache, None
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+        if geocode_cache is not None:
+            geocode_cache.engine.dispose()
+
+    def geocode_cache(self) -> GeocodeCache:
+        """
+        GeocodeCache backed by this store's own geocode_cache table,
+        through a sqlite:/// engine on the same file.
+        """
+        with self._connections_lock:
+            if self._geocode_cache is None:
+                engine = create_engine(
+                    f"sqlite:///{self.db_path}",
+                    connect_args={"timeout": BUSY_TIMEOUT},
+                )
+                self._geocode_cache = GeocodeCache(engine)
+            return self._geocode_cache
 
     def _init_db(self) -> None:
         with self._get_connection() as conn:
@@ -61,41 +179,44 @@ class SQLiteStore:
             except sqlite3.OperationalError:
                 pass
 
-    def insert_event(self, event: DrinkEvent) -> None:
-        with self._get_connection() as conn:
             conn.execute(
-                """
-                INSERT INTO drink_events (
-                    event_id,
-                    timestamp_utc,
-                    user_name,
-                    beer_count,
-                    beer_type,
-                    bar_name,
-                    city,
-                    state,
-                    country,
-                    latitude,
-                    longitude
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    event.event_id,
-                    event.timestamp_utc.isoformat(),
-                    event.user_name,
-                    event.beer_count,
-                    event.beer_type,
-                    event.bar_name,
-                    event.city,
-                    event.state,
-                    event.country,
-                    event.latitude,
-                    event.longitude,
-                ),
+                "CREATE INDEX IF NOT EXISTS idx_drink_events_timestamp "
+                "ON drink_events (timestamp_utc)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_drink_events_user_timestamp "
+                "ON drink_events (user_name, timestamp_utc)"
             )
             conn.commit()
 
+            # Same table as the Postgres backend; see geocode_cache().
+            conn.execute(GEOCODE_CACHE_DDL)
+            conn.commit()
+
+    def insert_batches(self, batches: Iterable[Sequence[tuple]], replace: bool = False) -> int:
+        """
+        Insert rows batch by batch with executemany, all in one transaction.
+        Each row is a tuple in EVENT_COLUMNS order. With replace=True a row
+        whose event_id already exists overwrites it. Returns rows inserted.
+        """
+        sql = _UPSERT_SQL if replace else _INSERT_SQL
+        inserted = 0
+        with self._get_connection() as conn:
+            for batch in batches:
+                conn.executemany(sql, batch)
+                inserted += len(batch)
+        return inserted
+
+    def insert_events(self, events: Iterable[DrinkEvent]) -> int:
+        """
+        Insert many events in one transaction. Returns rows inserted.
+        """
+        return self.insert_batches([[_event_row(event) for event in events]])
+
+    def insert_event(self, event: DrinkEvent) -> None:
+        with self._get_connection() as conn:
+            conn.execute(_INSERT_SQL, _event_row(event))
+
     def fetch_events(
         self,
         start_timestamp_utc: Optional[str] = None,
@@ -114,8 +235,53 @@ class SQLiteStore:
 
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp_utc ASC"
 
         with self._get_connection() as conn:
             df = pd.read_sql_query(query, conn, params=params)
 
-        return df
+        return compact_events(df)
+
+    def query(self, sql: str, params: Optional[dict] = None) -> pd.DataFrame:
+        """
+        Run a read-only query with :named parameters and return a DataFrame.
+        """
+        with self._get_connection() as conn:
+            return pd.read_sql_query(sql, conn, params=params or {})
+
+
+def frame_rows(df: pd.DataFrame) -> list[tuple]:
+    """
+    Rows of an events frame as tuples in EVENT_COLUMNS order, ready for
+    insert_batches: text event ids, formatted timestamps, None for NaN.
+    """
+    df = df[EVENT_COLUMNS].assign(
+        event_id=df["event_id"].astype(str),
+        timestamp_utc=df["timestamp_utc"].dt.strftime(TIMESTAMP_FORMAT),
+    )
+    # sqlite3 wants None, not NaN, for missing values.
+    records = df.astype(object).where(df.notna(), None)
+    return list(records.itertuples(index=False, name=None))
+
+
+def _format_timestamp(ts: datetime) -> str:
+    # Naive datetimes (DrinkEvent.create) are already UTC.
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return ts.strftime(TIMESTAMP_FORMAT)
+
+
+def _event_row(event: DrinkEvent) -> tuple:
+    return (
+        event.event_id,
+        _format_timestamp(event.timestamp_utc),
+        event.user_name,
+        event.beer_count,
+        event.beer_type,
+        event.bar_name,
+        event.city,
+        event.state,
+        event.country,
+        event.latitude,
+        event.longitude,
+    )
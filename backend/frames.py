@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+from typing import Dict
+import logging
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+
+# Low-cardinality text columns: a few dozen users, a dozen beer types and
+# a few hundred places, repeated across every event.
+CATEGORY_COLUMNS = ["user_name", "beer_type", "bar_name", "city", "state", "country"]
+
+COMPACT_DTYPES: Dict[str, str] = {
+    "beer_count": "int16",
+    "latitude": "float32",
+    "longitude": "float32",
+    **{col: "category" for col in CATEGORY_COLUMNS},
+}
+
+# The compact layout with full-precision coordinates, for copies that may
+# be restored into a database (snapshots): float32 moves 40.7128 to
+# 40.71279907.
+LOSSLESS_DTYPES: Dict[str, str] = {
+    **COMPACT_DTYPES,
+    "latitude": "float64",
+    "longitude": "float64",
+}
+
+# What read_sql / read_sql_query hand back without any hints.
+LEGACY_DTYPES: Dict[str, str] = {
+    "beer_count": "int64",
+    "latitude": "float64",
+    "longitude": "float64",
+    **{col: "object" for col in CATEGORY_COLUMNS},
+}
+
+
+# Day 0 for integer day numbers (days since the epoch, UTC).
+EPOCH_DAY = np.datetime64("1970-01-01", "D")
+
+
+# ---------------------------------------------------------------------
+# Typed loading
+# ---------------------------------------------------------------------
+
+def compact_events(df: pd.DataFrame, dtypes: Dict[str, str] = COMPACT_DTYPES) -> pd.DataFrame:
+    """
+    Convert a freshly loaded events frame to the compact layout in place:
+    categoricals for the text dimensions, int16 beer_count, float32
+    coordinates (float64 with dtypes=LOSSLESS_DTYPES) and a tz-aware UTC
+    timestamp_utc.
+    """
+    if "timestamp_utc" in df.columns:
+        df["timestamp_utc"] = parse_timestamps(df["timestamp_utc"])
+
+    for col, dtype in dtypes.items():
+        if col in df.columns and df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+
+    return df
+
+
+def parse_timestamps(values: pd.Series) -> pd.Series:
+    """
+    Stored timestamps to tz-aware UTC. Text may be any ISO 8601 shape
+    (with or without fraction or offset; naive means UTC), mixed within
+    one column. Values that are not ISO 8601 become NaT and are logged,
+    never dropped silently.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return pd.to_datetime(values, utc=True)
+    parsed = pd.to_datetime(values, utc=True, format="ISO8601", errors="coerce")
+    bad = parsed.isna() & values.notna()
+    if bad.any():
+        logger.warning(
+            "%d timestamp_utc values are not ISO 8601 and read as NaT, e.g. %r",
+            int(bad.sum()),
+            values[bad].iloc[0],
+        )
+    return parsed
+
+
+def as_utc(ts) -> pd.Timestamp:
+    """
+    `ts` as a tz-aware UTC Timestamp; naive values are taken as UTC.
+    """
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def concat_events(first: pd.DataFrame, second: pd.DataFrame) -> pd.DataFrame:
+    """
+    Append two compact frames without falling back to object dtype.
+
+    pd.concat only keeps a categorical column when both sides have the
+    exact same categories, so both are aligned to the union first.
+    """
+    if first.empty:
+        return second.reset_index(drop=True)
+    if second.empty:
+        return first
+
+    first = first.copy(deep=False)
+    second = second.copy(deep=False)
+    for col in CATEGORY_COLUMNS:
+        if col not in first.columns or col not in second.columns:
+            continue
+        if isinstance(first[col].dtype, pd.CategoricalDtype) and isinstance(
+            second[col].dtype, pd.CategoricalDtype
+        ):
+            categories = first[col].cat.categories
+            extra = second[col].cat.categories.difference(categories, sort=False)
+            if len(categories) == 0:
+                categories = second[col].cat.categories
+            elif len(extra):
+                categories = categories.append(extra)
+            first[col] = first[col].cat.set_categories(categories)
+            second[col] = second[col].cat.set_categories(categories)
+
+    return pd.concat([first, second], ignore_index=True)
+
+
+# ---------------------------------------------------------------------
+# Memory report
+# ---------------------------------------------------------------------
+
+def memory_report(events: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-column deep memory usage of `events` in the legacy layout
+    (object text, int64, float64) versus the compact layout.
+    The last row holds the totals.
+    """
+    legacy = events.astype(
+        {col: dtype for col, dtype in LEGACY_DTYPES.items() if col in events.columns}
+    )
+    compact = compact_events(events.copy())
+
+    legacy_bytes = legacy.memory_usage(index=False, deep=True)
+    compact_bytes = compact.memory_usage(index=False, deep=True)
+
+    report = pd.DataFrame(
+        {
+            "legacy_dtype": legacy.dtypes.astype(str),
+            "compact_dtype": compact.dtypes.astype(str),
+            "legacy_bytes": legacy_bytes,
+            "compact_bytes": compact_bytes,
+        }
+    )
+    report.loc["TOTAL"] = ["", "", legacy_bytes.sum(), compact_bytes.sum()]
+    report["legacy_bytes"] = report["legacy_bytes"].astype("int64")
+    report["compact_bytes"] = report["compact_bytes"].astype("int64")
+    report["saved_pct"] = (
+        (1 - report["compact_bytes"] / report["legacy_bytes"].where(report["legacy_bytes"] > 0))
+        * 100
+    ).round(1)
+
+    return report
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+Coordinates = Tuple[Optional[float], Optional[float]]
+
+# Found coordinates barely move; "not found" answers are retried sooner
+# in case the lookup was a typo that has since been fixed upstream.
+HIT_TTL_SECONDS = 180 * 24 * 3600
+MISS_TTL_SECONDS = 7 * 24 * 3600
+
+# Portable between Postgres and SQLite. fetched_at is epoch seconds so the
+# TTL check is a plain numeric comparison on both backends.
+GEOCODE_CACHE_DDL = """
+    CREATE TABLE IF NOT EXISTS geocode_cache (
+        city_key TEXT NOT NULL,
+        state_key TEXT NOT NULL,
+        country_key TEXT NOT NULL,
+        latitude DOUBLE PRECISION NULL,
+        longitude DOUBLE PRECISION NULL,
+        found BOOLEAN NOT NULL,
+        fetched_at DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (city_key, state_key, country_key)
+    )
+"""
+
+
+def normalize_location(
+    city: Optional[str],
+    state: Optional[str],
+    country: Optional[str],
+) -> Tuple[str, str, str]:
+    """
+    Cache key for a location: trimmed, whitespace-collapsed, casefolded.
+    A missing state is stored as "".
+    """
+    def _norm(value: Optional[str]) -> str:
+        return " ".join((value or "").split()).casefold()
+
+    return _norm(city), _norm(state), _norm(country)
+
+
+class GeocodeCache:
+    """
+    Persistent (city, state, country) -> coordinates cache.
+
+    Works on any SQLAlchemy engine that has the geocode_cache table: the
+    hosted Postgres or the local SQLite file. Both found and not-found
+    answers are stored, each with its own TTL.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        hit_ttl: float = HIT_TTL_SECONDS,
+        miss_ttl: float = MISS_TTL_SECONDS,
+    ):
+        self.engine = engine
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            "lookups": 0,
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "stores": 0,
+        }
+
+    def ensure_table(self) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text(GEOCODE_CACHE_DDL))
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(
+        self,
+        city: Optional[str],
+        state: Optional[str],
+        country: Optional[str],
+    ) -> Optional[Coordinates]:
+        """
+        Cached coordinates, (None, None) for a cached "not found", or None
+        when there is no fresh entry and the caller must geocode.
+        """
+        city_key, state_key, country_key = normalize_location(city, state, country)
+        self._count("lookups")
+
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text(
+                    """
+                    SELECT latitude, longitude, found, fetched_at
+                    FROM geocode_cache
+                    WHERE city_key = :city_key
+                      AND state_key = :state_key
+                      AND country_key = :country_key
+                    """
+                ),
+                {"city_key": city_key, "state_key": state_key, "country_key": country_key},
+            ).first()
+
+        if row is None:
+            self._count("misses")
+            return None
+
+        ttl = self.hit_ttl if row.found else self.miss_ttl
+        if time.time() - float(row.fetched_at) > ttl:
+            self._count("expired")
+            return None
+
+        if not row.found:
+            self._count("negative_hits")
+            return None, None
+
+        self._count("hits")
+        return float(row.latitude), float(row.longitude)
+
+    def put(
+        self,
+        city: Optional[str],
+        state: Optional[str],
+        country: Optional[str],
+        latitude: Optional[float],
+        longitude: Optional[float],
+    ) -> None:
+        """
+        Store a geocoding answer. Pass (None, None) to record "not found".
+        """
+        self._put_many([(city, state, country, latitude, longitude)], overwrite=True)
+
+    def _put_many(
+        self,
+        rows: Iterable[Tuple[Optional[str], Optional[str], Optional[str], Optional[float], Optional[float]]],
+        overwrite: bool,
+    ) -> int:
+        now = time.time()
+        params = []
+        for city, state, country, latitude, longitude in rows:
+            city_key, state_key, country_key = normalize_location(city, state, country)
+            found = latitude is not None and longitude is not None
+            params.append(
+                {
+                    "city_key": city_key,
+                    "state_key": state_key,
+                    "country_key": country_key,
+                    "latitude": float(latitude) if found else None,
+                    "longitude": float(longitude) if found else None,
+                    "found": found,
+                    "fetched_at": now,
+                }
+            )
+
+        if not params:
+            return 0
+
+        on_conflict = (
+            """
+            DO UPDATE SET
+                latitude = EXCLUDED.latitude,
+                longitude = EXCLUDED.longitude,
+                found = EXCLUDED.found,
+                fetched_at = EXCLUDED.fetched_at
+            """
+            if overwrite
+            else "DO NOTHING"
+        )
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    f"""
+                    INSERT INTO geocode_cache (
+                        city_key, state_key, country_key,
+                        latitude, longitude, found, fetched_at
+                    )
+                    VALUES (
+                        :city_key, :state_key, :country_key,
+                        :latitude, :longitude, :found, :fetched_at
+                    )
+                    ON CONFLICT (city_key, state_key, country_key) {on_conflict}
+                    """
+                ),
+                params,
+            )
+
+        with self._lock:
+            self._counters["stores"] += len(params)
+        return len(params)
+
+    def warm(
+        self,
+        locations: Iterable[Tuple[Optional[str], Optional[str], Optional[str], float, float]],
+    ) -> int:
+        """
+        Seed the cache with already-known coordinates, one per normalized
+        location. Existing entries are left alone. Returns rows offered.
+        """
+        seen: Dict[Tuple[str, str, str], tuple] = {}
+        for city, state, country, latitude, longitude in locations:
+            if not city or latitude is None or longitude is None:
+                continue
+            seen.setdefault(
+                normalize_location(city, state, country),
+                (city, state, country, latitude, longitude),
+            )
+        return self._put_many(seen.values(), overwrite=False)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Counters since process start, plus the hit rate over all lookups
+        (a cached "not found" counts as a hit: it also skips the network).
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        answered = counters["hits"] + counters["negative_hits"]
+        counters["hit_rate"] = round(answered / counters["lookups"], 4) if counters["lookups"] else 0.0
+        return counters
+
+
+# ---------------------------------------------------------------------
+# Background geocoding
+# ---------------------------------------------------------------------
+
+def location_query(city: Optional[str], state: Optional[str], country: Optional[str]) -> str:
+    return ", ".join([p for p in (city, state, country) if p])
+
+
+@dataclass(frozen=True)
+class _Location:
+    latitude: float
+    longitude: float
+
+
+class FakeGeocoder:
+    """
+    Offline stand-in for Nominatim: answers from a {query: (lat, lon)}
+    dict, with the same geocode() signature. Records every query.
+    """
+
+    def __init__(self, known: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.known = {k.casefold(): v for k, v in (known or {}).items()}
+        self.queries: List[str] = []
+
+    def geocode(self, query: str, exactly_one: bool = True, timeout: float = 10):
+        self.queries.append(query)
+        coords = self.known.get(query.casefold())
+        return _Location(*coords) if coords else None
+
+
+@dataclass
+class GeocodeJob:
+    event_ids: Tuple[int, ...]
+    city: str
+    state: Optional[str]
+    country: Optional[str]
+    enqueued_at: float = field(default_factory=time.time)
+    attempts: int = 0
+
+
+class GeocodeWorker:
+    """
+    Resolves event locations on a background thread.
+
+    Jobs are processed one at a time. The cache is checked first; only a
+    cache miss waits for the rate limit and calls the geocoder. Results
+    are handed to `on_resolved(event_ids, lat, lon)`, which writes them.
+    """
+
+    def __init__(
+        self,
+        geocoder,
+        on_resolved: Callable[[Tuple[int, ...], Optional[float], Optional[float]], None],
+        cache: Optional[GeocodeCache] = None,
+        min_interval: float = 1.0,
+        max_attempts: int = 3,
+    ):
+        self.geocoder = geocoder
+        self.on_resolved = on_resolved
+        self.cache = cache
+        self.min_interval = min_interval
+        self.max_attempts = max_attempts
+
+        self._queue: "queue.Queue[Optional[GeocodeJob]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending: Dict[int, float] = {}
+        self._last_network_call = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._counters: Dict[str, float] = {
+            "submitted": 0,
+            "resolved": 0,
+            "not_found": 0,
+            "retried": 0,
+            "failed": 0,
+            "last_lag_seconds": 0.0,
+        }
+
+    # -- lifecycle -----------------------------------------------------
+
+    def start(self) -> "GeocodeWorker":
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="geocode-worker", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def join(self) -> None:
+        """
+        Block until every submitted job has been processed.
+        """
+        self._queue.join()
+
+    # -- producer side -------------------------------------------------
+
+    def submit(
+        self,
+        event_ids: Iterable[int],
+        city: str,
+        state: Optional[str],
+        country: Optional[str],
+    ) -> None:
+        job = GeocodeJob(tuple(int(i) for i in event_ids), city, state, country)
+        with self._lock:
+            self._pending[id(job)] = job.enqueued_at
+            self._counters["submitted"] += 1
+        self._queue.put(job)
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def lag_seconds(self) -> float:
+        """
+        Age of the oldest job still waiting or in progress (0 when idle).
+        """
+        with self._lock:
+            if not self._pending:
+                return 0.0
+            return time.time() - min(self._pending.values())
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self._counters)
+        counters["queue_depth"] = self.queue_depth()
+        counters["lag_seconds"] = round(self.lag_seconds(), 3)
+        return counters
+
+    # -- consumer side -------------------------------------------------
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._process(job)
+            finally:
+                self._queue.task_done()
+
+    def _throttle(self) -> None:
+        wait = self._last_network_call + self.min_interval - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_network_call = time.time()
+
+    def _lookup(self, job: GeocodeJob) -> Coordinates:
+        if self.cache is not None:
+            cached = self.cache.get(job.city, job.state, job.country)
+            if cached is not None:
+                return cached
+
+        self._throttle()
+        location = self.geocoder.geocode(
+            location_query(job.city, job.state, job.country),
+            exactly_one=True,
+            timeout=10,
+        )
+
+        if not location:
+            coords: Coordinates = (None, None)
+        else:
+            coords = (float(location.latitude), float(location.longitude))
+
+        if self.cache is not None:
+            self.cache.put(job.city, job.state, job.country, *coords)
+        return coords
+
+    def _process(self, job: GeocodeJob) -> None:
+        try:
+            lat, lon = self._lookup(job)
+        except Exception:
+            job.attempts += 1
+            if job.attempts < self.max_attempts:
+                with self._lock:
+                    self._counters["retried"] += 1
+                self._queue.put(job)
+                return
+            logger.exception("Giving up geocoding %s", location_query(job.city, job.state, job.country))
+            self._finish(job, "failed")
+            return
+
+        if lat is None or lon is None:
+            self._finish(job, "not_found")
+            return
+
+        try:
+            self.on_resolved(job.event_ids, lat, lon)
+        except Exception:
+            logger.exception("Could not store coordinates for events %s", job.event_ids)
+            self._finish(job, "failed")
+            return
+
+        self._finish(job, "resolved")
+
+    def _finish(self, job: GeocodeJob, outcome: str) -> None:
+        with self._lock:
+            self._pending.pop(id(job), None)
+            self._counters[outcome] += 1
+            self._counters["last_lag_seconds"] = round(time.time() - job.enqueued_at, 3)
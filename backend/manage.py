@@ -0,0 +1,156 @@
+"""
+Maintenance commands.
+
+    python -m backend.manage rebuild-rollups
+    python -m backend.manage memory-report
+    python -m backend.manage warm-geocode-cache
+    python -m backend.manage backfill-coordinates [--limit N]
+    python -m backend.manage import-csv PATH [--target sqlite|postgres]
+    python -m backend.manage snapshot [--path PATH] [--partition-by-month]
+    python -m backend.manage import-snapshot [--path PATH] [--target sqlite|postgres]
+    python -m backend.manage sync-replica [--full]
+"""
+from __future__ import annotations
+
+import argparse
+
+from backend import services
+from backend.bootstrap import CHUNK_SIZE, ImportStats, import_csv, import_snapshot
+from backend.frames import memory_report
+from backend.replica import get_read_replica
+from backend.snapshot import SNAPSHOT_PATH
+
+
+def _rebuild_rollups(args: argparse.Namespace) -> None:
+    rows = services.rebuild_daily_rollups()
+    print(f"Rebuilt the daily rollups: {rows} rows")
+
+
+def _memory_report(args: argparse.Namespace) -> None:
+    print(memory_report(services.get_all_events()).to_string())
+
+
+def _warm_geocode_cache(args: argparse.Namespace) -> None:
+    offered = services.warm_geocode_cache()
+    print(f"Offered {offered} known locations to geocode_cache")
+
+
+def _backfill_coordinates(args: argparse.Namespace) -> None:
+    queued = services.backfill_missing_coordinates(limit=args.limit)
+    print(f"Queued {queued} locations; waiting for the geocoder...")
+    worker = services.get_geocode_worker()
+    worker.join()
+    print(worker.stats())
+
+
+def _report_import(stats: ImportStats) -> None:
+    print(
+        f"{stats.rows_written:>10,} rows  "
+        f"{stats.rows_per_second:>10,.0f} rows/s  "
+        f"({stats.rows_skipped} skipped)"
+    )
+
+
+def _import_csv(args: argparse.Namespace) -> None:
+    stats = import_csv(
+        args.path,
+        target=args.target,
+        chunk_size=args.chunk_size,
+        progress=_report_import,
+    )
+    print(f"Imported {stats.rows_written:,} rows in {stats.seconds:.2f}s")
+
+
+def _snapshot(args: argparse.Namespace) -> None:
+    rows = services.export_events_to_snapshot(args.path, partition_by_month=args.partition_by_month)
+    print(f"Wrote {rows:,} events to {args.path}")
+
+
+def _import_snapshot(args: argparse.Namespace) -> None:
+    stats = import_snapshot(
+        args.path,
+        target=args.target,
+        chunk_size=args.chunk_size,
+        progress=_report_import,
+    )
+    print(f"Imported {stats.rows_written:,} rows in {stats.seconds:.2f}s")
+
+
+def _sync_replica(args: argparse.Namespace) -> None:
+    replica = get_read_replica()
+    result = replica.resync() if args.full else replica.sync()
+    print(
+        f"Pulled {result.rows_pulled:,} rows up to event_id {result.last_event_id} "
+        f"in {result.seconds:.2f}s"
+    )
+    print(replica.freshness())
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser(
+        "rebuild-rollups",
+        help="Regenerate the daily rollup tables from raw events.",
+    )
+    rebuild.set_defaults(func=_rebuild_rollups)
+
+    report = commands.add_parser(
+        "memory-report",
+        help="Compare the compact events frame with the legacy dtype layout.",
+    )
+    report.set_defaults(func=_memory_report)
+
+    warm = commands.add_parser(
+        "warm-geocode-cache",
+        help="Seed the geocode cache from locations already in beer_events.",
+    )
+    warm.set_defaults(func=_warm_geocode_cache)
+
+    backfill = commands.add_parser(
+        "backfill-coordinates",
+        help="Geocode stored events that have no coordinates yet.",
+    )
+    backfill.add_argument("--limit", type=int, default=None, help="Max locations to queue.")
+    backfill.set_defaults(func=_backfill_coordinates)
+
+    imp = commands.add_parser(
+        "import-csv",
+        help="Bulk-load a CSV backup into SQLite or Postgres.",
+    )
+    imp.add_argument("path")
+    imp.add_argument("--target", choices=["sqlite", "postgres"], default="sqlite")
+    imp.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    imp.set_defaults(func=_import_csv)
+
+    snap = commands.add_parser(
+        "snapshot",
+        help="Export beer_events to a compressed Parquet snapshot.",
+    )
+    snap.add_argument("--path", default=SNAPSHOT_PATH)
+    snap.add_argument("--partition-by-month", action="store_true")
+    snap.set_defaults(func=_snapshot)
+
+    imp_snap = commands.add_parser(
+        "import-snapshot",
+        help="Bulk-load a Parquet snapshot into SQLite or Postgres.",
+    )
+    imp_snap.add_argument("--path", default=SNAPSHOT_PATH)
+    imp_snap.add_argument("--target", choices=["sqlite", "postgres"], default="sqlite")
+    imp_snap.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    imp_snap.set_defaults(func=_import_snapshot)
+
+    sync = commands.add_parser(
+        "sync-replica",
+        help="Pull new events from Postgres into the local read replica.",
+    )
+    sync.add_argument("--full", action="store_true", help="Drop the replica and copy everything.")
+    sync.set_defaults(func=_sync_replica)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
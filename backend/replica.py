@@ -0,0 +1,223 @@
+"""
+Local SQLite read replica of the hosted beer_events table.
+
+The replica is a SQLiteStore in its own file: the same drink_events table
+as the local store, so fetch_events, query and backend.sql_stats all work
+on it. Writes keep going to Postgres; sync() pulls new rows by event_id.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+import os
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from backend.db import EVENT_COLUMNS, TIMESTAMP_FORMAT, SQLiteStore, frame_rows
+from backend.frames import as_utc
+
+
+REPLICA_PATH = Path("data/beer_events_replica.db")
+
+# Seconds a replica may go without syncing before sync_if_stale() pulls.
+REPLICA_MAX_AGE = float(os.environ.get("BEER_TRACKER_REPLICA_MAX_AGE", "30"))
+
+# Rows fetched from upstream per round trip.
+SYNC_BATCH_SIZE = 10_000
+
+# The newest rows are re-pulled on every sync. That catches ids that
+# became visible after the watermark passed them (slow commits) and
+# coordinates the geocode worker filled in after the row was copied.
+# Older changes, such as a coordinate backfill, need resync().
+REFRESH_TAIL = 1_000
+
+
+@dataclass
+class SyncResult:
+    rows_pulled: int
+    last_event_id: int
+    seconds: float
+
+
+class ReadReplica(SQLiteStore):
+    """
+    SQLite copy of beer_events, kept current by incremental pulls.
+
+    `upstream` is any SQLAlchemy engine with a beer_events table; by
+    default the hosted Postgres from backend.services.
+    """
+
+    def __init__(
+        self,
+        upstream: Optional[Engine] = None,
+        db_path: Path = REPLICA_PATH,
+        max_age: float = REPLICA_MAX_AGE,
+    ):
+        self._upstream = upstream
+        self.max_age = max_age
+        self._sync_lock = threading.Lock()
+        super().__init__(db_path)
+
+    def _init_db(self) -> None:
+        super()._init_db()
+        with self._get_connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS replica_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+                """
+            )
+
+    @property
+    def upstream(self) -> Engine:
+        if self._upstream is None:
+            # Imported lazily: the hosted DB settings are only needed here.
+            from backend import services
+
+            services.ensure_schema()
+            self._upstream = services.get_engine()
+        return self._upstream
+
+    # -- state ---------------------------------------------------------
+
+    def _state(self) -> Dict[str, str]:
+        rows = self._get_connection().execute("SELECT key, value FROM replica_state")
+        return {row["key"]: row["value"] for row in rows}
+
+    def _save_state(self, conn, **values) -> None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO replica_state (key, value) VALUES (?, ?)",
+            [(key, str(value)) for key, value in values.items()],
+        )
+
+    def freshness(self) -> Dict[str, Optional[float]]:
+        """
+        last_event_id copied, row count, when the last sync finished
+        (epoch seconds) and how long ago that was. Both are None before
+        the first sync.
+        """
+        state = self._state()
+        synced_at = float(state["synced_at"]) if "synced_at" in state else None
+        rows = self._get_connection().execute("SELECT COUNT(*) FROM drink_events").fetchone()[0]
+        return {
+            "last_event_id": int(state.get("last_event_id", 0)),
+            "rows": int(rows),
+            "synced_at": synced_at,
+            "age_seconds": None if synced_at is None else round(time.time() - synced_at, 3),
+        }
+
+    def is_stale(self) -> bool:
+        age = self.freshness()["age_seconds"]
+        return age is None or age > self.max_age
+
+    # -- sync ----------------------------------------------------------
+
+    def _pull(self, after_id: int, batch_size: int) -> Iterator[pd.DataFrame]:
+        # Keyset pagination on the primary key: each round trip is an
+        # index range scan, however large the table.
+        query = text(
+            f"""
+            SELECT {', '.join(EVENT_COLUMNS)}
+            FROM beer_events
+            WHERE event_id > :after_id
+            ORDER BY event_id ASC
+            LIMIT :limit
+            """
+        )
+        while True:
+            with self.upstream.connect() as conn:
+                df = pd.read_sql(
+                    query,
+                    conn,
+                    params={"after_id": int(after_id), "limit": int(batch_size)},
+                )
+            if df.empty:
+                return
+            df["timestamp_utc"] = pd.to_datetime(df["timestamp_utc"], utc=True)
+            yield df
+            if len(df) < batch_size:
+                return
+            after_id = int(df["event_id"].iloc[-1])
+
+    def _sync(self, batch_size: int, reset: bool) -> SyncResult:
+        with self._sync_lock:
+            started = time.perf_counter()
+            last_id = 0 if reset else int(self._state().get("last_event_id", 0))
+            pulled = 0
+
+            def batches() -> Iterator[list]:
+                nonlocal last_id, pulled
+                for df in self._pull(max(0, last_id - REFRESH_TAIL), batch_size):
+                    last_id = max(last_id, int(df["event_id"].max()))
+                    pulled += len(df)
+                    yield frame_rows(df)
+
+            with self._get_connection() as conn:
+                if reset:
+                    # Same transaction as the copy: readers see the old
+                    # rows until the new ones commit, and a failed pull
+                    # rolls the delete back.
+                    conn.execute("DELETE FROM drink_events")
+                    conn.execute("DELETE FROM replica_state")
+                self.insert_batches(batches(), replace=True)
+                self._save_state(conn, last_event_id=last_id, synced_at=time.time())
+
+            return SyncResult(pulled, last_id, time.perf_counter() - started)
+
+    def sync(self, batch_size: int = SYNC_BATCH_SIZE) -> SyncResult:
+        """
+        Copy rows added upstream since the last sync, plus the newest
+        REFRESH_TAIL rows again.
+        """
+        return self._sync(batch_size, reset=False)
+
+    def sync_if_stale(self) -> Optional[SyncResult]:
+        """
+        Sync when the last sync is older than max_age; otherwise no-op.
+        """
+        if not self.is_stale():
+            return None
+        return self.sync()
+
+    def resync(self, batch_size: int = SYNC_BATCH_SIZE) -> SyncResult:
+        """
+        Replace every local row with a fresh copy of the whole table.
+        """
+        return self._sync(batch_size, reset=True)
+
+    # -- reads ---------------------------------------------------------
+
+    def read_events(self, since: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        Replicated events as a compact frame, oldest first; `since`
+        keeps only events at or after that time.
+        """
+        start = None
+        if since is not None:
+            start = as_utc(since).strftime(TIMESTAMP_FORMAT)
+        df = self.fetch_events(start_timestamp_utc=start)
+        df["event_id"] = pd.to_numeric(df["event_id"])
+        return df
+
+
+_replica: Optional[ReadReplica] = None
+_replica_lock = threading.Lock()
+
+
+def get_read_replica() -> ReadReplica:
+    """
+    Process-wide replica of the hosted database, created on first use.
+    """
+    global _replica
+    if _replica is None:
+        with _replica_lock:
+            if _replica is None:
+                _replica = ReadReplica()
+    return _replica
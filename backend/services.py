@@ -1,7 +1,11 @@
 from __future__ import annotations
 
-from typing import Optional, Union, IO
-import time
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar, Union, IO
+import gzip as gzip_module
+import io
+import itertools
+import logging
+import threading
 
 import pandas as pd
 from geopy.geocoders import Nominatim
@@ -9,85 +13,755 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 import os
 
+from backend.cache import get_cache
+from backend.frames import as_utc, compact_events, concat_events
+from backend.geocode import GEOCODE_CACHE_DDL, GeocodeCache, GeocodeWorker
+from backend.snapshot import SNAPSHOT_PATH, write_snapshot
+from backend.spatial import HeatmapPyramid
+from backend.sql_stats import STATS_WORKERS
+from backend.streaks import StreakBoard
+from backend.tracing import instrument_engine, traced
+
+logger = logging.getLogger(__name__)
+
 SUPABASE_DATABASE_URL = os.environ["SUPABASE_DATABASE_URL"]
 
+# Pool sizing can be tuned per deployment without a code change. The
+# default holds one connection per sql_stats.run_queries() worker, so the
+# "parallel" stats engine really runs its queries side by side.
+DB_POOL_SIZE = int(os.environ.get("BEER_TRACKER_DB_POOL_SIZE", str(STATS_WORKERS)))
+DB_MAX_OVERFLOW = int(os.environ.get("BEER_TRACKER_DB_MAX_OVERFLOW", "0"))
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
 def get_engine() -> Engine:
-    return create_engine(
-        SUPABASE_DATABASE_URL,
-        pool_size=1,
-        max_overflow=0,
-        pool_pre_ping=True,
-        pool_recycle=300,
-        connect_args={"sslmode": "require"},
-        future=True,
+    """
+    Return the process-wide engine, creating it on first use.
+
+    Streamlit runs every session as a thread of the same process, so all
+    sessions share this one connection pool.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(
+                    SUPABASE_DATABASE_URL,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_pre_ping=True,
+                    pool_recycle=300,
+                    connect_args={"sslmode": "require"},
+                    future=True,
+                )
+                instrument_engine(_engine)
+                if DB_POOL_SIZE + DB_MAX_OVERFLOW < STATS_WORKERS:
+                    logger.warning(
+                        "Connection pool holds %d connections but %d stats workers "
+                        "share it; parallel stats queries will wait for each other. "
+                        "Raise BEER_TRACKER_DB_POOL_SIZE or lower "
+                        "BEER_TRACKER_STATS_WORKERS.",
+                        DB_POOL_SIZE + DB_MAX_OVERFLOW,
+                        STATS_WORKERS,
+                    )
+    return _engine
+
+
+def dispose_engine() -> None:
+    """
+    Close all pooled connections and forget the engine.
+    The next call to get_engine() / ensure_schema() starts fresh.
+    """
+    global _engine, _schema_ready
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+    with _schema_lock:
+        _schema_ready = False
+
+
+# ---------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------
+
+# Rollup grain -> key columns. Each grain has its own table of beers and
+# events per UTC day and key, the day matching daily_beer_counts(). Events
+# with a NULL key are left out, as the stats skip them, except a missing
+# state, which is stored as "" the way backend.stats.city_keys() groups
+# it. Every key column is then NOT NULL and the primary key works on any
+# Postgres version. The user grain holds every event, so it also serves
+# totals, the calendar and streaks.
+ROLLUP_GRAINS: dict[str, list[str]] = {
+    "user": ["user_name"],
+    "beer_type": ["beer_type"],
+    "bar": ["bar_name"],
+    "city": ["city", "state", "country"],
+    "location": ["latitude", "longitude"],
+}
+
+# The grain whose rollup serves each backend.stats leaderboard.
+LEADERBOARD_ROLLUPS: dict[str, str] = {
+    "user_leaderboard": "user",
+    "city_leaderboard": "city",
+    "beer_type_leaderboard": "beer_type",
+    "bar_leaderboard": "bar",
+}
+
+_ROLLUP_COLUMN_TYPES = {"latitude": "DOUBLE PRECISION", "longitude": "DOUBLE PRECISION"}
+
+
+def _rollup_table(grain: str) -> str:
+    return f"beer_daily_{grain}_rollup"
+
+
+ROLLUP_TABLES = [_rollup_table(grain) for grain in ROLLUP_GRAINS]
+
+
+def _rollup_select(grain: str) -> tuple[str, str]:
+    # (key expressions over beer_events, condition that the keys exist)
+    keys = ROLLUP_GRAINS[grain]
+    exprs = ", ".join("COALESCE(state, '')" if key == "state" else key for key in keys)
+    present = " AND ".join(f"{key} IS NOT NULL" for key in keys if key != "state")
+    return exprs, present
+
+
+def _rollup_ddl(grain: str) -> list[str]:
+    table, keys = _rollup_table(grain), ROLLUP_GRAINS[grain]
+    columns = ",\n            ".join(
+        f"{key} {_ROLLUP_COLUMN_TYPES.get(key, 'TEXT')} NOT NULL" for key in keys
     )
+    # updated_at drives the incremental poll in _DailyRollup.refresh().
+    # It is the statement's clock time rather than now(), so cells
+    # rewritten at the end of a long import are not stamped with its start.
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            day DATE NOT NULL,
+            {columns},
+            beer_count BIGINT NOT NULL,
+            event_count BIGINT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+            PRIMARY KEY (day, {", ".join(keys)})
+        )
+        """,
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table} (updated_at)",
+    ]
 
 
-def ensure_schema() -> None:
+def _rollup_rebuild_sql(grain: str) -> str:
+    # Rebuilds every row of one rollup table from raw events.
+    exprs, present = _rollup_select(grain)
+    return f"""
+        INSERT INTO {_rollup_table(grain)}
+            (day, {", ".join(ROLLUP_GRAINS[grain])}, beer_count, event_count)
+        SELECT (timestamp_utc AT TIME ZONE 'UTC')::date, {exprs}, SUM(beer_count), COUNT(*)
+        FROM beer_events
+        WHERE {present}
+        GROUP BY 1, {exprs}
     """
-    Create table if it does not exist.
-    Safe to call multiple times.
+
+
+def _rollup_upsert_sql(grain: str) -> str:
+    # Folds one event into its cell of one rollup table, if it has the keys.
+    table, keys = _rollup_table(grain), ROLLUP_GRAINS[grain]
+    exprs, present = _rollup_select(grain)
+    return f"""
+        INSERT INTO {table} (day, {", ".join(keys)}, beer_count, event_count)
+        SELECT (timestamp_utc AT TIME ZONE 'UTC')::date, {exprs}, beer_count, 1
+        FROM beer_events
+        WHERE event_id = :event_id AND {present}
+        ON CONFLICT (day, {", ".join(keys)}) DO UPDATE SET
+            beer_count = {table}.beer_count + EXCLUDED.beer_count,
+            event_count = {table}.event_count + EXCLUDED.event_count,
+            updated_at = clock_timestamp()
     """
-    engine = get_engine()
-    ddl = text(
-        """
-        CREATE TABLE IF NOT EXISTS beer_events (
-            event_id BIGSERIAL PRIMARY KEY,
-            timestamp_utc TIMESTAMPTZ NOT NULL,
-            user_name TEXT NOT NULL,
-            beer_count INTEGER NOT NULL,
-            beer_type TEXT NULL,
-            bar_name TEXT NULL,
-            city TEXT NULL,
-            state TEXT NULL,
-            country TEXT NULL,
-            latitude DOUBLE PRECISION NULL,
-            longitude DOUBLE PRECISION NULL
-        );
-        """
+
+
+# Folds one new event into every rollup in one round trip. Postgres runs
+# each data-modifying WITH query once whether or not it is read.
+_ROLLUP_UPSERT_SQL = "WITH {} SELECT 1".format(
+    ", ".join(f"{grain}_cell AS ({_rollup_upsert_sql(grain)})" for grain in ROLLUP_GRAINS)
+)
+_LOCATION_UPSERT_SQL = _rollup_upsert_sql("location")
+
+
+def _rebuild_rollups(conn) -> int:
+    # Empties and refills every rollup table; returns the rows written.
+    rows = 0
+    for grain in ROLLUP_GRAINS:
+        conn.execute(text(f"DELETE FROM {_rollup_table(grain)}"))
+        rows += conn.execute(text(_rollup_rebuild_sql(grain))).rowcount
+    return rows
+
+
+# Ordered (version, statements) pairs. Append new entries; never edit
+# one that has already shipped.
+_MIGRATIONS: list[tuple[int, list[str]]] = [
+    (
+        1,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS beer_events (
+                event_id BIGSERIAL PRIMARY KEY,
+                timestamp_utc TIMESTAMPTZ NOT NULL,
+                user_name TEXT NOT NULL,
+                beer_count INTEGER NOT NULL,
+                beer_type TEXT NULL,
+                bar_name TEXT NULL,
+                city TEXT NULL,
+                state TEXT NULL,
+                country TEXT NULL,
+                latitude DOUBLE PRECISION NULL,
+                longitude DOUBLE PRECISION NULL
+            )
+            """,
+        ],
+    ),
+    (
+        2,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS beer_daily_rollup (
+                day DATE NOT NULL,
+                user_name TEXT NOT NULL,
+                beer_type TEXT NULL,
+                bar_name TEXT NULL,
+                city TEXT NULL,
+                state TEXT NULL,
+                country TEXT NULL,
+                latitude DOUBLE PRECISION NULL,
+                longitude DOUBLE PRECISION NULL,
+                beer_count BIGINT NOT NULL,
+                event_count BIGINT NOT NULL
+            )
+            """,
+            # This single table keyed on every dimension was replaced by
+            # the per-grain tables of version 5, which drops it. Its
+            # UNIQUE NULLS NOT DISTINCT key and initial fill were taken
+            # out, so fresh databases on Postgres < 15 can still pass
+            # through this version.
+        ],
+    ),
+    (
+        3,
+        [
+            GEOCODE_CACHE_DDL,
+        ],
+    ),
+    (
+        4,
+        [
+            # Serves windowed reads and the incremental poll's
+            # timestamp_utc > :since arm (see _fetch_events_after).
+            """
+            CREATE INDEX IF NOT EXISTS idx_beer_events_timestamp
+            ON beer_events (timestamp_utc)
+            """,
+        ],
+    ),
+    (
+        5,
+        [
+            "DROP TABLE IF EXISTS beer_daily_rollup",
+            *(statement for grain in ROLLUP_GRAINS for statement in _rollup_ddl(grain)),
+            *(_rollup_rebuild_sql(grain) for grain in ROLLUP_GRAINS),
+        ],
+    ),
+]
+
+SCHEMA_VERSION = _MIGRATIONS[-1][0]
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _current_schema_version(conn) -> int:
+    conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
     )
-    with engine.begin() as conn:
-        conn.execute(ddl)
+    version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return int(version or 0)
+
+
+@traced()
+def ensure_schema() -> None:
+    """
+    Bring the database up to SCHEMA_VERSION.
+
+    Runs the DDL at most once per process; later calls return
+    immediately without touching the database. Safe to call multiple times.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+
+    with _schema_lock:
+        if _schema_ready:
+            return
+
+        engine = get_engine()
+        with engine.begin() as conn:
+            current = _current_schema_version(conn)
+            for version, statements in _MIGRATIONS:
+                if version <= current:
+                    continue
+                for statement in statements:
+                    conn.execute(text(statement))
+                conn.execute(
+                    text(
+                        "INSERT INTO schema_version (version) VALUES (:version) "
+                        "ON CONFLICT (version) DO NOTHING"
+                    ),
+                    {"version": version},
+                )
+
+        _schema_ready = True
 
 
 # ---------------------------------------------------------------------
 # Reads
 # ---------------------------------------------------------------------
 
+_EVENT_COLUMNS_SQL = """
+    event_id,
+    timestamp_utc,
+    user_name,
+    beer_count,
+    beer_type,
+    bar_name,
+    city,
+    state,
+    country,
+    latitude,
+    longitude
+"""
+
+# event_id is assigned when the INSERT runs but becomes visible at COMMIT,
+# so a slow transaction can surface an id below the watermark. Rows logged
+# within this grace window before the previous poll are re-checked on
+# every refresh to catch them.
+WATERMARK_GRACE = pd.Timedelta(minutes=2)
+
+_events_cache: Optional[pd.DataFrame] = None
+_events_last_id: int = 0
+# When the previous poll started, None before the first load.
+_events_last_poll: Optional[pd.Timestamp] = None
+_events_lock = threading.Lock()
+
+# Data versions come from one counter, so none is ever reused.
+# _events_version changes whenever _events_cache does; _write_version on
+# every write this process makes. Cached reads are keyed on them.
+_versions = itertools.count(1)
+_events_version: int = 0
+_write_version: int = next(_versions)
+
+# How long get_all_events() serves the cached frame without polling the
+# database. Writes from this process invalidate it at once; rows written
+# elsewhere show up within this many seconds.
+EVENTS_REFRESH_INTERVAL = float(os.environ.get("BEER_TRACKER_EVENTS_REFRESH_INTERVAL", "5"))
+
+# Built from the events cache on first use, then kept in step with it
+# under _events_lock: new rows are added to both, and coordinates the
+# geocoder fills in to the pyramid.
+_heatmap_pyramid: Optional[HeatmapPyramid] = None
+_streak_board: Optional[StreakBoard] = None
+
+
+def _fetch_events_after(
+    last_id: int,
+    last_poll: Optional[pd.Timestamp],
+) -> pd.DataFrame:
+    engine = get_engine()
+
+    if last_poll is None:
+        query = text(
+            f"""
+            SELECT {_EVENT_COLUMNS_SQL}
+            FROM beer_events
+            ORDER BY timestamp_utc ASC
+            """
+        )
+        params = {}
+    else:
+        # Both arms are index range scans (primary key and
+        # idx_beer_events_timestamp). The time arm is anchored to the
+        # previous poll, not the newest event, so it stays a few minutes
+        # wide even when the newest event is backdated or old.
+        query = text(
+            f"""
+            SELECT {_EVENT_COLUMNS_SQL}
+            FROM beer_events
+            WHERE event_id > :last_id OR timestamp_utc > :since
+            ORDER BY timestamp_utc ASC
+            """
+        )
+        params = {
+            "last_id": int(last_id),
+            "since": (last_poll - WATERMARK_GRACE).to_pydatetime(),
+        }
+
+    df = pd.read_sql(query, engine, params=params, parse_dates=["timestamp_utc"])
+    return compact_events(df)
+
+
+def _note_write() -> None:
+    global _write_version
+    _write_version = next(_versions)
+
+
+@traced()
 def get_all_events() -> pd.DataFrame:
     """
     Load all beer events into a DataFrame.
+
+    The first call reads the whole table; later calls only fetch rows
+    newer than the last watermark and append them to a process-wide
+    cached frame, at most every EVENTS_REFRESH_INTERVAL seconds unless
+    this process wrote since. Columns use the compact dtypes from
+    backend.frames. The returned frame is shared, so treat it as
+    read-only.
+    """
+    return get_events_versioned()[0]
+
+
+@traced()
+def get_events_versioned() -> Tuple[pd.DataFrame, int]:
+    """
+    get_all_events() together with its data version, read atomically.
+    The version changes exactly when the frame does; pass it on as
+    stats.EventTimeline(events, version=...).
+    """
+    return get_cache().get_or_compute(
+        ("services.get_all_events",),
+        _write_version,
+        _refresh_events,
+        ttl=EVENTS_REFRESH_INTERVAL,
+    )
+
+
+def _refresh_events() -> Tuple[pd.DataFrame, int]:
+    global _events_cache, _events_last_id, _events_last_poll, _events_version
+
+    ensure_schema()
+
+    with _events_lock:
+        polled_at = pd.Timestamp.now(tz="UTC")
+        new_rows = _fetch_events_after(_events_last_id, _events_last_poll)
+
+        if _events_cache is None:
+            _events_cache = new_rows
+            _events_version = next(_versions)
+        else:
+            # Only rows inside the grace window can already be cached.
+            since = _events_last_poll - WATERMARK_GRACE
+            cached_ts = _events_cache["timestamp_utc"]
+            start = cached_ts.searchsorted(
+                since.as_unit(cached_ts.dt.unit, round_ok=True), side="right"
+            )
+            seen = _events_cache["event_id"].iloc[start:]
+            new_rows = new_rows[~new_rows["event_id"].isin(seen)]
+            if not new_rows.empty:
+                combined = concat_events(_events_cache, new_rows)
+                if new_rows["timestamp_utc"].min() < _events_cache["timestamp_utc"].max():
+                    combined = combined.sort_values(
+                        "timestamp_utc", kind="stable"
+                    ).reset_index(drop=True)
+                _events_cache = combined
+                _events_version = next(_versions)
+                if _heatmap_pyramid is not None:
+                    _heatmap_pyramid.add(new_rows)
+                if _streak_board is not None:
+                    _streak_board.add(new_rows)
+
+        if not new_rows.empty:
+            _events_last_id = max(_events_last_id, int(new_rows["event_id"].max()))
+        _events_last_poll = polled_at
+
+        return _events_cache, _events_version
+
+
+def reset_event_cache() -> None:
+    """
+    Drop the cached events frame and daily rollups; the next
+    get_all_events() or get_daily_rollups() reloads fully.
+    """
+    global _events_cache, _events_last_id, _events_last_poll, _heatmap_pyramid, _streak_board
+    with _events_lock:
+        _events_cache = None
+        _events_last_id = 0
+        _events_last_poll = None
+        _heatmap_pyramid = None
+        _streak_board = None
+    _reset_rollups()
+    get_cache().invalidate("services.get_all_events")
+    _note_write()
+
+
+@traced()
+def get_heatmap_pyramid() -> HeatmapPyramid:
+    """
+    Zoom-level heatmap cells over the cached events. Built on first use;
+    after that, get_all_events() bins each batch of new rows into it.
+    """
+    global _heatmap_pyramid
+    if _events_cache is None:
+        get_all_events()
+    with _events_lock:
+        if _heatmap_pyramid is None:
+            _heatmap_pyramid = HeatmapPyramid.from_events(_events_cache)
+        return _heatmap_pyramid
+
+
+@traced()
+def get_streak_board() -> StreakBoard:
+    """
+    Per-user day bins, streaks and rolling totals over the cached events.
+    Built on first use; after that, get_all_events() adds only the
+    (user, day) cells of new rows, e.g. the one a log_beers() call wrote.
+    """
+    global _streak_board
+    if _events_cache is None:
+        get_all_events()
+    with _events_lock:
+        if _streak_board is None:
+            _streak_board = StreakBoard.from_events(_events_cache)
+        return _streak_board
+
+
+@traced()
+def get_events_between(
+    start: Optional[pd.Timestamp] = None,
+    end: Optional[pd.Timestamp] = None,
+) -> pd.DataFrame:
+    """
+    Load events with start <= timestamp_utc < end, oldest first.
+
+    Either bound may be None for an open end; naive timestamps are taken
+    as UTC. The window is applied in SQL on the timestamp_utc index, so
+    only matching rows are transferred. Not cached.
     """
     ensure_schema()
     engine = get_engine()
 
+    conditions = []
+    params = {}
+    if start is not None:
+        conditions.append("timestamp_utc >= :start")
+        params["start"] = as_utc(start).to_pydatetime()
+    if end is not None:
+        conditions.append("timestamp_utc < :end")
+        params["end"] = as_utc(end).to_pydatetime()
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
     query = text(
-        """
-        SELECT
-            event_id,
-            timestamp_utc,
-            user_name,
-            beer_count,
-            beer_type,
-            bar_name,
-            city,
-            state,
-            country,
-            latitude,
-            longitude
+        f"""
+        SELECT {_EVENT_COLUMNS_SQL}
         FROM beer_events
+        {where}
         ORDER BY timestamp_utc ASC
         """
     )
 
-    df = pd.read_sql(query, engine, parse_dates=["timestamp_utc"])
-    return df
+    df = pd.read_sql(query, engine, params=params, parse_dates=["timestamp_utc"])
+    return compact_events(df)
+
+
+def get_events_since(since: pd.Timestamp) -> pd.DataFrame:
+    """
+    Load events logged at or after `since`, oldest first.
+    """
+    return get_events_between(start=since)
+
+
+# ---------------------------------------------------------------------
+# Daily rollups
+# ---------------------------------------------------------------------
+
+V = TypeVar("V")
+
+
+class _DailyRollup:
+    """
+    One rollup table mirrored in memory, oldest day first.
+
+    The first refresh() reads the whole table; later ones only fetch the
+    cells whose updated_at moved since the previous poll, less
+    WATERMARK_GRACE for transactions that commit late, and feed the beers
+    each cell gained to the views built on the mirror (see view()).
+    """
+
+    def __init__(self, grain: str):
+        self.grain = grain
+        self.keys = ["timestamp_utc", *ROLLUP_GRAINS[grain]]
+        self.lock = threading.Lock()
+        self.frame: Optional[pd.DataFrame] = None
+        self.last_poll: Optional[pd.Timestamp] = None
+        self._views: dict = {}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.frame = None
+            self.last_poll = None
+            self._views.clear()
+
+    def _fetch(self, since: Optional[pd.Timestamp]) -> pd.DataFrame:
+        where, params = "", {}
+        if since is not None:
+            where = "WHERE updated_at > :since"
+            params["since"] = since.to_pydatetime()
+        query = text(
+            f"""
+            SELECT day, {", ".join(ROLLUP_GRAINS[self.grain])}, beer_count, event_count
+            FROM {_rollup_table(self.grain)}
+            {where}
+            ORDER BY day ASC
+            """
+        )
+        df = pd.read_sql(query, get_engine(), params=params)
+        df.insert(0, "timestamp_utc", pd.to_datetime(df.pop("day")).dt.tz_localize("UTC"))
+        return df
+
+    def refresh(self) -> pd.DataFrame:
+        ensure_schema()
+        with self.lock:
+            polled_at = pd.Timestamp.now(tz="UTC")
+            if self.frame is None:
+                self.frame = self._fetch(None)
+            else:
+                changed = self._fetch(self.last_poll - WATERMARK_GRACE)
+                if not changed.empty:
+                    self._merge(changed)
+            self.last_poll = polled_at
+            return self.frame
+
+    def _merge(self, changed: pd.DataFrame) -> None:
+        # Changed cells replace their old rows. Only days from the oldest
+        # changed one on can hold those, so the rest is left alone.
+        if self.frame.empty:
+            self.frame, gained = changed, changed["beer_count"].to_numpy()
+        else:
+            ts = self.frame["timestamp_utc"]
+            start = ts.searchsorted(changed["timestamp_utc"].iloc[0])
+            head, tail = self.frame.iloc[:start], self.frame.iloc[start:]
+            old = changed[self.keys].merge(tail, on=self.keys, how="left")["beer_count"]
+            gained = changed["beer_count"].to_numpy() - old.fillna(0).to_numpy(dtype="int64")
+            kept = tail[self.keys].merge(changed[self.keys], on=self.keys, how="left", indicator=True)
+            tail = pd.concat([tail[(kept["_merge"] == "left_only").to_numpy()], changed])
+            tail = tail.sort_values("timestamp_utc", kind="stable")
+            self.frame = pd.concat([head, tail], ignore_index=True)
+
+        if (gained < 0).any():
+            # Only a rebuild elsewhere takes beers away; start the views over.
+            self._views.clear()
+            return
+        delta = changed.assign(beer_count=gained)[gained > 0]
+        for view in self._views.values():
+            view.add(delta)
+
+    def view(self, build: Callable[[pd.DataFrame], V]) -> V:
+        """
+        What `build` makes of the mirror, e.g. StreakBoard.from_events.
+        Built on first use; after that, refresh() .add()s every change.
+        """
+        with self.lock:
+            if build not in self._views:
+                self._views[build] = build(self.frame)
+            return self._views[build]
+
+
+_rollups: dict[str, _DailyRollup] = {grain: _DailyRollup(grain) for grain in ROLLUP_GRAINS}
+
+
+def _reset_rollups() -> None:
+    for rollup in _rollups.values():
+        rollup.reset()
+
+
+@traced()
+def get_daily_rollups(grain: str, since: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    Load one daily rollup (a ROLLUP_GRAINS key) as an events-shaped
+    DataFrame.
+
+    Each row is one (day, key) cell, with `timestamp_utc` set to midnight
+    UTC of that day and `beer_count` summed. The backend.stats functions
+    over those keys accept it in place of raw events (see
+    LEADERBOARD_ROLLUPS); the "user" rollup also serves totals, the
+    calendar and streaks. Windows are day-granular: with `since`, only
+    days from its UTC date on. bender_stats needs raw events.
+
+    Polled like get_all_events(), fetching only the cells that changed;
+    the returned frame is shared, so treat it as read-only.
+    """
+    rollup = _rollups[grain]
+    frame = get_cache().get_or_compute(
+        ("services.get_daily_rollups", grain),
+        _write_version,
+        rollup.refresh,
+        ttl=EVENTS_REFRESH_INTERVAL,
+    )
+    if since is None:
+        return frame
+    days = frame["timestamp_utc"]
+    start = days.searchsorted(as_utc(since).normalize().as_unit(days.dt.unit))
+    return frame.iloc[start:]
+
+
+@traced()
+def get_rollup_heatmap_pyramid() -> HeatmapPyramid:
+    """
+    get_heatmap_pyramid() built from the "location" rollup instead of raw
+    events: the same cells, since the rollup keeps the coordinates and
+    sums beer_count. Built on first use; after that, each poll of the
+    rollup adds the beers its changed cells gained.
+    """
+    get_daily_rollups("location")
+    return _rollups["location"].view(HeatmapPyramid.from_events)
+
+
+@traced()
+def get_rollup_streak_board() -> StreakBoard:
+    """
+    get_streak_board() built from the "user" rollup instead of raw
+    events: streaks only need beers per (user, day), which the rollup
+    already sums. Kept current like get_rollup_heatmap_pyramid().
+    """
+    get_daily_rollups("user")
+    return _rollups["user"].view(StreakBoard.from_events)
+
+
+@traced()
+def rebuild_daily_rollups() -> int:
+    """
+    Regenerate every daily rollup from raw events in one transaction.
+    Returns the number of rollup rows written.
+    """
+    ensure_schema()
+    engine = get_engine()
+
+    with engine.begin() as conn:
+        rows = _rebuild_rollups(conn)
+
+    _reset_rollups()
+    _note_write()
+    return rows
 
 
 # ---------------------------------------------------------------------
 # Writes
 # ---------------------------------------------------------------------
 
+@traced()
 def insert_event(
     *,
     timestamp_utc,
@@ -100,9 +774,10 @@ def insert_event(
     country: Optional[str] = None,
     latitude: Optional[float] = None,
     longitude: Optional[float] = None,
-) -> None:
+) -> int:
     """
-    Insert a single event row.
+    Insert a single event row and fold it into every daily rollup.
+    Returns the new event_id.
     """
     ensure_schema()
     engine = get_engine()
@@ -133,11 +808,12 @@ def insert_event(
             :latitude,
             :longitude
         )
+        RETURNING event_id
         """
     )
 
     with engine.begin() as conn:
-        conn.execute(
+        event_id = conn.execute(
             query,
             {
                 "timestamp_utc": timestamp_utc,
@@ -151,7 +827,50 @@ def insert_event(
                 "latitude": latitude,
                 "longitude": longitude,
             },
+        ).scalar_one()
+        conn.execute(text(_ROLLUP_UPSERT_SQL), {"event_id": event_id})
+
+    _note_write()
+    return int(event_id)
+
+
+@traced()
+def bulk_insert_events(batches: Iterable[list[dict]]) -> int:
+    """
+    Insert pre-built event rows (dicts keyed like insert_event's
+    arguments) batch by batch in a single transaction, then rebuild the
+    daily rollups once. event_id is left to the database. Returns rows
+    inserted.
+    """
+    ensure_schema()
+    engine = get_engine()
+
+    query = text(
+        """
+        INSERT INTO beer_events (
+            timestamp_utc, user_name, beer_count, beer_type, bar_name,
+            city, state, country, latitude, longitude
+        )
+        VALUES (
+            :timestamp_utc, :user_name, :beer_count, :beer_type, :bar_name,
+            :city, :state, :country, :latitude, :longitude
         )
+        """
+    )
+
+    inserted = 0
+    with engine.begin() as conn:
+        for batch in batches:
+            if batch:
+                conn.execute(query, batch)
+                inserted += len(batch)
+        if inserted:
+            _rebuild_rollups(conn)
+
+    if inserted:
+        _reset_rollups()
+        _note_write()
+    return inserted
 
 
 # ---------------------------------------------------------------------
@@ -159,6 +878,7 @@ def insert_event(
 # ---------------------------------------------------------------------
 
 _geolocator: Optional[Nominatim] = None
+_geocode_cache: Optional[GeocodeCache] = None
 
 
 def _get_geolocator() -> Nominatim:
@@ -168,38 +888,165 @@ def _get_geolocator() -> Nominatim:
     return _geolocator
 
 
-def _geocode_city(
-    *,
-    city: str,
-    state: Optional[str],
-    country: str,
-) -> tuple[Optional[float], Optional[float]]:
+def get_geocode_cache() -> GeocodeCache:
+    global _geocode_cache
+    if _geocode_cache is None:
+        ensure_schema()
+        _geocode_cache = GeocodeCache(get_engine())
+    return _geocode_cache
+
+
+# Minimum seconds between Nominatim calls, per its usage policy.
+GEOCODE_MIN_INTERVAL = float(os.environ.get("BEER_TRACKER_GEOCODE_INTERVAL", "1.0"))
+
+_geocode_worker: Optional[GeocodeWorker] = None
+_geocode_worker_lock = threading.Lock()
+
+
+def get_geocode_worker() -> GeocodeWorker:
     """
-    Best-effort geocoding. Returns (lat, lon) or (None, None).
+    Return the running background geocoding worker, starting it on first use.
     """
-    parts = [city]
-    if state:
-        parts.append(state)
-    parts.append(country)
-    query = ", ".join([p for p in parts if p])
+    global _geocode_worker
+    if _geocode_worker is None:
+        with _geocode_worker_lock:
+            if _geocode_worker is None:
+                _geocode_worker = GeocodeWorker(
+                    geocoder=_get_geolocator(),
+                    on_resolved=_apply_coordinates,
+                    cache=get_geocode_cache(),
+                    min_interval=GEOCODE_MIN_INTERVAL,
+                ).start()
+    return _geocode_worker
 
-    geolocator = _get_geolocator()
 
-    # Nominatim usage policy expects you to throttle requests.
-    # This app is low stakes, so keep it simple.
-    time.sleep(1.0)
+def start_geocode_worker(geocoder=None, min_interval: Optional[float] = None) -> GeocodeWorker:
+    """
+    (Re)start the background worker, optionally with a different geocoder
+    such as backend.geocode.FakeGeocoder for offline use.
+    """
+    global _geocode_worker
+    with _geocode_worker_lock:
+        if _geocode_worker is not None:
+            _geocode_worker.stop()
+        _geocode_worker = GeocodeWorker(
+            geocoder=geocoder or _get_geolocator(),
+            on_resolved=_apply_coordinates,
+            cache=get_geocode_cache(),
+            min_interval=GEOCODE_MIN_INTERVAL if min_interval is None else min_interval,
+        ).start()
+    return _geocode_worker
 
-    try:
-        location = geolocator.geocode(query, exactly_one=True, timeout=10)
-    except Exception:
-        location = None
 
-    if not location:
-        return None, None
+def _apply_coordinates(event_ids: tuple[int, ...], latitude: float, longitude: float) -> None:
+    """
+    Write resolved coordinates onto events that still have none, keeping
+    the daily rollups and the in-process events cache in step. Events
+    without coordinates are not in the "location" rollup, and no other
+    rollup keys on them, so each updated event is only added there.
+    """
+    engine = get_engine()
+    updated: list[int] = []
+
+    with engine.begin() as conn:
+        for event_id in event_ids:
+            result = conn.execute(
+                text(
+                    """
+                    UPDATE beer_events
+                    SET latitude = :latitude, longitude = :longitude
+                    WHERE event_id = :event_id AND latitude IS NULL AND longitude IS NULL
+                    """
+                ),
+                {"event_id": event_id, "latitude": latitude, "longitude": longitude},
+            )
+            if result.rowcount:
+                conn.execute(text(_LOCATION_UPSERT_SQL), {"event_id": event_id})
+                updated.append(event_id)
+
+    _patch_cached_coordinates(updated, latitude, longitude)
+    if updated:
+        _note_write()
+
+
+def _patch_cached_coordinates(event_ids: list[int], latitude: float, longitude: float) -> None:
+    # The incremental loader only picks up new event_ids, so coordinate
+    # updates are applied to the cached frame directly.
+    global _events_cache, _events_version
+    if not event_ids:
+        return
+
+    with _events_lock:
+        if _events_cache is None:
+            return
+        mask = _events_cache["event_id"].isin(event_ids).to_numpy()
+        if not mask.any():
+            return
+        if _heatmap_pyramid is not None:
+            located = mask & _events_cache["latitude"].isna().to_numpy()
+            if located.any():
+                beers = _events_cache["beer_count"].to_numpy()[located].sum()
+                _heatmap_pyramid.add_points(latitude, longitude, beers)
+        patched = _events_cache.copy(deep=False)
+        for col, value in (("latitude", latitude), ("longitude", longitude)):
+            values = patched[col].to_numpy(copy=True)
+            values[mask] = value
+            patched[col] = values
+        _events_cache = patched
+        _events_version = next(_versions)
+
+
+def backfill_missing_coordinates(limit: Optional[int] = None) -> int:
+    """
+    Queue every stored location that has events without coordinates.
+    Returns the number of locations queued.
+    """
+    ensure_schema()
+    engine = get_engine()
+
+    query = text(
+        f"""
+        SELECT city, state, country, ARRAY_AGG(event_id ORDER BY event_id) AS event_ids
+        FROM beer_events
+        WHERE latitude IS NULL AND longitude IS NULL AND city IS NOT NULL
+        GROUP BY city, state, country
+        ORDER BY MAX(timestamp_utc) DESC
+        {"LIMIT :limit" if limit is not None else ""}
+        """
+    )
+    params = {"limit": int(limit)} if limit is not None else {}
+    with engine.connect() as conn:
+        rows = conn.execute(query, params).all()
+
+    worker = get_geocode_worker()
+    for row in rows:
+        worker.submit(row.event_ids, row.city, row.state, row.country)
+    return len(rows)
+
+
+def warm_geocode_cache() -> int:
+    """
+    Seed the geocode cache from locations already stored in beer_events
+    with coordinates. Returns the number of distinct locations offered.
+    """
+    ensure_schema()
+    engine = get_engine()
+
+    query = text(
+        """
+        SELECT city, state, country, AVG(latitude) AS latitude, AVG(longitude) AS longitude
+        FROM beer_events
+        WHERE city IS NOT NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+        GROUP BY city, state, country
+        """
+    )
+    with engine.connect() as conn:
+        rows = conn.execute(query).all()
 
-    return float(location.latitude), float(location.longitude)
+    return get_geocode_cache().warm(rows)
 
 
+@traced()
 def log_beers(
     *,
     user_name: str,
@@ -209,10 +1056,14 @@ def log_beers(
     city: str,
     state: Optional[str],
     country: str,
-) -> None:
+) -> int:
     """
     Called by the Streamlit logging form.
-    Adds timestamp_utc automatically and geocodes (best effort).
+    Adds timestamp_utc automatically and returns the new event_id.
+
+    Coordinates come from the geocode cache when it already knows the
+    location; otherwise the row is written without them and queued for
+    the background geocoding worker, so the form never waits on Nominatim.
     """
     # FIX: Timestamp.utcnow() is already tz-aware in recent pandas.
     ts = pd.Timestamp.now(tz="UTC")
@@ -221,13 +1072,12 @@ def log_beers(
     state_clean = (state or "").strip() or None
     country_clean = (country or "").strip()
 
-    lat, lon = _geocode_city(
-        city=city_clean,
-        state=state_clean,
-        country=country_clean,
-    )
+    cached = None
+    if city_clean:
+        cached = get_geocode_cache().get(city_clean, state_clean, country_clean)
+    lat, lon = cached or (None, None)
 
-    insert_event(
+    event_id = insert_event(
         timestamp_utc=ts,
         user_name=user_name,
         beer_count=int(beer_count),
@@ -240,6 +1090,11 @@ def log_beers(
         longitude=lon,
     )
 
+    if city_clean and cached is None:
+        get_geocode_worker().submit([event_id], city_clean, state_clean, country_clean or None)
+
+    return event_id
+
 
 # ---------------------------------------------------------------------
 # Export
@@ -247,14 +1102,113 @@ def log_beers(
 
 TargetType = Union[str, IO[str], IO[bytes]]
 
+# Rows fetched from the server-side cursor per CSV chunk.
+EXPORT_CHUNK_SIZE = 10_000
+
+# timestamp_utc in exported CSV. Fixed, so every chunk renders the same
+# way; it is how pandas prints a UTC column with sub-second values, i.e.
+# what the one-shot export wrote for logged events.
+EXPORT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f+00:00"
+
+
+def iter_event_frames(chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yield all events as DataFrames of at most `chunk_size` rows, oldest
+    first. Rows come through a server-side cursor, so only one chunk is
+    held in memory no matter how large the table is. Always yields at
+    least one (possibly empty) frame.
+    """
+    ensure_schema()
+    engine = get_engine()
+
+    query = text(
+        f"""
+        SELECT {_EVENT_COLUMNS_SQL}
+        FROM beer_events
+        ORDER BY timestamp_utc ASC
+        """
+    )
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        columns = list(result.keys())
+        empty = True
+        for rows in result.partitions(chunk_size):
+            empty = False
+            yield pd.DataFrame(rows, columns=columns)
+        if empty:
+            yield pd.DataFrame(columns=columns)
+
+
+def iter_events_csv(chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Yield all events as CSV text, header first, one chunk at a time.
+    """
+    header = True
+    for frame in iter_event_frames(chunk_size):
+        if not frame.empty:
+            frame["timestamp_utc"] = pd.to_datetime(
+                frame["timestamp_utc"], utc=True
+            ).dt.strftime(EXPORT_TIMESTAMP_FORMAT)
+        yield frame.to_csv(index=False, header=header)
+        header = False
+
 
-def export_events_to_csv(target: TargetType) -> None:
+@traced()
+def export_events_to_csv(
+    target: TargetType,
+    gzip: bool = False,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> int:
     """
-    Export all events to CSV.
+    Export all events to CSV, streaming chunk by chunk.
 
     `target` can be:
       - a file path (str)
       - a file-like object (StringIO / BytesIO)
+    With gzip=True the output is gzip-compressed; file-like targets must
+    then be binary. Returns the number of bytes of CSV text written
+    (before compression).
     """
-    df = get_all_events()
-    df.to_csv(target, index=False)
+    written = 0
+
+    if isinstance(target, str):
+        opener = gzip_module.open if gzip else open
+        with opener(target, "wb") as fh:
+            for chunk in iter_events_csv(chunk_size):
+                data = chunk.encode("utf-8")
+                fh.write(data)
+                written += len(data)
+        return written
+
+    if gzip:
+        with gzip_module.GzipFile(fileobj=target, mode="wb") as fh:
+            for chunk in iter_events_csv(chunk_size):
+                data = chunk.encode("utf-8")
+                fh.write(data)
+                written += len(data)
+        return written
+
+    binary = not isinstance(target, io.TextIOBase)
+    for chunk in iter_events_csv(chunk_size):
+        data = chunk.encode("utf-8")
+        target.write(data if binary else chunk)
+        written += len(data)
+    return written
+
+
+@traced()
+def export_events_to_snapshot(
+    path: str = SNAPSHOT_PATH,
+    partition_by_month: bool = False,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> int:
+    """
+    Export all events to a typed, compressed Parquet snapshot (see
+    backend.snapshot), streaming chunk by chunk. Returns rows written.
+    """
+    return write_snapshot(
+        iter_event_frames(chunk_size),
+        path,
+        partition_by_month=partition_by_month,
+    )
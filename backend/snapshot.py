@@ -0,0 +1,188 @@
+"""
+Columnar Parquet snapshots of the events table.
+
+A snapshot keeps the compact dtypes from backend.frames (dictionary-
+encoded text, int16 counts, UTC timestamps) and is zstd-compressed, so
+restoring one needs no CSV or timestamp parsing. Coordinates stay
+float64 so a restore is exact; read_snapshot() downcasts them for the
+stats pages like any other load.
+
+Layout on disk:
+  - a single file:            data/beer_events.parquet
+  - or, partitioned by month: data/beer_events.parquet/month=2025-12/part-0.parquet
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from backend.frames import CATEGORY_COLUMNS, LOSSLESS_DTYPES, as_utc, compact_events
+
+
+SNAPSHOT_PATH = "data/beer_events.parquet"
+
+# Everything the stats pages use; event_id is only needed for restores.
+STATS_COLUMNS = [
+    "timestamp_utc",
+    "user_name",
+    "beer_count",
+    "beer_type",
+    "bar_name",
+    "city",
+    "state",
+    "country",
+    "latitude",
+    "longitude",
+]
+
+_COMPRESSION = "zstd"
+
+
+def _schema(first: pd.DataFrame) -> pa.Schema:
+    # Pinned up front: pandas picks categorical code widths per chunk, but
+    # every chunk written to one snapshot must share a schema.
+    event_id_type = pa.int64() if pd.api.types.is_integer_dtype(first["event_id"]) else pa.string()
+    return pa.schema(
+        [
+            ("event_id", event_id_type),
+            ("timestamp_utc", pa.timestamp("us", tz="UTC")),
+            ("user_name", pa.dictionary(pa.int32(), pa.string())),
+            ("beer_count", pa.int16()),
+            ("beer_type", pa.dictionary(pa.int32(), pa.string())),
+            ("bar_name", pa.dictionary(pa.int32(), pa.string())),
+            ("city", pa.dictionary(pa.int32(), pa.string())),
+            ("state", pa.dictionary(pa.int32(), pa.string())),
+            ("country", pa.dictionary(pa.int32(), pa.string())),
+            ("latitude", pa.float64()),
+            ("longitude", pa.float64()),
+        ]
+    )
+
+
+def _to_table(frame: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    frame = frame[schema.names]
+    for col in CATEGORY_COLUMNS:
+        # Categories must be strings for the pinned dictionary<string> type.
+        if isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = frame[col].cat.rename_categories(
+                frame[col].cat.categories.astype(str)
+            )
+    return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+def write_snapshot(
+    frames: Iterable[pd.DataFrame],
+    path: str = SNAPSHOT_PATH,
+    partition_by_month: bool = False,
+) -> int:
+    """
+    Write event frames to a snapshot, chunk by chunk, in the compact
+    layout with full-precision coordinates.
+
+    The snapshot is built next to `path` and swapped in at the end, so a
+    failed export never leaves a half-written snapshot behind. Returns
+    rows written.
+    """
+    target = Path(path)
+    staging = target.with_name(target.name + ".tmp")
+    if staging.exists():
+        shutil.rmtree(staging) if staging.is_dir() else staging.unlink()
+
+    rows = 0
+    schema: Optional[pa.Schema] = None
+    writer: Optional[pq.ParquetWriter] = None
+
+    try:
+        for index, frame in enumerate(frames):
+            frame = compact_events(frame, LOSSLESS_DTYPES)
+            if schema is None:
+                schema = _schema(frame)
+
+            if partition_by_month:
+                months = frame["timestamp_utc"].dt.strftime("%Y-%m")
+                for month, part in frame.groupby(months, sort=True, observed=True):
+                    month_dir = staging / f"month={month}"
+                    month_dir.mkdir(parents=True, exist_ok=True)
+                    pq.write_table(
+                        _to_table(part, schema),
+                        month_dir / f"part-{index}.parquet",
+                        compression=_COMPRESSION,
+                    )
+            elif not frame.empty or writer is None:
+                if writer is None:
+                    writer = pq.ParquetWriter(staging, schema, compression=_COMPRESSION)
+                writer.write_table(_to_table(frame, schema))
+
+            rows += len(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if partition_by_month and not staging.exists():
+        staging.mkdir(parents=True)
+
+    if target.exists():
+        shutil.rmtree(target) if target.is_dir() else target.unlink()
+    staging.rename(target)
+    return rows
+
+
+def snapshot_exists(path: str = SNAPSHOT_PATH) -> bool:
+    return Path(path).exists()
+
+
+def _filters(since: Optional[datetime], partitioned: bool) -> Optional[List[tuple]]:
+    if since is None:
+        return None
+    since_ts = as_utc(since)
+    filters = [("timestamp_utc", ">=", since_ts.to_pydatetime())]
+    if partitioned:
+        # Lets pyarrow skip whole month directories before opening files.
+        filters.append(("month", ">=", since_ts.strftime("%Y-%m")))
+    return filters
+
+
+def read_snapshot(
+    path: str = SNAPSHOT_PATH,
+    columns: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+) -> pd.DataFrame:
+    """
+    Load a snapshot as a compact events frame, oldest first.
+
+    `columns` projects the read down to just those columns; `since` keeps
+    only events at or after that time (and prunes month partitions).
+    """
+    partitioned = Path(path).is_dir()
+    table = pq.read_table(
+        path,
+        columns=columns,
+        filters=_filters(since, partitioned),
+        partitioning="hive" if partitioned else None,
+    )
+    if "month" in table.column_names:
+        table = table.drop(["month"])
+
+    df = compact_events(table.to_pandas())
+    if "timestamp_utc" in df.columns:
+        df = df.sort_values("timestamp_utc", kind="stable").reset_index(drop=True)
+    return df
+
+
+def iter_snapshot_batches(path: str = SNAPSHOT_PATH, batch_size: int = 50_000) -> Iterator[pd.DataFrame]:
+    """
+    Yield a snapshot as compact frames of at most `batch_size` rows,
+    coordinates left at full precision for restores.
+    """
+    partitioned = Path(path).is_dir()
+    dataset = pq.ParquetDataset(path, partitioning="hive" if partitioned else None)
+    for fragment in dataset.fragments:
+        for batch in fragment.to_batches(batch_size=batch_size):
+            frame = batch.to_pandas()
+            yield compact_events(frame.drop(columns=["month"], errors="ignore"), LOSSLESS_DTYPES)
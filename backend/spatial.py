@@ -0,0 +1,164 @@
+"""
+Zoom-level pyramid of weighted grid cells for the beer heatmap.
+
+Every level buckets coordinates into a square lat/lon grid sized for one
+map zoom level. A cell keeps its total beers and the beer-weighted mean
+position of everything in it, so the heatmap blob sits where the beers
+were, not at the cell corner. The client only ever receives the cells of
+one level inside its viewport, capped at a fixed number.
+"""
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+MIN_ZOOM = 0
+MAX_ZOOM = 12
+
+# Cells per 256px map tile along each axis. 16 gives 16px cells, finer
+# than the heatmap blur radius.
+CELLS_PER_TILE = 16
+
+# Most cells sent to the browser for one view; the heaviest are kept.
+MAX_CELLS = 2_000
+
+# Leaflet-style viewport: (south, west, north, east) in degrees.
+Bounds = Tuple[float, float, float, float]
+
+_CELL_COLUMNS = ["beers", "lat_sum", "lon_sum"]
+
+
+def cell_size(zoom: int) -> float:
+    """
+    Grid cell edge in degrees at `zoom` (a map tile spans 360 / 2**zoom).
+    """
+    return 360.0 / (2 ** zoom * CELLS_PER_TILE)
+
+
+def _empty_level() -> pd.DataFrame:
+    return pd.DataFrame(
+        {col: pd.Series(dtype="float64") for col in _CELL_COLUMNS},
+        index=pd.Index([], dtype="int64", name="cell"),
+    )
+
+
+def _bin(lat: np.ndarray, lon: np.ndarray, weight: np.ndarray, zoom: int) -> pd.DataFrame:
+    size = cell_size(zoom)
+    columns = int(np.ceil(360.0 / size))
+    ix = np.floor((lon + 180.0) / size).astype("int64")
+    iy = np.floor((lat + 90.0) / size).astype("int64")
+    cell = iy * columns + ix
+    frame = pd.DataFrame(
+        {"beers": weight, "lat_sum": lat * weight, "lon_sum": lon * weight},
+        index=pd.Index(cell, name="cell"),
+    )
+    return frame.groupby(level=0).sum()
+
+
+class HeatmapPyramid:
+    """
+    Per-zoom grid cells, updated incrementally with add().
+
+    Updates cost O(new points + existing cells), never a rescan of all
+    events. Readers always see a complete level: each level frame is
+    swapped in whole.
+    """
+
+    def __init__(self, min_zoom: int = MIN_ZOOM, max_zoom: int = MAX_ZOOM):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self._levels: Dict[int, pd.DataFrame] = {
+            zoom: _empty_level() for zoom in range(min_zoom, max_zoom + 1)
+        }
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_events(cls, events: pd.DataFrame, **kwargs) -> "HeatmapPyramid":
+        pyramid = cls(**kwargs)
+        pyramid.add(events)
+        return pyramid
+
+    def add(self, events: pd.DataFrame) -> int:
+        """
+        Count the events that have coordinates (weighted by beer_count)
+        into every level. Returns how many events were counted.
+        """
+        if events.empty or not {"latitude", "longitude", "beer_count"}.issubset(events.columns):
+            return 0
+        lat = events["latitude"].to_numpy(dtype="float64")
+        lon = events["longitude"].to_numpy(dtype="float64")
+        located = ~(np.isnan(lat) | np.isnan(lon))
+        if not located.any():
+            return 0
+        self.add_points(
+            lat[located],
+            lon[located],
+            events["beer_count"].to_numpy(dtype="float64")[located],
+        )
+        return int(located.sum())
+
+    def add_points(self, lat, lon, weight) -> None:
+        """
+        Add weighted points (scalars or equal-length arrays).
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype="float64"))
+        lon = np.atleast_1d(np.asarray(lon, dtype="float64"))
+        weight = np.broadcast_to(np.asarray(weight, dtype="float64"), lat.shape)
+        with self._lock:
+            for zoom, level in self._levels.items():
+                delta = _bin(lat, lon, weight, zoom)
+                if level.empty:
+                    self._levels[zoom] = delta
+                else:
+                    self._levels[zoom] = pd.concat([level, delta]).groupby(level=0).sum()
+
+    def level_for(self, zoom: Optional[float]) -> int:
+        if zoom is None:
+            return self.min_zoom
+        return int(min(max(round(zoom), self.min_zoom), self.max_zoom))
+
+    def cell_count(self, zoom: int) -> int:
+        return len(self._levels[self.level_for(zoom)])
+
+    def cells(
+        self,
+        zoom: Optional[float] = None,
+        bounds: Optional[Bounds] = None,
+        max_cells: int = MAX_CELLS,
+    ) -> pd.DataFrame:
+        """
+        Weighted cells (latitude, longitude, total_beers) of the level for
+        `zoom`, inside `bounds` when given, heaviest first, at most
+        `max_cells` rows.
+        """
+        level = self._levels[self.level_for(zoom)]
+        if level.empty:
+            return pd.DataFrame(columns=["latitude", "longitude", "total_beers"])
+
+        out = pd.DataFrame(
+            {
+                "latitude": level["lat_sum"] / level["beers"],
+                "longitude": level["lon_sum"] / level["beers"],
+                "total_beers": level["beers"],
+            }
+        )
+
+        if bounds is not None:
+            south, west, north, east = bounds
+            mask = out["latitude"].between(south, north)
+            if east - west < 360:
+                # Leaflet reports longitudes past +-180 after panning
+                # across the antimeridian; wrap them back first.
+                west = (west + 180.0) % 360.0 - 180.0
+                east = (east + 180.0) % 360.0 - 180.0
+                if west <= east:
+                    mask &= out["longitude"].between(west, east)
+                else:
+                    mask &= (out["longitude"] >= west) | (out["longitude"] <= east)
+            out = out[mask]
+
+        return out.nlargest(max_cells, "total_beers").reset_index(drop=True)
@@ -0,0 +1,558 @@
+"""
+SQL-pushdown versions of the backend.stats leaderboards.
+
+Same function names and output frames as backend.stats, but the first
+argument is a data source instead of an events DataFrame:
+
+  - a SQLAlchemy Engine pointing at the Postgres `beer_events` table
+  - a SQLiteStore (local `drink_events` table)
+
+The GROUP BY / SUM / ORDER BY / LIMIT work runs in the database, so only
+the aggregated rows cross the wire. Ties are broken by the grouping keys
+in ascending order, matching the stable sort used by backend.stats.
+
+run_queries() runs a page's independent queries concurrently, so the
+page waits for the slowest query instead of the sum of all of them.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Union
+import contextvars
+import os
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from backend.db import TIMESTAMP_FORMAT, SQLiteStore
+from backend.frames import as_utc
+from backend.stats import (
+    SESSION_COLUMNS,
+    SESSION_GAP,
+    benchmarks_from_total,
+    dominance_from_totals,
+    with_gallons,
+)
+from backend.tracing import span
+
+
+Source = Union[Engine, SQLiteStore]
+
+# Threads run_queries() uses by default. Every running query holds a
+# pooled connection; services sizes its Postgres pool from this.
+STATS_WORKERS = int(os.environ.get("BEER_TRACKER_STATS_WORKERS", "4"))
+
+
+# ---------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------
+
+def _table(source: Source) -> str:
+    return "drink_events" if isinstance(source, SQLiteStore) else "beer_events"
+
+
+def _bound(source: Source, value) -> Any:
+    # Timestamp parameter: UTC text in the stored TIMESTAMP_FORMAT for
+    # SQLite, so text comparison orders it like the stored values; a
+    # tz-aware datetime for Postgres.
+    ts = as_utc(value)
+    if isinstance(source, SQLiteStore):
+        return ts.strftime(TIMESTAMP_FORMAT)
+    return ts.to_pydatetime()
+
+
+def _window(
+    source: Source,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    conditions: Optional[list[str]] = None,
+) -> tuple[str, dict]:
+    """
+    Build a WHERE clause for an optional since <= timestamp_utc < until
+    window, the same half-open window as stats.EventTimeline.between().
+
+    SQLite stores timestamps as fixed-width UTC text, so bounds are bound
+    in that format there; Postgres gets tz-aware datetimes.
+    """
+    conditions = list(conditions or [])
+    params: dict = {}
+
+    for name, op, value in (("since", ">=", since), ("until", "<", until)):
+        if value is None:
+            continue
+        params[name] = _bound(source, value)
+        conditions.append(f"timestamp_utc {op} :{name}")
+
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, params
+
+
+def _text_key(source: Source, expr: str) -> str:
+    # Text compared by code point, as pandas sorts strings. Postgres
+    # would otherwise use the database collation; SQLite's default
+    # BINARY collation already does this.
+    if isinstance(source, SQLiteStore):
+        return expr
+    return f'{expr} COLLATE "C"'
+
+
+def _read(source: Source, sql: str, params: dict) -> pd.DataFrame:
+    if isinstance(source, SQLiteStore):
+        return source.query(sql, params)
+    return pd.read_sql(text(sql), source, params=params)
+
+
+# Leaderboard name -> (output keys, SQL expression per key, columns that
+# must not be NULL).
+_LEADERBOARDS: Dict[str, tuple[list[str], list[str], list[str]]] = {
+    "user_leaderboard": (["user_name"], ["user_name"], []),
+    "city_leaderboard": (
+        ["city", "state", "country"],
+        ["city", "COALESCE(state, '')", "country"],
+        ["city", "country"],
+    ),
+    "beer_type_leaderboard": (["beer_type"], ["beer_type"], ["beer_type"]),
+    "bar_leaderboard": (["bar_name"], ["bar_name"], ["bar_name"]),
+}
+
+
+def _grouped_leaderboard(
+    source: Source,
+    name: str,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    limit: Optional[int],
+    after: Optional[tuple] = None,
+) -> pd.DataFrame:
+    keys, select_keys, not_null = _LEADERBOARDS[name]
+    where, params = _window(
+        source, since, until, [f"{col} IS NOT NULL" for col in not_null]
+    )
+
+    # Keyset pagination: groups sorting after the cursor's
+    # (total_beers, *keys), compared as row values.
+    having = ""
+    if after is not None:
+        params["after_total"] = int(after[0])
+        for i, value in enumerate(after[1:]):
+            params[f"after_{i}"] = value
+        cursor_keys = ", ".join(f":after_{i}" for i in range(len(keys)))
+        row_keys = ", ".join(_text_key(source, expr) for expr in select_keys)
+        having = f"""
+        HAVING SUM(beer_count) < :after_total
+            OR (SUM(beer_count) = :after_total AND ({row_keys}) > ({cursor_keys}))"""
+
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = " LIMIT :limit"
+        params["limit"] = int(limit)
+
+    group_by = ", ".join(select_keys)
+    order_by = ", ".join(f"{_text_key(source, expr)} ASC" for expr in select_keys)
+    sql = f"""
+        SELECT {", ".join(f"{expr} AS {key}" for expr, key in zip(select_keys, keys))},
+               SUM(beer_count) AS total_beers
+        FROM {_table(source)}{where}
+        GROUP BY {group_by}{having}
+        ORDER BY total_beers DESC, {order_by}{limit_sql}
+    """
+
+    out = _read(source, sql, params)
+    if out.empty:
+        return pd.DataFrame(columns=keys + ["total_beers", "total_gallons"])
+
+    out["total_beers"] = out["total_beers"].astype("int64")
+    return with_gallons(out[keys + ["total_beers"]].reset_index(drop=True))
+
+
+# ---------------------------------------------------------------------
+# Leaderboards
+# ---------------------------------------------------------------------
+
+# `limit` and `after` (a backend.stats.page_cursor) page through a
+# leaderboard; only that page leaves the database.
+
+def user_leaderboard(
+    source: Source,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    after: Optional[tuple] = None,
+) -> pd.DataFrame:
+    return _grouped_leaderboard(source, "user_leaderboard", since, until, limit, after)
+
+
+def city_leaderboard(
+    source: Source,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    after: Optional[tuple] = None,
+) -> pd.DataFrame:
+    return _grouped_leaderboard(source, "city_leaderboard", since, until, limit, after)
+
+
+def beer_type_leaderboard(
+    source: Source,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    after: Optional[tuple] = None,
+) -> pd.DataFrame:
+    return _grouped_leaderboard(source, "beer_type_leaderboard", since, until, limit, after)
+
+
+def bar_leaderboard(
+    source: Source,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    after: Optional[tuple] = None,
+) -> pd.DataFrame:
+    return _grouped_leaderboard(source, "bar_leaderboard", since, until, limit, after)
+
+
+def leaderboard_count(
+    source: Source,
+    name: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> int:
+    """
+    Exact number of rows in the full `name` leaderboard, as in
+    backend.stats.leaderboard_count.
+    """
+    _, select_keys, not_null = _LEADERBOARDS[name]
+    where, params = _window(
+        source, since, until, [f"{col} IS NOT NULL" for col in not_null]
+    )
+    sql = f"""
+        SELECT COUNT(*) AS n
+        FROM (
+            SELECT 1 FROM {_table(source)}{where}
+            GROUP BY {", ".join(select_keys)}
+        ) AS leaderboard
+    """
+    return int(_read(source, sql, params)["n"].iloc[0])
+
+
+# ---------------------------------------------------------------------
+# Fun / derived stats
+# ---------------------------------------------------------------------
+
+def fun_benchmarks(
+    source: Source,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Dict[str, float]:
+    where, params = _window(source, since, until)
+    sql = f"SELECT COALESCE(SUM(beer_count), 0) AS total_beers FROM {_table(source)}{where}"
+    total_beers = int(_read(source, sql, params)["total_beers"].iloc[0])
+    return benchmarks_from_total(total_beers)
+
+
+def dominance_stats(
+    source: Source,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Dict[str, float]:
+    where, params = _window(source, since, until)
+    table = _table(source)
+    sql = f"""
+        WITH totals AS (
+            SELECT user_name, SUM(beer_count) AS total_beers
+            FROM {table}{where}
+            GROUP BY user_name
+        ),
+        ranked AS (
+            SELECT total_beers,
+                   ROW_NUMBER() OVER (ORDER BY total_beers DESC, {_text_key(source, "user_name")} ASC) AS position
+            FROM totals
+        )
+        SELECT
+            COALESCE(SUM(CASE WHEN position <= 1 THEN total_beers ELSE 0 END), 0) AS top1,
+            COALESCE(SUM(CASE WHEN position <= 3 THEN total_beers ELSE 0 END), 0) AS top3,
+            COALESCE(SUM(total_beers), 0) AS total
+        FROM ranked
+    """
+    row = _read(source, sql, params).iloc[0]
+    return dominance_from_totals(
+        top1=int(row["top1"]),
+        top3=int(row["top3"]),
+        total=int(row["total"]),
+    )
+
+
+# ---------------------------------------------------------------------
+# Calendar, heatmap and benders
+# ---------------------------------------------------------------------
+
+def _day(source: Source) -> str:
+    # SQLite timestamps are ISO-8601 UTC text, so the date is a prefix.
+    if isinstance(source, SQLiteStore):
+        return "substr(timestamp_utc, 1, 10)"
+    return "(timestamp_utc AT TIME ZONE 'UTC')::date"
+
+
+def daily_beer_counts(
+    source: Source,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> pd.DataFrame:
+    """
+    Beers per UTC day (date at midnight UTC, beer_count), oldest first,
+    for days with any beers.
+    """
+    where, params = _window(source, since, until)
+    day = _day(source)
+    sql = f"""
+        SELECT {day} AS day, SUM(beer_count) AS beer_count
+        FROM {_table(source)}{where}
+        GROUP BY {day}
+        ORDER BY day ASC
+    """
+    out = _read(source, sql, params)
+    if out.empty:
+        return pd.DataFrame(columns=["date", "beer_count"])
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(out["day"]).dt.tz_localize("UTC"),
+            "beer_count": out["beer_count"].astype("int64"),
+        }
+    )
+
+
+def city_heatmap_points(
+    source: Source,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> pd.DataFrame:
+    where, params = _window(
+        source, since, until, ["latitude IS NOT NULL", "longitude IS NOT NULL"]
+    )
+    sql = f"""
+        SELECT latitude, longitude, SUM(beer_count) AS total_beers
+        FROM {_table(source)}{where}
+        GROUP BY latitude, longitude
+        ORDER BY total_beers DESC, latitude ASC, longitude ASC
+    """
+    out = _read(source, sql, params)
+    if out.empty:
+        return pd.DataFrame(columns=["latitude", "longitude", "total_beers"])
+    out["total_beers"] = out["total_beers"].astype("int64")
+    return out
+
+
+def _seconds_between(source: Source, later: str, earlier: str) -> str:
+    if isinstance(source, SQLiteStore):
+        return f"(julianday({later}) - julianday({earlier})) * 86400.0"
+    return f"EXTRACT(EPOCH FROM {later} - {earlier})"
+
+
+def _instant(source: Source, expr: str) -> str:
+    # SQLite timestamps are text; compare them as instants.
+    if isinstance(source, SQLiteStore):
+        return f"julianday({expr})"
+    return expr
+
+
+def _bender_sessions(
+    source: Source,
+    threshold: int,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    gap: pd.Timedelta,
+) -> tuple[str, dict]:
+    # LAG finds each log's gap to the user's previous one, and a running
+    # SUM of the gaps over `gap` numbers the sessions.
+    where, params = _window(source, since, until)
+    params["threshold"] = int(threshold)
+    params["gap_seconds"] = pd.Timedelta(gap).total_seconds()
+    order = "ORDER BY timestamp_utc, event_id"
+    sql = f"""
+        WITH gaps AS (
+            SELECT user_name, timestamp_utc, event_id, beer_count,
+                   LAG(timestamp_utc) OVER (PARTITION BY user_name {order}) AS previous_ts
+            FROM {_table(source)}{where}
+        ),
+        numbered AS (
+            SELECT user_name, timestamp_utc, beer_count,
+                   SUM(
+                       CASE WHEN previous_ts IS NULL
+                             OR {_seconds_between(source, "timestamp_utc", "previous_ts")} > :gap_seconds
+                       THEN 1 ELSE 0 END
+                   ) OVER (
+                       PARTITION BY user_name {order}
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                   ) AS session
+            FROM gaps
+        )
+        SELECT user_name,
+               MIN(timestamp_utc) AS started_at,
+               MAX(timestamp_utc) AS ended_at,
+               COUNT(*) AS logs,
+               SUM(beer_count) AS total_beers
+        FROM numbered
+        GROUP BY user_name, session
+        HAVING SUM(beer_count) >= :threshold
+    """
+    return sql, params
+
+
+def bender_stats(
+    source: Source,
+    threshold: int = 7,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    gap: pd.Timedelta = SESSION_GAP,
+    limit: Optional[int] = None,
+    after: Optional[tuple] = None,
+) -> pd.DataFrame:
+    """
+    Drinking sessions with at least `threshold` beers, newest first, as
+    in backend.stats.bender_stats. `limit` and `after` page through them
+    as for the leaderboards.
+    """
+    sessions, params = _bender_sessions(source, threshold, since, until, gap)
+    started = _instant(source, "started_at")
+
+    where = ""
+    if after is not None:
+        where = f"""
+        WHERE {started} < {_instant(source, ":after_started")}
+           OR ({started} = {_instant(source, ":after_started")} AND {_text_key(source, "user_name")} > :after_user)"""
+        params["after_started"] = _bound(source, after[0])
+        params["after_user"] = after[1]
+
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = " LIMIT :limit"
+        params["limit"] = int(limit)
+
+    sql = f"""
+        SELECT * FROM ({sessions}) AS benders{where}
+        ORDER BY {started} DESC, {_text_key(source, "user_name")} ASC{limit_sql}
+    """
+    out = _read(source, sql, params)
+    if out.empty:
+        return pd.DataFrame(columns=SESSION_COLUMNS)
+
+    started = pd.to_datetime(out["started_at"], utc=True)
+    ended = pd.to_datetime(out["ended_at"], utc=True)
+    out["started_at"] = started
+    out["ended_at"] = ended
+    out["duration_minutes"] = ((ended - started) / pd.Timedelta(minutes=1)).round(1)
+    out["logs"] = out["logs"].astype("int32")
+    out["total_beers"] = out["total_beers"].astype("int64")
+    return out[SESSION_COLUMNS]
+
+
+def bender_count(
+    source: Source,
+    threshold: int = 7,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    gap: pd.Timedelta = SESSION_GAP,
+) -> int:
+    sessions, params = _bender_sessions(source, threshold, since, until, gap)
+    sql = f"SELECT COUNT(*) AS n FROM ({sessions}) AS benders"
+    return int(_read(source, sql, params)["n"].iloc[0])
+
+
+# ---------------------------------------------------------------------
+# Concurrent loading
+# ---------------------------------------------------------------------
+
+@dataclass
+class QueryRun:
+    """
+    Results of run_queries(), keyed like its input, with each query's
+    duration (including any wait for a pooled connection) and the
+    wall-clock time of the whole batch.
+    """
+    results: Dict[str, Any]
+    timings_ms: Dict[str, float]
+    wall_ms: float
+    workers: int
+
+    @property
+    def serial_ms(self) -> float:
+        """
+        Sum of the query durations: roughly what running them one after
+        another would have cost.
+        """
+        return round(sum(self.timings_ms.values()), 3)
+
+    def timings(self) -> pd.DataFrame:
+        return (
+            pd.DataFrame(
+                {"query": list(self.timings_ms), "duration_ms": list(self.timings_ms.values())}
+            )
+            .sort_values("duration_ms", ascending=False)
+            .reset_index(drop=True)
+        )
+
+
+def _timed(name: str, query: Callable[[], Any]) -> tuple[Any, float]:
+    with span(f"query.{name}"):
+        started = time.perf_counter()
+        result = query()
+    return result, round((time.perf_counter() - started) * 1000, 3)
+
+
+# One long-lived pool per size, shared by every page run. Its threads
+# (and the per-thread SQLite connections they open) are reused instead of
+# being created and abandoned on each rerun.
+_pools: Dict[int, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(size: int) -> ThreadPoolExecutor:
+    with _pools_lock:
+        pool = _pools.get(size)
+        if pool is None:
+            pool = _pools[size] = ThreadPoolExecutor(
+                max_workers=size, thread_name_prefix=f"stats-query-{size}"
+            )
+        return pool
+
+
+def run_queries(
+    queries: Dict[str, Callable[[], Any]],
+    max_workers: Optional[int] = None,
+) -> QueryRun:
+    """
+    Run independent zero-argument queries on a shared thread pool of
+    `max_workers` threads (default STATS_WORKERS; 1 runs them inline, in
+    order). Raises the first failure after every query has finished.
+    """
+    size = max(1, max_workers or STATS_WORKERS)
+    workers = min(size, len(queries) or 1)
+    started = time.perf_counter()
+    outcomes: Dict[str, tuple[Any, float]] = {}
+
+    if workers == 1:
+        for name, query in queries.items():
+            outcomes[name] = _timed(name, query)
+    else:
+        pool = _pool(size)
+        # Each task runs in a copy of the caller's context, so its
+        # spans land in the page's trace.
+        futures = {
+            name: pool.submit(contextvars.copy_context().run, _timed, name, query)
+            for name, query in queries.items()
+        }
+        wait(futures.values())
+        outcomes = {name: future.result() for name, future in futures.items()}
+
+    return QueryRun(
+        results={name: result for name, (result, _) in outcomes.items()},
+        timings_ms={name: ms for name, (_, ms) in outcomes.items()},
+        wall_ms=round((time.perf_counter() - started) * 1000, 3),
+        workers=workers,
+    )
@@ -1,39 +1,224 @@
 from __future__ import annotations
 
-from typing import Dict
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, TypeVar, Union
+import functools
+import os
+
+import numpy as np
 import pandas as pd
 
+from backend.cache import get_cache
+from backend.frames import EPOCH_DAY, as_utc, parse_timestamps
+from backend.tracing import traced
+
 
 LITERS_PER_BEER = 0.33
 LITERS_PER_GALLON = 3.78541
 
+# Where the stats pages get their aggregates from:
+#   "pandas" - group the loaded raw events frame (default)
+#   "rollup" - group the daily rollup tables (services.get_daily_rollups)
+#   "sql"    - push the aggregation down to the database (backend.sql_stats)
+#   "parallel" - as "sql", with the queries run concurrently
+#                (sql_stats.run_queries, BEER_TRACKER_STATS_WORKERS)
+STATS_ENGINE = os.environ.get("BEER_TRACKER_STATS_ENGINE", "pandas").strip().lower()
+
+# Where the stats pages load raw events from:
+#   "database" - the hosted Postgres (default)
+#   "snapshot" - a Parquet snapshot (backend.snapshot); no database access
+#   "replica"  - the local SQLite read replica (backend.replica)
+EVENTS_SOURCE = os.environ.get("BEER_TRACKER_EVENTS_SOURCE", "database").strip().lower()
+
 
 # ---------------------------------------------------------------------
-# Helpers
+# Sorted time index
 # ---------------------------------------------------------------------
 
-def _add_volume_columns(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["total_liters"] = df["beer_count"] * LITERS_PER_BEER
-    df["total_gallons"] = df["total_liters"] / LITERS_PER_GALLON
-    return df
+class EventTimeline:
+    """
+    Events with timestamp_utc parsed once and sorted oldest first.
+
+    Windows are cut with searchsorted on the sorted timestamps and come
+    back as EventTimelines over row slices of the same frame, so no
+    window copies or re-parses anything. Every function in this module
+    accepts an EventTimeline wherever it takes an events frame, and
+    caches its result when given one: keyed by the timeline's slot (see
+    `slot`), valid for its version and row window.
+
+    `version` identifies the data, e.g. services.get_events_versioned();
+    without one, data_version() of the events is used.
+    """
+
+    def __init__(self, events: pd.DataFrame, version: Optional[Hashable] = None):
+        if "timestamp_utc" not in events.columns:
+            frame = events.iloc[0:0]
+        elif not isinstance(events["timestamp_utc"].dtype, pd.DatetimeTZDtype):
+            frame = events.copy()
+            frame["timestamp_utc"] = parse_timestamps(frame["timestamp_utc"])
+            frame = frame.dropna(subset=["timestamp_utc"])
+        elif events["timestamp_utc"].hasnans:
+            frame = events[events["timestamp_utc"].notna()]
+        else:
+            frame = events
+
+        if "timestamp_utc" in frame.columns and not frame["timestamp_utc"].is_monotonic_increasing:
+            frame = frame.sort_values("timestamp_utc", kind="stable").reset_index(drop=True)
+
+        self.frame = frame
+        self._root = self
+        self._offset = 0
+        self._version = version
+        self._slot: Tuple = ()
+
+    @classmethod
+    def _slice(
+        cls, parent: "EventTimeline", lo: int, hi: int, slot: Tuple
+    ) -> "EventTimeline":
+        timeline = cls.__new__(cls)
+        timeline.frame = parent.frame.iloc[lo:hi]
+        timeline._root = parent._root
+        timeline._offset = parent._offset + lo
+        timeline._version = None
+        timeline._slot = parent._slot + (slot,)
+        return timeline
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def empty(self) -> bool:
+        return self.frame.empty
+
+    @property
+    def version(self) -> Hashable:
+        """
+        Data version of the full timeline this one was cut from.
+        """
+        root = self._root
+        if root._version is None:
+            root._version = data_version(root)
+        return root._version
+
+    @property
+    def window(self) -> Tuple[int, int]:
+        """
+        Row range of this timeline within the full one.
+        """
+        return (self._offset, self._offset + len(self.frame))
+
+    @property
+    def slot(self) -> Tuple:
+        """
+        Stable identity for cache keys: which data (columns and oldest
+        timestamp of the full timeline) and how this window was cut from
+        it. Unlike `window` it survives new rows, so a rerun on newer data
+        overwrites its cached results instead of piling up beside them.
+        """
+        root = self._root
+        oldest = str(root.frame["timestamp_utc"].iloc[0]) if not root.frame.empty else None
+        return (tuple(root.frame.columns), oldest) + self._slot
+
+    @property
+    def cache_version(self) -> Tuple:
+        """
+        What a cached result for `slot` depends on: the data version and
+        the rows of the window.
+        """
+        return (self.version, self.window)
+
+    def _position(self, ts, side: str) -> int:
+        ts_col = self.frame["timestamp_utc"]
+        bound = as_utc(ts).as_unit(ts_col.dt.unit, round_ok=True)
+        return int(ts_col.searchsorted(bound, side=side))
+
+    def _cut(self, start, end, slot: Tuple) -> "EventTimeline":
+        if self.frame.empty:
+            return self
+        lo = 0 if start is None else self._position(start, "left")
+        hi = len(self.frame) if end is None else self._position(end, "left")
+        return EventTimeline._slice(self, lo, max(lo, hi), slot)
+
+    def between(self, start=None, end=None) -> "EventTimeline":
+        """
+        Events with start <= timestamp_utc < end. Either bound may be None;
+        naive bounds are taken as UTC.
+        """
+        slot = (
+            "between",
+            None if start is None else str(as_utc(start)),
+            None if end is None else str(as_utc(end)),
+        )
+        return self._cut(start, end, slot)
+
+    def since(self, start) -> "EventTimeline":
+        return self.between(start=start)
+
+    def last_n_days(self, days: int, now: Optional[pd.Timestamp] = None) -> "EventTimeline":
+        # Slotted by `days`, not the moving cutoff, unless `now` is pinned.
+        slot = ("last_n_days", days, None if now is None else str(as_utc(now)))
+        now = pd.Timestamp.now(tz="UTC") if now is None else as_utc(now)
+        return self._cut(now - pd.Timedelta(days=days), None, slot)
+
+    def iso_week(self, year: int, week: int) -> "EventTimeline":
+        """
+        Events in ISO week `week` of `year` (Monday 00:00 UTC to Monday).
+        """
+        monday = pd.Timestamp(date.fromisocalendar(year, week, 1), tz="UTC")
+        return self.between(monday, monday + pd.Timedelta(days=7))
+
+
+Events = Union[pd.DataFrame, EventTimeline]
+
+
+def _frame(events: Events) -> pd.DataFrame:
+    return events.frame if isinstance(events, EventTimeline) else events
+
 
+F = TypeVar("F", bound=Callable[..., object])
 
-def filter_last_n_days(events: pd.DataFrame, days: int) -> pd.DataFrame:
+
+def _cached(fn: F) -> F:
+    # Results for an EventTimeline are shared through backend.cache, keyed
+    # on its slot and the arguments and valid for its data version and
+    # window, so newer data replaces the entry. Plain frames are computed
+    # every time.
+    namespace = f"stats.{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(events, *args, **kwargs):
+        if not isinstance(events, EventTimeline):
+            return fn(events, *args, **kwargs)
+        key = (namespace, events.slot, args, tuple(sorted(kwargs.items())))
+        return get_cache().get_or_compute(
+            key, events.cache_version, lambda: fn(events, *args, **kwargs)
+        )
+
+    return wrapper  # type: ignore[return-value]
+
+
+@traced()
+def filter_last_n_days(events: Events, days: int) -> pd.DataFrame:
     """
     Return events from the last N days based on timestamp_utc.
     Safe for pandas >= 2.0.
     """
+    if isinstance(events, EventTimeline):
+        return events.last_n_days(days).frame
+
     if events.empty or "timestamp_utc" not in events.columns:
         return events.iloc[0:0]
 
-    df = events.copy()
-    df["timestamp_utc"] = pd.to_datetime(
-        df["timestamp_utc"], utc=True, errors="coerce"
-    )
-    df = df.dropna(subset=["timestamp_utc"])
+    if isinstance(events["timestamp_utc"].dtype, pd.DatetimeTZDtype):
+        # Already parsed (compact frames); mask directly, no copy.
+        df = events
+    else:
+        df = events.copy()
+        df["timestamp_utc"] = parse_timestamps(df["timestamp_utc"])
+        df = df.dropna(subset=["timestamp_utc"])
 
-    cutoff = pd.Timestamp.utcnow() - pd.Timedelta(days=days)
+    cutoff = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=days)
     return df[df["timestamp_utc"] >= cutoff]
 
 
@@ -41,119 +226,443 @@ def filter_last_n_days(events: pd.DataFrame, days: int) -> pd.DataFrame:
 # Time series
 # ---------------------------------------------------------------------
 
-def daily_beer_counts(events: pd.DataFrame, days: int = 365) -> pd.DataFrame:
+@traced()
+def daily_beer_counts(events: Events, days: int = 365) -> pd.DataFrame:
     df = filter_last_n_days(events, days=days)
     if df.empty:
         return pd.DataFrame(columns=["date", "beer_count"])
 
-    df = df.copy()
-    df["date"] = df["timestamp_utc"].dt.normalize()
+    dates = df["timestamp_utc"].dt.normalize().rename("date")
 
     return (
-        df.groupby("date", as_index=False)["beer_count"]
+        df["beer_count"].groupby(dates, sort=True)
         .sum()
-        .sort_values("date")
+        .reset_index()
+    )
+
+
+def data_version(events: Events) -> Tuple:
+    """
+    Cheap token that changes whenever the events do: row count, newest
+    timestamp, total beers and highest event_id when ids are integers
+    (Postgres). Text ids (SQLiteStore UUIDs) have no meaningful maximum
+    and are left out.
+    """
+    df = _frame(events)
+    if df.empty:
+        return (0,)
+    ts = df["timestamp_utc"]
+    newest = ts.iloc[-1] if isinstance(events, EventTimeline) else ts.max()
+    token = (len(df), str(newest), int(df["beer_count"].sum()))
+    if "event_id" in df.columns and pd.api.types.is_integer_dtype(df["event_id"].dtype):
+        token += (int(df["event_id"].max()),)
+    return token
+
+
+def _build_calendar_grid(
+    timeline: EventTimeline, start: np.datetime64, end: np.datetime64
+) -> pd.DataFrame:
+    n_days = int((end - start).astype("int64")) + 1
+    window = timeline.between(
+        pd.Timestamp(start, tz="UTC"), pd.Timestamp(end + 1, tz="UTC")
+    ).frame
+
+    # One pass: day offset of every event, summed per day with bincount.
+    counts = np.zeros(n_days, dtype="int64")
+    if not window.empty:
+        day = window["timestamp_utc"].values.astype("datetime64[D]")
+        offset = (day - start).astype("int64")
+        counts = np.bincount(
+            offset, weights=window["beer_count"].to_numpy(), minlength=n_days
+        ).astype("int64")
+
+    days = np.arange(n_days, dtype="int64")
+    # 1970-01-01 was a Thursday (weekday 3).
+    weekday = ((start - EPOCH_DAY).astype("int64") + days + 3) % 7
+    # Columns run Monday to Sunday; the first one may be partial.
+    week_index = (days + weekday[0]) // 7
+
+    return pd.DataFrame(
+        {
+            "date": np.arange(start, end + 1, dtype="datetime64[D]").astype("datetime64[s]"),
+            "beer_count": counts.astype("int32"),
+            "weekday": weekday.astype("int8"),
+            "week_index": week_index.astype("int16"),
+        }
+    )
+
+
+@traced()
+def calendar_grid(
+    events: Events,
+    start=None,
+    end=None,
+    version: Optional[Hashable] = None,
+) -> pd.DataFrame:
+    """
+    One row per day from `start` to `end` (UTC dates, both inclusive),
+    days without beers included, for the Altair calendar heatmap:
+
+        date        datetime64, midnight of the day
+        beer_count  int32, beers logged that day
+        weekday     int8, Monday = 0 .. Sunday = 6
+        week_index  int16, calendar column, 0 for the week of `start`
+
+    `start` defaults to the first event's day and `end` to today. Grids
+    are cached per `version` (default: the timeline's) and range, so a
+    rerun on unchanged data does not rebin; the returned frame is shared,
+    so treat it as read-only.
+    """
+    timeline = events if isinstance(events, EventTimeline) else EventTimeline(events)
+
+    if end is None:
+        end = pd.Timestamp.now(tz="UTC")
+    if start is None:
+        start = timeline.frame["timestamp_utc"].iloc[0] if not timeline.empty else end
+    start_day = np.datetime64(as_utc(start).date(), "D")
+    end_day = np.datetime64(as_utc(end).date(), "D")
+    if end_day < start_day:
+        start_day = end_day
+
+    return get_cache().get_or_compute(
+        ("stats.calendar_grid", timeline.slot, start_day, end_day),
+        (timeline.version if version is None else version, timeline.window),
+        lambda: _build_calendar_grid(timeline, start_day, end_day),
     )
 
 
 # ---------------------------------------------------------------------
-# Leaderboards
+# Grouping engine
 # ---------------------------------------------------------------------
 
-def user_leaderboard(events: pd.DataFrame) -> pd.DataFrame:
-    if events.empty or "user_name" not in events.columns:
-        return pd.DataFrame(columns=["user_name", "total_beers", "total_gallons"])
+def _column_codes(col: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Integer codes (-1 for missing) and the values they index.
+    Categorical columns reuse their existing codes instead of re-hashing.
+    """
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.cat.codes.to_numpy(dtype="int64"), col.cat.categories.to_numpy()
+    codes, uniques = pd.factorize(col)
+    return codes.astype("int64", copy=False), np.asarray(uniques)
 
-    df = (
-        events.groupby("user_name", as_index=False)["beer_count"]
-        .sum()
-        .rename(columns={"beer_count": "total_beers"})
-        .sort_values("total_beers", ascending=False)
-        .reset_index(drop=True)
-    )
 
-    df = _add_volume_columns(df.rename(columns={"total_beers": "beer_count"}))
-    df = df.rename(columns={"beer_count": "total_beers"})
+def group_codes(
+    events: pd.DataFrame, keys: List[str]
+) -> Tuple[np.ndarray, np.ndarray, pd.DataFrame]:
+    """
+    Group every row by the distinct non-null combination of `keys`.
 
-    return df[["user_name", "total_beers", "total_gallons"]]
+    Each key column is turned into integer codes once and the codes are
+    packed into one int64 per row. Returns the mask of rows with no
+    missing key, the group code of each of those rows, and one row of key
+    values per group. Unused categories never show up.
+    """
+    packed: Optional[np.ndarray] = None
+    missing: Optional[np.ndarray] = None
+    values: List[np.ndarray] = []
+    sizes: List[int] = []
 
+    for key in keys:
+        codes, uniques = _column_codes(events[key])
+        size = max(len(uniques), 1)
+        missing = codes < 0 if missing is None else missing | (codes < 0)
+        packed = codes if packed is None else packed * size + codes
+        values.append(uniques)
+        sizes.append(size)
 
-def city_leaderboard(events: pd.DataFrame) -> pd.DataFrame:
-    if events.empty:
-        return pd.DataFrame(
-            columns=["city", "state", "country", "total_beers", "total_gallons"]
-        )
+    valid = ~missing
+    row_groups, group_packed = pd.factorize(packed[valid])
 
-    required = {"city", "country", "beer_count"}
-    if not required.issubset(events.columns):
-        return pd.DataFrame(
-            columns=["city", "state", "country", "total_beers", "total_gallons"]
-        )
+    out = {}
+    remainder = np.asarray(group_packed, dtype="int64")
+    for key, uniques, size in reversed(list(zip(keys, values, sizes))):
+        remainder, codes = np.divmod(remainder, size)
+        out[key] = uniques[codes]
 
-    df = events.dropna(subset=["city", "country"]).copy()
-    df["state"] = df["state"].fillna("")
+    return valid, row_groups, pd.DataFrame({key: out[key] for key in keys})
 
-    out = (
-        df.groupby(["city", "state", "country"], as_index=False)["beer_count"]
-        .sum()
-        .rename(columns={"beer_count": "total_beers"})
-        .sort_values("total_beers", ascending=False)
+
+def rank_rows(df: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """
+    Totals rows in leaderboard order: total descending, ties by key
+    ascending.
+    """
+    return (
+        df.sort_values(keys, kind="stable")
+        .sort_values("total_beers", ascending=False, kind="stable")
         .reset_index(drop=True)
     )
 
-    out = _add_volume_columns(out.rename(columns={"total_beers": "beer_count"}))
-    out = out.rename(columns={"beer_count": "total_beers"})
 
-    return out[["city", "state", "country", "total_beers", "total_gallons"]]
+def _after(df: pd.DataFrame, order: List[Tuple[str, bool]], cursor: Tuple) -> np.ndarray:
+    """
+    Mask of the rows that sort strictly after `cursor` (one value per
+    column of `order`, a list of (column, ascending) pairs).
+    """
+    later = np.zeros(len(df), dtype=bool)
+    for (col, ascending), value in reversed(list(zip(order, cursor))):
+        values = df[col]
+        beyond = values > value if ascending else values < value
+        later = (beyond | ((values == value) & later)).to_numpy(dtype=bool)
+    return later
+
+
+def top_rows(df: pd.DataFrame, limit: Optional[int]) -> pd.DataFrame:
+    """
+    The rows whose total reaches the limit-th largest, ties included so
+    the key tie-break stays exact, unsorted. Run before rank_rows():
+    partial selection is O(n) instead of O(n log n) for n >> limit.
+    """
+    if limit is None or len(df) <= limit:
+        return df
+    if limit <= 0:
+        return df.iloc[0:0]
+    totals = df["total_beers"].to_numpy()
+    kth = np.partition(totals, len(totals) - limit)[len(totals) - limit]
+    return df[totals >= kth]
+
+
+def _grouped_totals(
+    events: pd.DataFrame,
+    keys: List[str],
+    limit: Optional[int] = None,
+    after: Optional[Tuple] = None,
+) -> pd.DataFrame:
+    """
+    Sum beer_count per distinct non-null combination of `keys`, with a
+    single np.bincount over the packed group codes. Rows are ordered by
+    total descending, ties by key ascending.
+
+    `after` is a keyset cursor, (total_beers, *keys) of the last row
+    already shown (see page_cursor); only rows past it are returned, at
+    most `limit` of them.
+    """
+    valid, row_groups, df = group_codes(events, keys)
+
+    counts = events["beer_count"].to_numpy(dtype="float64")[valid]
+    totals = np.bincount(row_groups, weights=counts, minlength=len(df))
+    df["total_beers"] = totals.astype("int64")
 
+    if after is not None:
+        df = df[_after(df, _leaderboard_order(keys), after)]
+    ranked = rank_rows(top_rows(df, limit), keys)
+    return ranked if limit is None else ranked.head(limit)
 
-def beer_type_leaderboard(events: pd.DataFrame) -> pd.DataFrame:
-    if events.empty or "beer_type" not in events.columns:
-        return pd.DataFrame(columns=["beer_type", "total_beers", "total_gallons"])
 
-    df = events.dropna(subset=["beer_type"]).copy()
+def _leaderboard_order(keys: List[str]) -> List[Tuple[str, bool]]:
+    return [("total_beers", False)] + [(key, True) for key in keys]
 
-    out = (
-        df.groupby("beer_type", as_index=False)["beer_count"]
-        .sum()
-        .rename(columns={"beer_count": "total_beers"})
-        .sort_values("total_beers", ascending=False)
-        .reset_index(drop=True)
+
+def with_gallons(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add total_gallons to a totals frame, in place.
+    """
+    df["total_gallons"] = df["total_beers"] * LITERS_PER_BEER / LITERS_PER_GALLON
+    return df
+
+
+def _user_totals(events: pd.DataFrame, **page) -> pd.DataFrame:
+    if events.empty or "user_name" not in events.columns:
+        return pd.DataFrame(columns=["user_name", "total_beers", "total_gallons"])
+    return with_gallons(_grouped_totals(events, ["user_name"], **page))
+
+
+def _city_totals(events: pd.DataFrame, **page) -> pd.DataFrame:
+    columns = ["city", "state", "country", "total_beers", "total_gallons"]
+    if events.empty or not {"city", "country", "beer_count"}.issubset(events.columns):
+        return pd.DataFrame(columns=columns)
+
+    keyed = city_keys(events)
+    return with_gallons(_grouped_totals(keyed, ["city", "state", "country"], **page))[columns]
+
+
+def city_keys(events: pd.DataFrame) -> pd.DataFrame:
+    """
+    The city leaderboard's key columns plus beer_count. Missing states
+    group together with blank ones, as "".
+    """
+    state = events["state"] if "state" in events.columns else pd.Series("", index=events.index)
+    if isinstance(state.dtype, pd.CategoricalDtype) and "" not in state.cat.categories:
+        state = state.cat.add_categories("")
+    return pd.DataFrame(
+        {
+            "city": events["city"],
+            "state": state.fillna(""),
+            "country": events["country"],
+            "beer_count": events["beer_count"],
+        },
+        copy=False,
     )
 
-    out = _add_volume_columns(out.rename(columns={"total_beers": "beer_count"}))
-    out = out.rename(columns={"beer_count": "total_beers"})
 
-    return out[["beer_type", "total_beers", "total_gallons"]]
+def _single_key_totals(events: pd.DataFrame, key: str, **page) -> pd.DataFrame:
+    if events.empty or key not in events.columns:
+        return pd.DataFrame(columns=[key, "total_beers", "total_gallons"])
+    return with_gallons(_grouped_totals(events, [key], **page))
 
 
-def bar_leaderboard(events: pd.DataFrame) -> pd.DataFrame:
-    if events.empty or "bar_name" not in events.columns:
-        return pd.DataFrame(columns=["bar_name", "total_beers", "total_gallons"])
+def _heatmap_totals(events: pd.DataFrame) -> pd.DataFrame:
+    if events.empty or not {"latitude", "longitude", "beer_count"}.issubset(events.columns):
+        return pd.DataFrame(columns=["latitude", "longitude", "total_beers"])
+    return _grouped_totals(events, ["latitude", "longitude"])
 
-    df = events.dropna(subset=["bar_name"]).copy()
 
-    out = (
-        df.groupby("bar_name", as_index=False)["beer_count"]
-        .sum()
-        .rename(columns={"beer_count": "total_beers"})
-        .sort_values("total_beers", ascending=False)
-        .reset_index(drop=True)
+def _dominance_from_user_totals(users: pd.DataFrame) -> Dict[str, float]:
+    totals = users["total_beers"]
+    return dominance_from_totals(
+        top1=totals.iloc[:1].sum(),
+        top3=totals.iloc[:3].sum(),
+        total=totals.sum(),
     )
 
-    out = _add_volume_columns(out.rename(columns={"total_beers": "beer_count"}))
-    out = out.rename(columns={"beer_count": "total_beers"})
 
-    return out[["bar_name", "total_beers", "total_gallons"]]
+@dataclass(frozen=True)
+class StatsSummary:
+    """
+    Every aggregate the stats pages show, computed from one events frame.
+    """
+    user_leaderboard: pd.DataFrame
+    city_leaderboard: pd.DataFrame
+    beer_type_leaderboard: pd.DataFrame
+    bar_leaderboard: pd.DataFrame
+    heatmap_points: pd.DataFrame
+    benchmarks: Dict[str, float]
+    dominance: Dict[str, float]
+    benders: pd.DataFrame
+
+
+@traced()
+@_cached
+def compute_stats(
+    events: Events,
+    bender_threshold: int = 7,
+    limit: Optional[int] = None,
+) -> StatsSummary:
+    """
+    Compute all leaderboards, benchmarks, dominance, benders and heatmap
+    points in one pass over `events`, without copying the frame.
+
+    With `limit`, every leaderboard and the benders hold only their first
+    `limit` rows; dominance is still computed over everyone.
+    """
+    frame = _frame(events)
+    users = _user_totals(frame)
+
+    if users.empty:
+        dominance = {"top_1_pct": 0.0, "top_3_pct": 0.0, "everyone_else_pct": 0.0}
+    else:
+        dominance = _dominance_from_user_totals(users)
+
+    return StatsSummary(
+        user_leaderboard=users if limit is None else users.head(limit),
+        city_leaderboard=_city_totals(frame, limit=limit),
+        beer_type_leaderboard=_single_key_totals(frame, "beer_type", limit=limit),
+        bar_leaderboard=_single_key_totals(frame, "bar_name", limit=limit),
+        heatmap_points=_heatmap_totals(frame),
+        benchmarks=fun_benchmarks(frame),
+        dominance=dominance,
+        benders=bender_stats(events, threshold=bender_threshold, limit=limit),
+    )
+
+
+# ---------------------------------------------------------------------
+# Leaderboards
+# ---------------------------------------------------------------------
+
+# Leaderboards take `limit` (top-K rows only) and `after` (keyset cursor
+# from page_cursor(), rows past it only). A page is found by partial
+# selection, and only that page is sorted and returned.
+
+# Leaderboard name -> grouping keys.
+LEADERBOARD_KEYS: Dict[str, List[str]] = {
+    "user_leaderboard": ["user_name"],
+    "city_leaderboard": ["city", "state", "country"],
+    "beer_type_leaderboard": ["beer_type"],
+    "bar_leaderboard": ["bar_name"],
+}
+
+
+@traced()
+@_cached
+def user_leaderboard(
+    events: Events, limit: Optional[int] = None, after: Optional[Tuple] = None
+) -> pd.DataFrame:
+    return _user_totals(_frame(events), limit=limit, after=after)
+
+
+@traced()
+@_cached
+def city_leaderboard(
+    events: Events, limit: Optional[int] = None, after: Optional[Tuple] = None
+) -> pd.DataFrame:
+    return _city_totals(_frame(events), limit=limit, after=after)
+
+
+@traced()
+@_cached
+def beer_type_leaderboard(
+    events: Events, limit: Optional[int] = None, after: Optional[Tuple] = None
+) -> pd.DataFrame:
+    return _single_key_totals(_frame(events), "beer_type", limit=limit, after=after)
+
+
+@traced()
+@_cached
+def bar_leaderboard(
+    events: Events, limit: Optional[int] = None, after: Optional[Tuple] = None
+) -> pd.DataFrame:
+    return _single_key_totals(_frame(events), "bar_name", limit=limit, after=after)
+
+
+@traced()
+@_cached
+def leaderboard_count(events: Events, name: str) -> int:
+    """
+    Exact number of rows in the full `name` leaderboard (a
+    LEADERBOARD_KEYS key), without ranking them.
+    """
+    events = _frame(events)
+    keys = LEADERBOARD_KEYS[name]
+    if name == "city_leaderboard":
+        if events.empty or not {"city", "country"}.issubset(events.columns):
+            return 0
+        events = city_keys(events)
+    elif events.empty or not set(keys).issubset(events.columns):
+        return 0
+    return len(group_codes(events, keys)[2])
+
+
+def page_cursor(page: pd.DataFrame) -> Optional[Tuple]:
+    """
+    Keyset cursor for the page after `page`: the sort key of its last
+    row, (total_beers, *keys) for a leaderboard or (started_at,
+    user_name) for benders. None for an empty page.
+    """
+    if page.empty:
+        return None
+    last = page.iloc[-1]
+    if "started_at" in page.columns:
+        return (last["started_at"], last["user_name"])
+    keys = [col for col in page.columns if col not in ("total_beers", "total_gallons")]
+    return (int(last["total_beers"]), *(last[key] for key in keys))
 
 
 # ---------------------------------------------------------------------
 # Fun / derived stats
 # ---------------------------------------------------------------------
 
-def fun_benchmarks(events: pd.DataFrame) -> Dict[str, float]:
+@traced()
+@_cached
+def fun_benchmarks(events: Events) -> Dict[str, float]:
+    events = _frame(events)
     total_beers = int(events["beer_count"].sum()) if not events.empty else 0
+    return benchmarks_from_total(total_beers)
 
+
+def benchmarks_from_total(total_beers: int) -> Dict[str, float]:
+    """
+    fun_benchmarks() for a known total, so other engines can share it.
+    """
     calories = total_beers * 150
     pounds = calories / 3500 if calories else 0
     horses = pounds / 1000 if pounds else 0
@@ -170,23 +679,22 @@ def fun_benchmarks(events: pd.DataFrame) -> Dict[str, float]:
     }
 
 
-def dominance_stats(events: pd.DataFrame) -> Dict[str, float]:
+@traced()
+@_cached
+def dominance_stats(events: Events) -> Dict[str, float]:
+    events = _frame(events)
     if events.empty or "user_name" not in events.columns:
         return {"top_1_pct": 0.0, "top_3_pct": 0.0, "everyone_else_pct": 0.0}
+    return _dominance_from_user_totals(_user_totals(events))
 
-    totals = (
-        events.groupby("user_name")["beer_count"]
-        .sum()
-        .sort_values(ascending=False)
-    )
 
-    total = totals.sum()
+def dominance_from_totals(top1: float, top3: float, total: float) -> Dict[str, float]:
+    """
+    dominance_stats() from the top-1 and top-3 users' beers and the total.
+    """
     if total <= 0:
         return {"top_1_pct": 0.0, "top_3_pct": 0.0, "everyone_else_pct": 0.0}
 
-    top1 = totals.iloc[:1].sum()
-    top3 = totals.iloc[:3].sum()
-
     return {
         "top_1_pct": round(top1 / total * 100, 2),
         "top_3_pct": round(top3 / total * 100, 2),
@@ -194,43 +702,186 @@ def dominance_stats(events: pd.DataFrame) -> Dict[str, float]:
     }
 
 
-def bender_stats(events: pd.DataFrame, threshold: int = 7) -> pd.DataFrame:
-    if events.empty:
-        return pd.DataFrame(
-            columns=["timestamp_utc", "user_name", "beer_count", "city", "state", "country"]
-        )
+# ---------------------------------------------------------------------
+# Drinking sessions
+# ---------------------------------------------------------------------
 
-    df = events.copy()
-    df["timestamp_utc"] = pd.to_datetime(
-        df["timestamp_utc"], utc=True, errors="coerce"
-    )
-    df = df.dropna(subset=["timestamp_utc"])
+# Logs by one user less than this far apart belong to the same session.
+SESSION_GAP = pd.Timedelta(
+    minutes=float(os.environ.get("BEER_TRACKER_SESSION_GAP_MINUTES", "180"))
+)
 
-    out = df[df["beer_count"] >= threshold].copy()
-    return out.sort_values("timestamp_utc", ascending=False).reset_index(drop=True)
+SESSION_COLUMNS = [
+    "user_name",
+    "started_at",
+    "ended_at",
+    "duration_minutes",
+    "logs",
+    "total_beers",
+]
 
 
-# ---------------------------------------------------------------------
-# City heatmap
-# ---------------------------------------------------------------------
+def _session_bounds(
+    users: np.ndarray, ts: np.ndarray, beers: np.ndarray, gap: int
+) -> Tuple[np.ndarray, ...]:
+    """
+    Sessions over parallel arrays (user codes, int64 timestamps, beer
+    counts) already sorted by user, then time. Returns the index of each
+    session's first and last row, its log count and beer total.
+    """
+    n = len(users)
+    new_session = np.empty(n, dtype=bool)
+    new_session[0] = True
+    np.not_equal(users[1:], users[:-1], out=new_session[1:])
+    new_session[1:] |= np.diff(ts) > gap
+
+    starts = np.flatnonzero(new_session)
+    ends = np.append(starts[1:], n) - 1
+    logs = ends - starts + 1
+    totals = np.add.reduceat(beers, starts)
+    return starts, ends, logs, totals
+
+
+def _sessions_frame(
+    names: np.ndarray, starts_ts: np.ndarray, ends_ts: np.ndarray,
+    logs: np.ndarray, totals: np.ndarray, unit: str,
+) -> pd.DataFrame:
+    started = pd.to_datetime(starts_ts, unit=unit, utc=True)
+    ended = pd.to_datetime(ends_ts, unit=unit, utc=True)
+    return pd.DataFrame(
+        {
+            "user_name": names,
+            "started_at": started,
+            "ended_at": ended,
+            "duration_minutes": ((ended - started) / pd.Timedelta(minutes=1)).round(1),
+            "logs": logs.astype("int32"),
+            "total_beers": totals.astype("int64"),
+        }
+    )
+
 
-def city_heatmap_points(events: pd.DataFrame) -> pd.DataFrame:
+@traced()
+@_cached
+def drinking_sessions(
+    events: Events,
+    gap: pd.Timedelta = SESSION_GAP,
+    threshold: int = 7,
+    workers: Optional[int] = None,
+) -> pd.DataFrame:
     """
-    Returns latitude / longitude points for Folium heatmap.
+    Group every user's logs into sessions: a new session starts when the
+    user has not logged for longer than `gap`. One row per session
+    (SESSION_COLUMNS plus is_bender: total_beers >= threshold), newest
+    first.
+
+    Runs as array operations over one user-then-time ordering (diff for
+    the gaps, cumulative boundaries, reduceat for the totals). With
+    `workers` > 1 the users are sharded across a process pool, which only
+    pays off for histories of many millions of logs.
     """
-    if events.empty:
-        return pd.DataFrame(columns=["latitude", "longitude", "total_beers"])
+    df = _frame(events)
+    if df.empty or "user_name" not in df.columns:
+        return pd.DataFrame(columns=SESSION_COLUMNS + ["is_bender"])
+
+    timeline = events if isinstance(events, EventTimeline) else EventTimeline(df)
+    df = timeline.frame
+    ts_col = df["timestamp_utc"]
+    unit = ts_col.dt.unit
+    ts = ts_col.to_numpy(dtype=f"datetime64[{unit}]").view("int64")
+    gap_ticks = int(pd.Timedelta(gap) / pd.Timedelta(1, unit=unit))
+
+    codes, names = pd.factorize(df["user_name"], sort=False)
+    beers = df["beer_count"].to_numpy(dtype="int64")
+
+    # Rows are time-ordered, so a stable sort by user gives user-then-time.
+    # Rows without a user (code -1) sort first and are dropped.
+    order = np.argsort(codes, kind="stable")
+    order = order[np.searchsorted(codes[order], 0):]
+    if len(order) == 0:
+        return pd.DataFrame(columns=SESSION_COLUMNS + ["is_bender"])
+    users, ts, beers = codes[order], ts[order], beers[order]
+
+    if workers is not None and workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Split at user boundaries so every user's rows stay in one shard.
+        cuts = np.searchsorted(users, np.linspace(0, users[-1] + 1, workers + 1))
+        shards = [(lo, hi) for lo, hi in zip(cuts[:-1], cuts[1:]) if hi > lo]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(
+                _session_bounds,
+                [users[lo:hi] for lo, hi in shards],
+                [ts[lo:hi] for lo, hi in shards],
+                [beers[lo:hi] for lo, hi in shards],
+                [gap_ticks] * len(shards),
+            ))
+        # Shard row indices are relative to the shard; shift them back.
+        starts = np.concatenate([part[0] + lo for part, (lo, _) in zip(parts, shards)])
+        ends = np.concatenate([part[1] + lo for part, (lo, _) in zip(parts, shards)])
+        logs = np.concatenate([part[2] for part in parts])
+        totals = np.concatenate([part[3] for part in parts])
+    else:
+        starts, ends, logs, totals = _session_bounds(users, ts, beers, gap_ticks)
+
+    out = _sessions_frame(
+        np.asarray(names, dtype=object)[users[starts]],
+        ts[starts], ts[ends], logs, totals, unit,
+    )
+    out["is_bender"] = out["total_beers"] >= threshold
+    return _ranked_sessions(out)
 
-    required = {"latitude", "longitude", "beer_count"}
-    if not required.issubset(events.columns):
-        return pd.DataFrame(columns=["latitude", "longitude", "total_beers"])
 
-    df = events.dropna(subset=["latitude", "longitude"]).copy()
+# Session order: newest first, ties by user.
+_SESSION_ORDER = [("started_at", False), ("user_name", True)]
+
 
+def _ranked_sessions(sessions: pd.DataFrame) -> pd.DataFrame:
     return (
-        df.groupby(["latitude", "longitude"], as_index=False)["beer_count"]
-        .sum()
-        .rename(columns={"beer_count": "total_beers"})
-        .sort_values("total_beers", ascending=False)
+        sessions.sort_values("user_name", kind="stable")
+        .sort_values("started_at", ascending=False, kind="stable")
         .reset_index(drop=True)
     )
+
+
+@traced()
+@_cached
+def bender_stats(
+    events: Events,
+    threshold: int = 7,
+    gap: pd.Timedelta = SESSION_GAP,
+    limit: Optional[int] = None,
+    after: Optional[Tuple] = None,
+) -> pd.DataFrame:
+    """
+    Sessions (see drinking_sessions) with at least `threshold` beers,
+    newest first, so a night split over several logs still counts.
+    `limit` and `after` page through them as for the leaderboards.
+    """
+    sessions = drinking_sessions(events, gap=gap, threshold=threshold)
+    is_bender = sessions["is_bender"].astype(bool).to_numpy()
+    if after is not None:
+        is_bender = is_bender & _after(sessions, _SESSION_ORDER, after)
+    benders = sessions.loc[is_bender, SESSION_COLUMNS]
+    if limit is not None:
+        benders = benders.head(limit)
+    return benders.reset_index(drop=True)
+
+
+@traced()
+@_cached
+def bender_count(events: Events, threshold: int = 7, gap: pd.Timedelta = SESSION_GAP) -> int:
+    sessions = drinking_sessions(events, gap=gap, threshold=threshold)
+    return int(sessions["is_bender"].astype(bool).sum())
+
+
+# ---------------------------------------------------------------------
+# City heatmap
+# ---------------------------------------------------------------------
+
+@traced()
+@_cached
+def city_heatmap_points(events: Events) -> pd.DataFrame:
+    """
+    Returns latitude / longitude points for Folium heatmap.
+    """
+    return _heatmap_totals(_frame(events))
@@ -0,0 +1,226 @@
+"""
+Per-user daily streaks and rolling totals, maintained incrementally.
+
+StreakBoard keeps one row of UTC day bins per user in a dense integer
+matrix. Adding events only touches their (user, day) cells, and a
+user's longest streak is updated by measuring the run around a day that
+just became active, so nothing is recomputed over the full history.
+Rolling windows and current streaks are read off the last columns.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backend.frames import EPOCH_DAY, as_utc
+
+
+ROLLING_WINDOWS = (7, 30)
+
+METRIC_COLUMNS = [
+    "user_name",
+    "current_streak",
+    "longest_streak",
+    "beers_7d",
+    "beers_30d",
+    "avg_7d",
+    "avg_30d",
+    "active_days",
+    "total_beers",
+]
+
+
+def _day_numbers(timestamps: pd.Series) -> np.ndarray:
+    # Days since the epoch of each UTC timestamp.
+    ts = pd.to_datetime(timestamps, utc=True)
+    return (ts.values.astype("datetime64[D]") - EPOCH_DAY).astype("int64")
+
+
+def _day_number(ts) -> int:
+    return int((np.datetime64(as_utc(ts).date(), "D") - EPOCH_DAY).astype("int64"))
+
+
+def _today() -> int:
+    return _day_number(pd.Timestamp.now(tz="UTC"))
+
+
+def _trailing_run(active: np.ndarray) -> np.ndarray:
+    # Consecutive True values ending at the last column, per row.
+    idle = ~active[:, ::-1]
+    return np.where(idle.any(axis=1), idle.argmax(axis=1), active.shape[1])
+
+
+def _run_lengths(active: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row index and length of every run of True in a 2-D boolean matrix.
+    """
+    padded = np.zeros((active.shape[0], active.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = active
+    edges = np.diff(padded, axis=1)
+    starts = np.argwhere(edges == 1)
+    ends = np.argwhere(edges == -1)
+    # Both come back in row-major order, so they pair up run by run.
+    return starts[:, 0], ends[:, 1] - starts[:, 1]
+
+
+class StreakBoard:
+    """
+    Dense (user x day) beer counts with per-user totals and longest
+    streaks kept up to date as events are added.
+    """
+
+    def __init__(self) -> None:
+        self._users: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._origin = 0  # day number of column 0
+        self._counts = np.zeros((0, 0), dtype=np.int32)
+        self._longest = np.zeros(0, dtype=np.int32)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_events(cls, events: pd.DataFrame) -> "StreakBoard":
+        board = cls()
+        board.add(events)
+        return board
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    # -- storage -------------------------------------------------------
+
+    def _user_rows(self, names: np.ndarray) -> np.ndarray:
+        rows = np.empty(len(names), dtype=np.int64)
+        for i, name in enumerate(names):
+            row = self._index.get(name)
+            if row is None:
+                row = self._index[name] = len(self._users)
+                self._users.append(name)
+            rows[i] = row
+        return rows
+
+    def _fit(self, n_users: int, first_day: int, last_day: int) -> None:
+        # Grow the matrix (doubling, so appends stay amortised O(1)) to
+        # cover n_users rows and the day range [first_day, last_day].
+        rows, cols = self._counts.shape
+        if cols == 0:
+            self._origin = first_day
+        left = max(0, self._origin - first_day)
+        right = max(0, last_day - (self._origin + cols - 1))
+        if n_users <= rows and not left and not right:
+            return
+        new_rows = max(n_users, 2 * rows, 8) if n_users > rows else rows
+        new_cols = cols + left + (max(right, cols) if right else 0)
+        grown = np.zeros((new_rows, new_cols), dtype=np.int32)
+        grown[:rows, left:left + cols] = self._counts
+        self._counts = grown
+        self._origin -= left
+        longest = np.zeros(new_rows, dtype=np.int32)
+        longest[: len(self._longest)] = self._longest
+        self._longest = longest
+
+    def _run_through(self, row: int, col: int) -> int:
+        # Length of the active run containing (row, col).
+        line = self._counts[row] > 0
+        before = line[:col][::-1]
+        after = line[col + 1:]
+        left = int(np.argmin(before)) if not before.all() else len(before)
+        right = int(np.argmin(after)) if not after.all() else len(after)
+        return left + 1 + right
+
+    # -- updates -------------------------------------------------------
+
+    def add(self, events: pd.DataFrame) -> int:
+        """
+        Add events (user_name, timestamp_utc, beer_count). Returns the
+        number of (user, day) cells touched.
+        """
+        if events.empty:
+            return 0
+        with self._lock:
+            codes, uniques = pd.factorize(events["user_name"])
+            named = codes >= 0
+            if not named.all():
+                events, codes = events[named], codes[named]
+                if events.empty:
+                    return 0
+            days = _day_numbers(events["timestamp_utc"])
+            beers = events["beer_count"].to_numpy(dtype=np.int64)
+            rows = self._user_rows(np.asarray(uniques, dtype=object).astype(str))[codes]
+            self._fit(len(self._users), int(days.min()), int(days.max()))
+            cols = days - self._origin
+
+            # One entry per touched cell.
+            cells, cell_of = np.unique(rows * self._counts.shape[1] + cols, return_inverse=True)
+            added = np.bincount(cell_of, weights=beers).astype(np.int32)
+            cell_rows, cell_cols = np.divmod(cells, self._counts.shape[1])
+
+            was_idle = self._counts[cell_rows, cell_cols] == 0
+            self._counts[cell_rows, cell_cols] += added
+
+            became_active = was_idle & (added > 0)
+            if became_active.sum() > len(self._users):
+                # Bulk load: measure every run at once.
+                run_rows, lengths = _run_lengths(self._counts > 0)
+                self._longest[:] = 0
+                np.maximum.at(self._longest, run_rows, lengths.astype(np.int32))
+            else:
+                for row, col in zip(cell_rows[became_active], cell_cols[became_active]):
+                    run = self._run_through(int(row), int(col))
+                    if run > self._longest[row]:
+                        self._longest[row] = run
+            return len(cells)
+
+    # -- reads ---------------------------------------------------------
+
+    def metrics(self, today: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        One row per user (METRIC_COLUMNS), most beers in the last 30 days
+        first. The current streak counts consecutive active days ending
+        today, or yesterday when nothing is logged yet today. avg_* are
+        beers per day over the window.
+        """
+        day = _today() if today is None else _day_number(today)
+        with self._lock:
+            n = len(self._users)
+            if n == 0:
+                return pd.DataFrame(columns=METRIC_COLUMNS)
+            users = np.array(self._users, dtype=object)
+            counts = self._counts[:n]
+            longest = self._longest[:n].copy()
+            end = day - self._origin + 1
+
+        # Columns up to and including today, plus how many days between
+        # the last column and today have no column yet (all idle).
+        history = counts[:, : max(0, min(end, counts.shape[1]))]
+        gap = max(0, end - history.shape[1])
+        active = history > 0
+
+        if gap == 0:
+            from_today = _trailing_run(active)
+            current = np.where(from_today > 0, from_today, _trailing_run(active[:, :-1]))
+        elif gap == 1:
+            current = _trailing_run(active)
+        else:
+            current = np.zeros(n, dtype=np.int64)
+
+        out = {
+            "user_name": users,
+            "current_streak": current.astype(np.int32),
+            "longest_streak": longest,
+        }
+        for days in ROLLING_WINDOWS:
+            span = max(0, days - gap)
+            total = history[:, history.shape[1] - min(span, history.shape[1]):].sum(axis=1, dtype=np.int64)
+            out[f"beers_{days}d"] = total
+            out[f"avg_{days}d"] = np.round(total / days, 2)
+        out["active_days"] = (counts > 0).sum(axis=1).astype(np.int32)
+        out["total_beers"] = counts.sum(axis=1, dtype=np.int64)
+
+        return (
+            pd.DataFrame(out)[METRIC_COLUMNS]
+            .sort_values(["beers_30d", "current_streak", "user_name"], ascending=[False, False, True])
+            .reset_index(drop=True)
+        )
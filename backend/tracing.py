@@ -0,0 +1,315 @@
+"""
+Lightweight span tracing for page reruns.
+
+Enable with BEER_TRACKER_TRACE=1. A page calls begin_trace() at the top
+and end_trace() at the bottom; everything in between that is wrapped in
+span() / @traced, plus every SQL statement, becomes a span in that
+rerun's tree. Finished trees are appended to TRACE_PATH as one JSON
+object per line, and render_trace_panel() shows the last one.
+
+When tracing is disabled, @traced is a single flag check, span() returns
+a shared no-op, and no SQL hooks are installed.
+"""
+from __future__ import annotations
+
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+TRACING_ENABLED = os.environ.get("BEER_TRACKER_TRACE", "").strip().lower() in ("1", "true", "yes")
+TRACE_PATH = Path(os.environ.get("BEER_TRACKER_TRACE_PATH", "data/traces.jsonl"))
+
+# SQL text kept per span; enough to tell statements apart.
+MAX_STATEMENT_CHARS = 200
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class Span:
+    name: str
+    started: float = field(default_factory=time.perf_counter)
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    children: List["Span"] = field(default_factory=list)
+    duration_ms: Optional[float] = None
+
+    def finish(self) -> None:
+        self.duration_ms = round((time.perf_counter() - self.started) * 1000, 3)
+
+    @property
+    def self_ms(self) -> float:
+        """
+        Time not covered by any child span.
+        """
+        covered = sum(child.duration_ms or 0.0 for child in self.children)
+        return round(max((self.duration_ms or 0.0) - covered, 0.0), 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"name": self.name, "duration_ms": self.duration_ms}
+        if self.attrs:
+            out["attrs"] = self.attrs
+        if self.children:
+            out["children"] = [child.to_dict() for child in self.children]
+        return out
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("beer_tracker_span", default=None)
+_last_trace: ContextVar[Optional[Span]] = ContextVar("beer_tracker_last_trace", default=None)
+_write_lock = threading.Lock()
+
+
+class _SpanScope:
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span: Span):
+        self.span = span
+        self._token = None
+
+    def __enter__(self) -> Span:
+        parent = _current.get()
+        if parent is not None:
+            parent.children.append(self.span)
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.span.finish()
+        if exc_type is not None:
+            self.span.attrs["error"] = exc_type.__name__
+        _current.reset(self._token)
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NOOP = _NoopScope()
+
+
+def span(name: str, **attrs: Any):
+    """
+    Context manager timing a block as a child of the current span. A
+    no-op unless tracing is enabled and a trace is active.
+    """
+    if not TRACING_ENABLED or _current.get() is None:
+        return _NOOP
+    return _SpanScope(Span(name, attrs=attrs))
+
+
+def traced(name: Optional[str] = None) -> Callable[[F], F]:
+    """
+    Decorator: run the function inside span(name), defaulting to
+    "module.function".
+    """
+    def decorate(fn: F) -> F:
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not TRACING_ENABLED or _current.get() is None:
+                return fn(*args, **kwargs)
+            with _SpanScope(Span(label)):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+# ---------------------------------------------------------------------
+# Traces
+# ---------------------------------------------------------------------
+
+def begin_trace(name: str) -> None:
+    """
+    Start a new trace for this rerun. A trace left unfinished by an
+    earlier rerun (st.stop(), an exception) is dropped.
+    """
+    if not TRACING_ENABLED:
+        return
+    root = Span(name)
+    root.attrs["trace_id"] = uuid.uuid4().hex
+    _current.set(root)
+
+
+def end_trace() -> Optional[Span]:
+    """
+    Finish the active trace, append it to TRACE_PATH and return it.
+    """
+    if not TRACING_ENABLED:
+        return None
+    root = _current.get()
+    if root is None:
+        return None
+    # Only the root may be open here; it has no parent to return to.
+    root.finish()
+    _current.set(None)
+    _last_trace.set(root)
+    _write(root)
+    return root
+
+
+def last_trace() -> Optional[Span]:
+    return _last_trace.get()
+
+
+def _write(root: Span) -> None:
+    record = {"started_at": time.time() - (root.duration_ms or 0) / 1000, **root.to_dict()}
+    line = json.dumps(record, default=str)
+    with _write_lock:
+        TRACE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with TRACE_PATH.open("a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+
+
+def flatten(root: Span) -> List[Dict[str, Any]]:
+    """
+    Depth-first rows for display: span name indented by depth, total and
+    self time, and the SQL statement for query spans.
+    """
+    rows: List[Dict[str, Any]] = []
+
+    def walk(node: Span, depth: int) -> None:
+        rows.append(
+            {
+                "span": "  " * depth + node.name,
+                "duration_ms": node.duration_ms,
+                "self_ms": node.self_ms,
+                "detail": node.attrs.get("statement", ""),
+            }
+        )
+        for child in node.children:
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return rows
+
+
+# ---------------------------------------------------------------------
+# Query hooks
+# ---------------------------------------------------------------------
+
+def _statement(sql: str) -> str:
+    return " ".join(str(sql).split())[:MAX_STATEMENT_CHARS]
+
+
+def instrument_engine(engine) -> None:
+    """
+    Time every statement the SQLAlchemy engine runs as an "sql" span.
+    Does nothing when tracing is disabled.
+    """
+    if not TRACING_ENABLED:
+        return
+
+    from sqlalchemy import event
+
+    connecting = threading.local()
+
+    # New DBAPI connections (TLS handshake included) as "db.connect".
+    @event.listens_for(engine, "do_connect")
+    def _connecting(dialect, conn_rec, cargs, cparams):
+        connecting.scope = span("db.connect")
+        connecting.scope.__enter__()
+
+    @event.listens_for(engine, "connect")
+    def _connected(dbapi_connection, connection_record):
+        scope = getattr(connecting, "scope", None)
+        if scope is not None:
+            connecting.scope = None
+            scope.__exit__(None, None, None)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        scope = span("sql", statement=_statement(statement))
+        scope.__enter__()
+        conn.info.setdefault("_trace_scopes", []).append(scope)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        scopes = conn.info.get("_trace_scopes")
+        if scopes:
+            scopes.pop().__exit__(None, None, None)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        scopes = context.connection.info.get("_trace_scopes") if context.connection else None
+        if scopes:
+            scopes.pop().__exit__(type(context.original_exception), None, None)
+
+
+class TracedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        with span("sqlite", statement=_statement(sql)):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with span("sqlite", statement=_statement(sql), many=True):
+            return super().executemany(sql, seq_of_parameters)
+
+
+class TracedConnection(sqlite3.Connection):
+    """
+    sqlite3 connection whose statements become "sqlite" spans. Pass as
+    sqlite3.connect(factory=...).
+    """
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def sqlite_factory() -> type:
+    """
+    Connection class for sqlite3.connect(): traced when enabled.
+    """
+    return TracedConnection if TRACING_ENABLED else sqlite3.Connection
+
+
+# ---------------------------------------------------------------------
+# Developer panel
+# ---------------------------------------------------------------------
+
+def render_trace_panel() -> None:
+    """
+    Show the last finished trace of this session and the result cache
+    metrics in an expander. Does nothing when tracing is disabled.
+    """
+    if not TRACING_ENABLED:
+        return
+
+    # Imported lazily so the backend never needs Streamlit.
+    import pandas as pd
+    import streamlit as st
+
+    from backend.cache import get_cache
+
+    root = last_trace()
+    with st.expander("Trace (developer)"):
+        if root is None:
+            st.caption("No finished trace yet.")
+        else:
+            st.caption(f"{root.name}: {root.duration_ms:.1f} ms, written to {TRACE_PATH}")
+            st.dataframe(pd.DataFrame(flatten(root)), use_container_width=True, hide_index=True)
+
+        st.caption("Result cache (this process)")
+        st.dataframe(pd.DataFrame(get_cache().metrics()).T, use_container_width=True)
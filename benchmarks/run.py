@@ -0,0 +1,418 @@
+"""
+Benchmark suite for the stats and storage layers.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 10000,1000000 --repeat 5
+    python -m benchmarks.run --only stats.
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --pg-url postgresql://localhost/beer_scratch
+
+Every benchmark runs on seeded synthetic events (benchmarks.synthetic)
+for each size. Results are written as JSON; when a baseline file
+exists, each median is compared with the baseline median for the same
+benchmark and size, and anything slower by more than --threshold is
+reported as a regression.
+
+The Postgres benchmarks only run with --pg-url. That database must be a
+scratch one: its beer_events and daily rollup tables are truncated.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend import bootstrap, sql_stats, stats
+from backend.cube import TimeCube
+from backend.db import SQLiteStore
+from backend.frames import compact_events
+from backend.models import DrinkEvent
+from backend.spatial import HeatmapPyramid
+from backend.streaks import StreakBoard
+from benchmarks.synthetic import generate_events
+
+
+RESULTS_PATH = Path("benchmarks/results.json")
+BASELINE_PATH = Path("benchmarks/baseline.json")
+DEFAULT_SIZES = [10_000, 100_000]
+DEFAULT_REPEAT = 3
+
+# A result is a regression when its median is this much slower than the
+# baseline median (0.2 = 20%).
+DEFAULT_THRESHOLD = 0.2
+
+# Slowdowns smaller than this are timer noise, whatever the ratio.
+NOISE_FLOOR_S = 0.001
+
+# Single-row inserts timed per repeat; independent of the event count.
+INSERT_OPS = 1_000
+
+
+@dataclass
+class Result:
+    name: str
+    size: int
+    ops: int
+    times: List[float] = field(default_factory=list)
+
+    @property
+    def median_s(self) -> float:
+        return statistics.median(self.times)
+
+    @property
+    def min_s(self) -> float:
+        return min(self.times)
+
+    def to_dict(self) -> Dict:
+        out = asdict(self)
+        out["min_s"] = round(self.min_s, 6)
+        out["median_s"] = round(self.median_s, 6)
+        out["ops_per_s"] = round(self.ops / self.median_s, 1) if self.median_s > 0 else None
+        return out
+
+
+class Runner:
+    """
+    Times benchmarks whose name starts with `only` and collects results.
+    """
+
+    def __init__(self, repeat: int, only: str = ""):
+        self.repeat = repeat
+        self.only = only
+        self.results: List[Result] = []
+
+    def selected(self, name: str) -> bool:
+        return name.startswith(self.only)
+
+    def measure(
+        self,
+        name: str,
+        size: int,
+        fn: Callable[[], object],
+        ops: Optional[int] = None,
+        setup: Optional[Callable[[], None]] = None,
+        repeat: Optional[int] = None,
+    ) -> None:
+        if not self.selected(name):
+            return
+        result = Result(name, size, ops if ops is not None else size)
+        for _ in range(repeat or self.repeat):
+            if setup is not None:
+                setup()
+            started = time.perf_counter()
+            fn()
+            result.times.append(time.perf_counter() - started)
+        self.results.append(result)
+        print(
+            f"{result.name:<36} {result.size:>10,}  "
+            f"median {result.median_s * 1000:>10.2f} ms  "
+            f"min {result.min_s * 1000:>10.2f} ms"
+        )
+
+
+@contextlib.contextmanager
+def _working_dir(path: Path) -> Iterator[None]:
+    # bootstrap and SQLiteStore use paths relative to the app root.
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+# ---------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------
+
+STATS_CASES: Dict[str, Callable[[pd.DataFrame], object]] = {
+    "stats.EventTimeline": stats.EventTimeline,
+    "stats.filter_last_n_days": lambda events: stats.filter_last_n_days(events, days=30),
+    "stats.daily_beer_counts": lambda events: stats.daily_beer_counts(events, days=365),
+    "stats.user_leaderboard": stats.user_leaderboard,
+    "stats.city_leaderboard": stats.city_leaderboard,
+    "stats.beer_type_leaderboard": stats.beer_type_leaderboard,
+    "stats.bar_leaderboard": stats.bar_leaderboard,
+    "stats.bar_leaderboard[top25]": lambda events: stats.bar_leaderboard(events, limit=25),
+    "stats.leaderboard_count": lambda events: stats.leaderboard_count(events, "bar_leaderboard"),
+    "stats.fun_benchmarks": stats.fun_benchmarks,
+    "stats.dominance_stats": stats.dominance_stats,
+    "stats.bender_stats": stats.bender_stats,
+    "stats.drinking_sessions": stats.drinking_sessions,
+    "stats.city_heatmap_points": stats.city_heatmap_points,
+    "stats.compute_stats": stats.compute_stats,
+}
+
+
+def bench_stats(runner: Runner, raw: pd.DataFrame) -> None:
+    size = len(raw)
+    runner.measure("frames.compact_events", size, lambda: compact_events(raw.copy()))
+
+    events = compact_events(raw.copy())
+    for name, case in STATS_CASES.items():
+        runner.measure(name, size, lambda: case(events))
+
+    runner.measure("spatial.HeatmapPyramid.from_events", size, lambda: HeatmapPyramid.from_events(events))
+    pyramid = HeatmapPyramid.from_events(events)
+    runner.measure("spatial.HeatmapPyramid.cells", size, lambda: pyramid.cells(zoom=4))
+
+    runner.measure("streaks.StreakBoard.from_events", size, lambda: StreakBoard.from_events(events))
+    board = StreakBoard.from_events(events)
+    runner.measure("streaks.StreakBoard.metrics", size, board.metrics)
+
+    timeline = stats.EventTimeline(events)
+    runner.measure("cube.TimeCube", size, lambda: TimeCube(timeline))
+    cube = TimeCube(timeline)
+    last = pd.Timestamp(cube.last_day)
+    runner.measure(
+        "cube.TimeCube.leaderboard",
+        size,
+        lambda: cube.leaderboard("bar_leaderboard", last - pd.Timedelta(days=89), last),
+    )
+
+
+def bench_sqlite(runner: Runner, raw: pd.DataFrame, workdir: Path) -> None:
+    size = len(raw)
+    data_dir = workdir / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    raw.to_csv(data_dir / "beer_events.csv", index=False)
+
+    def drop_db() -> None:
+        for suffix in ("", "-wal", "-shm"):
+            (data_dir / f"beer_tracker.db{suffix}").unlink(missing_ok=True)
+
+    with _working_dir(workdir):
+        drop_db()
+        runner.measure(
+            "bootstrap.bootstrap_db_from_csv",
+            size,
+            bootstrap.bootstrap_db_from_csv,
+            setup=drop_db,
+        )
+        # The store benchmarks need the table loaded either way.
+        bootstrap.bootstrap_db_from_csv()
+
+        store = SQLiteStore(Path(bootstrap.DB_PATH))
+        try:
+            runner.measure("db.SQLiteStore.fetch_events", size, store.fetch_events)
+
+            def insert_rows() -> None:
+                for i in range(INSERT_OPS):
+                    store.insert_event(
+                        DrinkEvent.create(
+                            user_name=f"user_{i % 40:02d}",
+                            beer_count=1 + i % 4,
+                            beer_type="IPA",
+                            city="City 0",
+                            country="United States",
+                        )
+                    )
+
+            runner.measure("db.SQLiteStore.insert_event", size, insert_rows, ops=INSERT_OPS)
+        finally:
+            store.close()
+            drop_db()
+
+
+def bench_postgres(runner: Runner, raw: pd.DataFrame, workdir: Path) -> None:
+    # Imported lazily: services reads its settings at import time.
+    from sqlalchemy import text
+
+    from backend import services
+
+    size = len(raw)
+    csv_path = workdir / "beer_events_pg.csv"
+    raw.to_csv(csv_path, index=False)
+
+    services.ensure_schema()
+
+    def truncate() -> None:
+        with services.get_engine().begin() as conn:
+            tables = ", ".join(["beer_events", *services.ROLLUP_TABLES])
+            conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY"))
+        services.reset_event_cache()
+
+    def load() -> None:
+        bootstrap.import_csv(str(csv_path), target="postgres")
+
+    runner.measure("bootstrap.import_csv[postgres]", size, load, setup=truncate)
+    if not runner.selected("bootstrap.import_csv[postgres]"):
+        truncate()
+        load()
+
+    runner.measure(
+        "services.get_all_events[cold]",
+        size,
+        services.get_all_events,
+        setup=services.reset_event_cache,
+    )
+    engine = services.get_engine()
+    queries = {
+        "user_leaderboard": lambda: sql_stats.user_leaderboard(engine),
+        "city_leaderboard": lambda: sql_stats.city_leaderboard(engine),
+        "bar_leaderboard": lambda: sql_stats.bar_leaderboard(engine),
+        "dominance_stats": lambda: sql_stats.dominance_stats(engine),
+        "bender_stats": lambda: sql_stats.bender_stats(engine),
+        "daily_beer_counts": lambda: sql_stats.daily_beer_counts(engine),
+        "city_heatmap_points": lambda: sql_stats.city_heatmap_points(engine),
+    }
+    runner.measure(
+        "sql_stats.run_queries[serial]",
+        size,
+        lambda: sql_stats.run_queries(queries, max_workers=1),
+    )
+    runner.measure(
+        "sql_stats.run_queries[parallel]",
+        size,
+        lambda: sql_stats.run_queries(queries),
+    )
+    runner.measure(
+        "sql_stats.bar_leaderboard[top25]",
+        size,
+        lambda: sql_stats.bar_leaderboard(engine, limit=25),
+    )
+    page = sql_stats.bar_leaderboard(engine, limit=25)
+    runner.measure(
+        "sql_stats.bar_leaderboard[page2]",
+        size,
+        lambda: sql_stats.bar_leaderboard(engine, limit=25, after=stats.page_cursor(page)),
+    )
+    runner.measure(
+        "services.export_events_to_csv",
+        size,
+        lambda: services.export_events_to_csv(str(workdir / "export.csv")),
+    )
+    truncate()
+
+
+# ---------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------
+
+def _metadata(args: argparse.Namespace) -> Dict:
+    return {
+        "created_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "sizes": args.sizes,
+    }
+
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float) -> List[Dict]:
+    """
+    Median ratio (current / baseline) for every benchmark present in both,
+    flagged as a regression above 1 + threshold (and NOISE_FLOOR_S).
+    """
+    previous = {(r["name"], r["size"]): r for r in baseline}
+    rows = []
+    for result in results:
+        base = previous.get((result["name"], result["size"]))
+        if base is None or base["median_s"] <= 0:
+            continue
+        ratio = result["median_s"] / base["median_s"]
+        rows.append(
+            {
+                "name": result["name"],
+                "size": result["size"],
+                "baseline_s": base["median_s"],
+                "current_s": result["median_s"],
+                "ratio": round(ratio, 3),
+                "regression": (
+                    ratio > 1 + threshold
+                    and result["median_s"] - base["median_s"] > NOISE_FLOOR_S
+                ),
+            }
+        )
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=DEFAULT_SIZES,
+        help="Comma-separated event counts (default: 10000,100000).",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", default="", help="Only run benchmarks whose name starts with this.")
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Also write results to --baseline.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with status 1 when any benchmark regressed.",
+    )
+    parser.add_argument(
+        "--pg-url",
+        default=None,
+        help="Scratch Postgres database for the Postgres benchmarks (tables are truncated).",
+    )
+    args = parser.parse_args(argv)
+
+    if args.pg_url:
+        os.environ["SUPABASE_DATABASE_URL"] = args.pg_url
+
+    runner = Runner(args.repeat, args.only)
+    for size in args.sizes:
+        runner.measure(
+            "synthetic.generate_events",
+            size,
+            lambda: generate_events(size, seed=args.seed),
+            repeat=1,
+        )
+        raw = generate_events(size, seed=args.seed)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_stats(runner, raw)
+            bench_sqlite(runner, raw, Path(tmp))
+            if args.pg_url:
+                bench_postgres(runner, raw, Path(tmp))
+
+    payload = {
+        "meta": _metadata(args),
+        "results": [result.to_dict() for result in runner.results],
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(payload, indent=2))
+    print(f"Wrote {len(payload['results'])} results to {args.output}")
+
+    regressions = []
+    if args.baseline.exists() and args.baseline != args.output:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        rows = compare(payload["results"], baseline, args.threshold)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['name']:<36} {row['size']:>10,}  x{row['ratio']:<7} {flag}")
+        regressions = [row for row in rows if row["regression"]]
+        print(f"{len(regressions)} regressions against {args.baseline}")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(payload, indent=2))
+        print(f"Saved baseline to {args.baseline}")
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Seeded synthetic beer events for benchmarks.
+
+Popularity is Zipf-skewed the way the real data is: a few regulars log
+most beers, most logs come from a handful of cities and bars, and
+beer_count is mostly 1-3 with a long tail of benders.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.db import EVENT_COLUMNS
+
+
+N_USERS = 40
+N_CITIES = 300
+N_BARS = 800
+BEER_TYPES = [
+    "IPA", "Lager", "Pilsner", "Stout", "Porter", "Sour",
+    "Wheat", "Pale Ale", "Amber", "Saison", "Cider", "Other",
+]
+COUNTRIES = ["United States", "Germany", "France", "United Kingdom", "Italy", "Mexico"]
+STATES = ["CA", "NY", "TX", "IL", "WA", "MA", "CO", "FL"]
+
+# Share of logs with no bar, and of cities the geocoder never resolved.
+NO_BAR_RATE = 0.3
+UNGEOCODED_CITY_RATE = 0.1
+
+
+def _zipf_weights(n: int, s: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+
+def generate_events(
+    n: int,
+    seed: int = 0,
+    days: int = 730,
+    end: Optional[pd.Timestamp] = None,
+) -> pd.DataFrame:
+    """
+    `n` events spread over the `days` days before `end` (default now),
+    in EVENT_COLUMNS order and the same raw dtypes read_sql returns
+    (object text, int64 counts, float64 coordinates), oldest first.
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.now(tz="UTC") if end is None else pd.Timestamp(end)
+
+    # Places: every city gets a country, a state for US cities, and fixed
+    # coordinates unless it is one the geocoder could not resolve.
+    city_country = rng.choice(len(COUNTRIES), N_CITIES, p=_zipf_weights(len(COUNTRIES), 1.5))
+    city_state = np.where(
+        city_country == 0,
+        rng.choice(np.array(STATES, dtype=object), N_CITIES),
+        None,
+    )
+    city_lat = rng.uniform(-60, 70, N_CITIES)
+    city_lon = rng.uniform(-180, 180, N_CITIES)
+    city_lat[rng.random(N_CITIES) < UNGEOCODED_CITY_RATE] = np.nan
+    city_lon[np.isnan(city_lat)] = np.nan
+    bar_city = rng.choice(N_CITIES, N_BARS, p=_zipf_weights(N_CITIES, 1.1))
+
+    users = rng.choice(N_USERS, n, p=_zipf_weights(N_USERS, 1.1))
+    bars = rng.choice(N_BARS, n, p=_zipf_weights(N_BARS, 1.0))
+    no_bar = rng.random(n) < NO_BAR_RATE
+    cities = np.where(no_bar, rng.choice(N_CITIES, n, p=_zipf_weights(N_CITIES, 1.1)), bar_city[bars])
+
+    # Mostly evenings, uniformly over the window.
+    day_offsets = rng.integers(0, days, n)
+    seconds = np.clip(rng.normal(21 * 3600, 3 * 3600, n), 0, 86_399).astype("int64")
+    start = end.normalize() - pd.Timedelta(days=days)
+    timestamps = start + pd.to_timedelta(day_offsets * 86_400 + seconds, unit="s")
+
+    beer_count = np.minimum(rng.geometric(0.45, n), 15)
+
+    df = pd.DataFrame(
+        {
+            "event_id": np.arange(1, n + 1, dtype="int64"),
+            "timestamp_utc": timestamps,
+            "user_name": np.array([f"user_{i:02d}" for i in range(N_USERS)], dtype=object)[users],
+            "beer_count": beer_count.astype("int64"),
+            "beer_type": np.array(BEER_TYPES, dtype=object)[
+                rng.choice(len(BEER_TYPES), n, p=_zipf_weights(len(BEER_TYPES), 0.9))
+            ],
+            "bar_name": np.where(
+                no_bar, None, np.array([f"Bar {i}" for i in range(N_BARS)], dtype=object)[bars]
+            ),
+            "city": np.array([f"City {i}" for i in range(N_CITIES)], dtype=object)[cities],
+            "state": city_state[cities],
+            "country": np.array(COUNTRIES, dtype=object)[city_country[cities]],
+            "latitude": city_lat[cities],
+            "longitude": city_lon[cities],
+        }
+    )
+    df = df.sort_values("timestamp_utc", kind="stable").reset_index(drop=True)
+    df["event_id"] = np.arange(1, n + 1, dtype="int64")
+    return df[EVENT_COLUMNS]
@@ -1,5 +1,6 @@
 import streamlit as st
-from backend.services import log_beers
+from backend.services import log_beers, get_geocode_worker
+from backend.tracing import begin_trace, end_trace, render_trace_panel
 
 
 USER_OPTIONS = [
@@ -87,6 +88,8 @@ COUNTRY_OPTIONS = [
 ]
 
 
+begin_trace("pages/1_Log_Beers")
+
 st.title("Log Beers")
 
 with st.expander("Beer Tracker 9000 Rules", expanded=True):
@@ -216,3 +219,10 @@ with st.form("log_beers_form"):
                     st.success(f"{user_name} had {bc} in {city.strip()}, {country.strip()}.")
             else:
                 st.success(f"{bc}? well done lad")
+
+            pending = get_geocode_worker().queue_depth()
+            if pending:
+                st.caption(f"Map location lookup queued ({pending} pending).")
+
+end_trace()
+render_trace_panel()
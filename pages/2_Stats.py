@@ -1,55 +1,184 @@
 import streamlit as st
-import io
+import functools
+import tempfile
 import pandas as pd
 import altair as alt
 import folium
 from folium.plugins import HeatMap
 from streamlit_folium import st_folium
 
+from backend import sql_stats, stats
 from backend.services import (
-    get_all_events,
+    LEADERBOARD_ROLLUPS,
+    get_events_versioned,
+    get_daily_rollups,
+    get_engine,
+    get_heatmap_pyramid,
+    get_rollup_heatmap_pyramid,
+    get_rollup_streak_board,
+    get_streak_board,
     export_events_to_csv,
 )
+from backend.cube import time_cube
+from backend.replica import get_read_replica
+from backend.snapshot import STATS_COLUMNS, read_snapshot
+from backend.spatial import HeatmapPyramid
+from backend.streaks import StreakBoard
+from backend.tracing import begin_trace, end_trace, render_trace_panel, span
 from backend.stats import (
-    user_leaderboard,
-    city_leaderboard,
-    bar_leaderboard,
-    beer_type_leaderboard,
-    fun_benchmarks,
-    dominance_stats,
+    EVENTS_SOURCE,
+    STATS_ENGINE,
+    LEADERBOARD_KEYS,
+    EventTimeline,
+    compute_stats,
+    bender_count,
     bender_stats,
-    daily_beer_counts,
-    city_heatmap_points,
+    calendar_grid,
+    leaderboard_count,
 )
+from ui.paging import PAGE_SIZE, render_paged_table
+
+begin_trace("pages/2_Stats")
 
 st.title("Stats & Leaderboards")
 
 # ---- Load data ----
 
-events = get_all_events()
+# In snapshot mode the page never touches the database, so the rollup
+# and SQL engines fall back to pandas over the snapshot. The local
+# replica has no rollup table, but SQL pushdown runs against it.
+# Against the database, only the pandas engine loads raw events: the
+# rollup and SQL engines serve every widget from the daily rollups or a
+# query, and find benders in the database.
+# Stats results are cached per data version. The database cache hands
+# out its version; for the other sources it is derived from the events.
+version = None
+if EVENTS_SOURCE == "snapshot":
+    events = read_snapshot(columns=STATS_COLUMNS)
+    engine = "pandas"
+elif EVENTS_SOURCE == "replica":
+    replica = get_read_replica()
+    replica.sync_if_stale()
+    events = replica.read_events()
+    engine = "pandas" if STATS_ENGINE == "rollup" else STATS_ENGINE
+elif STATS_ENGINE == "pandas":
+    events, version = get_events_versioned()
+    engine = STATS_ENGINE
+else:
+    # The "user" rollup holds every beer; the other grains are loaded
+    # for their leaderboards below.
+    events = get_daily_rollups("user")
+    engine = STATS_ENGINE
+
+# Whether `events` holds the raw per-log rows or the "user" daily rollup.
+raw_events = EVENTS_SOURCE != "database" or engine == "pandas"
+
+if EVENTS_SOURCE == "replica":
+    freshness = replica.freshness()
+    st.caption(
+        f"Local replica: {freshness['rows']:,} events, "
+        f"synced {freshness['age_seconds']:.0f}s ago."
+    )
 
 if events.empty:
     st.info("No beers logged yet. Fix that.")
     st.stop()
 
+# Timestamps are parsed and sorted once; every window below is a slice.
+# `agg` feeds the aggregates, `timeline` whatever needs per-log rows.
+agg = EventTimeline(events, version=version)
+timeline = agg if raw_events else None
+
+# What each leaderboard is grouped from: `agg`, or its grain's rollup.
+boards = {
+    name: agg
+    if raw_events or LEADERBOARD_ROLLUPS[name] == "user"
+    else EventTimeline(get_daily_rollups(LEADERBOARD_ROLLUPS[name]))
+    for name in LEADERBOARD_KEYS
+}
+
+calendar_since = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=365)
+
+# Leaderboards and benders are paged: only the first PAGE_SIZE rows of
+# each are computed up front, deeper pages are fetched by keyset cursor,
+# and the row counts come from separate count queries.
+
+# "sql" runs every aggregate query in the database one after another;
+# "parallel" sends them concurrently and waits for the slowest.
+if engine in ("sql", "parallel"):
+    source = replica if EVENTS_SOURCE == "replica" else get_engine()
+    queries = {
+        "fun_benchmarks": lambda: sql_stats.fun_benchmarks(source),
+        "dominance_stats": lambda: sql_stats.dominance_stats(source),
+        "bender_stats": lambda: sql_stats.bender_stats(source, threshold=7, limit=PAGE_SIZE),
+        "bender_count": lambda: sql_stats.bender_count(source, threshold=7),
+        "daily_beer_counts": lambda: sql_stats.daily_beer_counts(source, since=calendar_since),
+        "city_heatmap_points": lambda: sql_stats.city_heatmap_points(source),
+    }
+    for name in LEADERBOARD_KEYS:
+        queries[name] = functools.partial(getattr(sql_stats, name), source, limit=PAGE_SIZE)
+        queries[f"{name}_count"] = functools.partial(sql_stats.leaderboard_count, source, name)
+    run = sql_stats.run_queries(queries, max_workers=1 if engine == "sql" else None)
+
+    first_pages = {name: run.results[name] for name in LEADERBOARD_KEYS}
+    counts = {name: run.results[f"{name}_count"] for name in LEADERBOARD_KEYS}
+    fetch = {
+        name: functools.partial(getattr(sql_stats, name), source, limit=PAGE_SIZE)
+        for name in LEADERBOARD_KEYS
+    }
+    benchmarks = run.results["fun_benchmarks"]
+    dom = run.results["dominance_stats"]
+    benders = run.results["bender_stats"]
+    benders_total = run.results["bender_count"]
+    fetch_benders = functools.partial(
+        sql_stats.bender_stats, source, threshold=7, limit=PAGE_SIZE
+    )
+    # Day totals are events-shaped enough for calendar_grid.
+    daily_agg = EventTimeline(
+        run.results["daily_beer_counts"].rename(columns={"date": "timestamp_utc"})
+    )
+    st.caption(
+        f"{len(run.timings_ms)} queries on {run.workers} worker(s): "
+        f"{run.wall_ms:.0f} ms wall clock, {run.serial_ms:.0f} ms of query time."
+    )
+    with st.expander("Query timings"):
+        st.dataframe(run.timings(), use_container_width=True, hide_index=True)
+else:
+    summary = compute_stats(agg, bender_threshold=7, limit=PAGE_SIZE)
+    first_pages = {
+        name: getattr(summary, name)
+        if boards[name] is agg
+        else getattr(stats, name)(boards[name], limit=PAGE_SIZE)
+        for name in LEADERBOARD_KEYS
+    }
+    counts = {name: leaderboard_count(boards[name], name) for name in LEADERBOARD_KEYS}
+    fetch = {
+        name: functools.partial(getattr(stats, name), boards[name], limit=PAGE_SIZE)
+        for name in LEADERBOARD_KEYS
+    }
+    benchmarks = summary.benchmarks
+    dom = summary.dominance
+    if raw_events:
+        benders = summary.benders
+        benders_total = bender_count(timeline, threshold=7)
+        fetch_benders = functools.partial(bender_stats, timeline, threshold=7, limit=PAGE_SIZE)
+    else:
+        # Sessions need the per-log rows; find them in the database.
+        benders = sql_stats.bender_stats(get_engine(), threshold=7, limit=PAGE_SIZE)
+        benders_total = sql_stats.bender_count(get_engine(), threshold=7)
+        fetch_benders = functools.partial(
+            sql_stats.bender_stats, get_engine(), threshold=7, limit=PAGE_SIZE
+        )
+    daily_agg = agg
+
 # ---- Calendar Heatmap (Last 365 Days) ----
 
 st.header("Beer Logging Activity (Last 365 Days)")
 
-daily = daily_beer_counts(events, days=365)
-
-if not daily.empty:
-    cal = daily.copy()
-    cal["weekday"] = cal["date"].dt.weekday  # Mon=0 .. Sun=6
-
-    iso = cal["date"].dt.isocalendar()
-    cal["iso_year"] = iso.year.astype(int)
-    cal["iso_week"] = iso.week.astype(int)
-
-    cal["week_index"] = (
-        (cal["iso_year"] - cal["iso_year"].min()) * 53 + cal["iso_week"]
-    )
+# Dense day grid, rebuilt only when the data changes.
+cal = calendar_grid(daily_agg, start=calendar_since)
 
+if cal["beer_count"].any():
     heatmap = (
         alt.Chart(cal)
         .mark_rect()
@@ -81,7 +210,8 @@ if not daily.empty:
         .properties(height=160)
     )
 
-    st.altair_chart(heatmap, use_container_width=True)
+    with span("altair.calendar"):
+        st.altair_chart(heatmap, use_container_width=True)
 else:
     st.info("No activity in the last year.")
 
@@ -91,30 +221,58 @@ st.divider()
 
 st.header("Beer Consumption Heatmap (by City)")
 
-@st.cache_data(show_spinner=True)
-def load_city_heatmap(events_df: pd.DataFrame) -> pd.DataFrame:
-    return city_heatmap_points(events_df)
+# Cells come from a zoom-level pyramid; only the current view's cells,
+# capped at MAX_CELLS, are sent to the browser. The database pyramid is
+# process-wide and updated incrementally as events arrive.
+if engine in ("sql", "parallel"):
+    pyramid = HeatmapPyramid.from_events(
+        run.results["city_heatmap_points"].rename(columns={"total_beers": "beer_count"})
+    )
+elif EVENTS_SOURCE == "database":
+    pyramid = get_heatmap_pyramid() if raw_events else get_rollup_heatmap_pyramid()
+else:
+    pyramid = HeatmapPyramid.from_events(timeline.frame)
 
-city_points = load_city_heatmap(events)
+view = st.session_state.get("heatmap_view", {"zoom": 2, "bounds": None, "center": None})
+cells = pyramid.cells(zoom=view["zoom"], bounds=view["bounds"])
 
-if city_points.empty:
+if cells.empty and view["bounds"] is None:
     st.info("Not enough location data to render heatmap.")
 else:
-    center_lat = city_points["latitude"].mean()
-    center_lon = city_points["longitude"].mean()
+    if view["center"] is not None:
+        center = view["center"]
+    else:
+        center = [cells["latitude"].mean(), cells["longitude"].mean()]
 
-    m = folium.Map(location=[center_lat, center_lon], zoom_start=2)
-
-    heat_data = city_points[["latitude", "longitude", "total_beers"]].values.tolist()
+    m = folium.Map(location=center, zoom_start=view["zoom"])
 
     HeatMap(
-        heat_data,
+        cells[["latitude", "longitude", "total_beers"]].values.tolist(),
         radius=25,
         blur=15,
         min_opacity=0.3,
     ).add_to(m)
 
-    st_folium(m, width=700, height=500)
+    with span("folium.render"):
+        state = st_folium(
+            m,
+            width=700,
+            height=500,
+            key="heatmap",
+            returned_objects=["zoom", "bounds", "center"],
+        )
+
+    # Re-bin for the new view only when the user actually panned or zoomed.
+    if state and state.get("bounds") and state.get("zoom") is not None:
+        sw, ne = state["bounds"]["_southWest"], state["bounds"]["_northEast"]
+        new_view = {
+            "zoom": int(state["zoom"]),
+            "bounds": tuple(round(v, 4) for v in (sw["lat"], sw["lng"], ne["lat"], ne["lng"])),
+            "center": [state["center"]["lat"], state["center"]["lng"]],
+        }
+        if (new_view["zoom"], new_view["bounds"]) != (view["zoom"], view["bounds"]):
+            st.session_state["heatmap_view"] = new_view
+            st.rerun()
 
 st.divider()
 
@@ -122,21 +280,20 @@ st.divider()
 
 st.header("Leaderboards")
 
-st.subheader("By Person")
-st.dataframe(user_leaderboard(events), use_container_width=True)
-
-st.subheader("By City")
-st.dataframe(city_leaderboard(events), use_container_width=True)
-
-st.subheader("By Beer Type")
-st.dataframe(beer_type_leaderboard(events), use_container_width=True)
-
-st.subheader("By Bar")
-bar_lb = bar_leaderboard(events)
-if bar_lb.empty:
-    st.info("No bars logged yet.")
-else:
-    st.dataframe(bar_lb, use_container_width=True)
+for name, title, empty_message in [
+    ("user_leaderboard", "By Person", None),
+    ("city_leaderboard", "By City", None),
+    ("beer_type_leaderboard", "By Beer Type", None),
+    ("bar_leaderboard", "By Bar", "No bars logged yet."),
+]:
+    st.subheader(title)
+    render_paged_table(
+        name,
+        lambda after, name=name: fetch[name](after=after),
+        counts[name],
+        first_page=first_pages[name],
+        empty_message=empty_message,
+    )
 
 st.divider()
 
@@ -144,8 +301,6 @@ st.divider()
 
 st.header("Fun Stats")
 
-benchmarks = fun_benchmarks(events)
-
 col1, col2, col3, col4, col5, col6 = st.columns(6)
 
 with col1:
@@ -167,8 +322,6 @@ st.divider()
 
 st.header("Dominance")
 
-dom = dominance_stats(events)
-
 d1, d2, d3 = st.columns(3)
 
 with d1:
@@ -180,16 +333,86 @@ with d3:
 
 st.divider()
 
-# ---- Bender Detection ----
+# ---- Custom Window ----
+
+st.header("Pick a Window")
+
+# Built once per data version; every window after that is a subtraction
+# of two per-day running totals, so moving the dates is instant. Over the
+# rollups each leaderboard gets the cube of its own grain.
+cube = time_cube(agg)
+cubes = {name: time_cube(boards[name]) for name in LEADERBOARD_KEYS}
+today = pd.Timestamp.now(tz="UTC").date()
+first_day = min(pd.Timestamp(cube.first_day).date(), today)
+
+picked = st.date_input(
+    "Dates (UTC, inclusive)",
+    value=(max(first_day, today - pd.Timedelta(days=29)), today),
+    min_value=first_day,
+    max_value=today,
+    key="stats_window",
+)
 
-st.header("Bender Detection (7+ beers in one log)")
+# The picker returns one date while the second is still being chosen.
+if isinstance(picked, (tuple, list)) and len(picked) == 2:
+    window_start, window_end = picked
+else:
+    window_start = window_end = picked[0] if isinstance(picked, (tuple, list)) else picked
+
+w_bench = cube.fun_benchmarks(window_start, window_end)
+w_dom = cube.dominance_stats(window_start, window_end)
+
+w1, w2, w3 = st.columns(3)
+with w1:
+    st.metric("Beers", w_bench["total_beers"])
+with w2:
+    st.metric("Top 1 (%)", w_dom["top_1_pct"])
+with w3:
+    st.metric("Total Spent ($)", w_bench["total_spent_usd"])
+
+tabs = st.tabs(["Person", "City", "Beer Type", "Bar"])
+for tab, name in zip(tabs, LEADERBOARD_KEYS):
+    with tab:
+        board = cubes[name].leaderboard(name, window_start, window_end, limit=PAGE_SIZE)
+        st.dataframe(board, use_container_width=True)
+        st.caption(
+            f"Top {len(board):,} of "
+            f"{cubes[name].leaderboard_count(name, window_start, window_end):,}"
+        )
+
+st.divider()
+
+# ---- Streaks ----
 
-benders = bender_stats(events, threshold=7)
+st.header("Streaks & Rolling Totals")
 
-if benders.empty:
-    st.info("No benders logged yet. Hard to believe.")
+# The database boards are process-wide and only touch the (user, day)
+# cells that changed: of new logs, or of rollup cells polled since.
+if EVENTS_SOURCE == "database":
+    board = get_streak_board() if raw_events else get_rollup_streak_board()
+    streaks = board.metrics()
 else:
-    st.dataframe(benders, use_container_width=True)
+    streaks = StreakBoard.from_events(timeline.frame).metrics()
+
+st.caption(
+    "Streaks count consecutive UTC days with a log, up to today (or "
+    "yesterday if today has none yet). Averages are beers per day."
+)
+st.dataframe(streaks, use_container_width=True, hide_index=True)
+
+st.divider()
+
+# ---- Bender Detection ----
+
+st.header("Bender Detection (7+ beers in one session)")
+
+render_paged_table(
+    "bender_stats",
+    lambda after: fetch_benders(after=after),
+    benders_total,
+    first_page=benders,
+    empty_message="No benders logged yet. Hard to believe.",
+)
 
 st.divider()
 
@@ -197,15 +420,22 @@ st.divider()
 
 st.subheader("Secondary cache - disregard")
 
-if st.button("Backup"):
-    buffer = io.StringIO()
-    export_events_to_csv(buffer)
+# Plain CSV by default: it drops straight back in as data/beer_events.csv.
+compress = st.checkbox("Compress (gzip)", key="backup_gzip")
 
-    csv_bytes = buffer.getvalue().encode("utf-8")
+if st.button("Backup"):
+    # Stream the CSV to disk; only the finished file is loaded for the
+    # download.
+    with tempfile.TemporaryFile() as fh:
+        export_events_to_csv(fh, gzip=compress)
+        fh.seek(0)
+
+        st.download_button(
+            label="Download CSV",
+            data=fh.read(),
+            file_name="beer_events.csv.gz" if compress else "beer_events.csv",
+            mime="application/gzip" if compress else "text/csv",
+        )
 
-    st.download_button(
-        label="Download CSV",
-        data=csv_bytes,
-        file_name="beer_events.csv",
-        mime="text/csv",
-    )
+end_trace()
+render_trace_panel()
@@ -1,47 +1,88 @@
 import streamlit as st
+import functools
 import pandas as pd
 import altair as alt
 
-from backend.services import get_all_events
+from backend import sql_stats, stats
+from backend.services import (
+    LEADERBOARD_ROLLUPS,
+    get_daily_rollups,
+    get_engine,
+    get_events_since,
+)
+from backend.replica import get_read_replica
+from backend.snapshot import STATS_COLUMNS, read_snapshot
+from backend.tracing import begin_trace, end_trace, render_trace_panel, span
 from backend.stats import (
-    filter_last_n_days,
-    daily_beer_counts,
-    user_leaderboard,
-    city_leaderboard,
-    bar_leaderboard,
-    beer_type_leaderboard,
-    fun_benchmarks,
-    dominance_stats,
+    EVENTS_SOURCE,
+    STATS_ENGINE,
+    LEADERBOARD_KEYS,
+    EventTimeline,
+    calendar_grid,
+    compute_stats,
+    bender_count,
     bender_stats,
+    leaderboard_count,
 )
+from ui.paging import PAGE_SIZE, render_paged_table
+
+begin_trace("pages/3_Stats_Last_30_Days")
 
 st.title("Stats (Last 30 Days)")
 
-events = get_all_events()
-events_30d = filter_last_n_days(events, days=30)
+since_30d = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=30)
+
+# Only the 30-day window is loaded. In snapshot mode the page never
+# touches the database, so the rollup and SQL engines fall back to
+# pandas over the snapshot. The local replica has no rollup table, but
+# SQL pushdown runs against it.
+if EVENTS_SOURCE == "snapshot":
+    events_30d = read_snapshot(columns=STATS_COLUMNS, since=since_30d)
+    engine = "pandas"
+elif EVENTS_SOURCE == "replica":
+    replica = get_read_replica()
+    replica.sync_if_stale()
+    events_30d = replica.read_events(since=since_30d)
+    engine = "pandas" if STATS_ENGINE == "rollup" else STATS_ENGINE
+else:
+    events_30d = get_events_since(since_30d)
+    engine = STATS_ENGINE
+
+if EVENTS_SOURCE == "replica":
+    freshness = replica.freshness()
+    st.caption(
+        f"Local replica: {freshness['rows']:,} events, "
+        f"synced {freshness['age_seconds']:.0f}s ago."
+    )
 
 if events_30d.empty:
     st.info("No beers logged in the last 30 days. Hydration arc?")
     st.stop()
 
+events_30d = EventTimeline(events_30d)
+
+# Aggregates can come from the daily rollups instead of raw events: the
+# "user" rollup for totals, each leaderboard's grain for that board.
+# Bender detection always needs the raw per-log rows.
+if engine == "rollup":
+    agg_30d = EventTimeline(get_daily_rollups("user", since=since_30d))
+    boards_30d = {
+        name: agg_30d
+        if grain == "user"
+        else EventTimeline(get_daily_rollups(grain, since=since_30d))
+        for name, grain in LEADERBOARD_ROLLUPS.items()
+    }
+else:
+    agg_30d = events_30d
+    boards_30d = {name: agg_30d for name in LEADERBOARD_KEYS}
+
 st.header("Beer Logging Activity (Last 30 Days)")
 
-daily = daily_beer_counts(events_30d, days=30)
+cal = calendar_grid(agg_30d, start=since_30d)
 
-if daily.empty:
+if not cal["beer_count"].any():
     st.info("No activity in the last 30 days.")
 else:
-    cal = daily.copy()
-    cal["weekday"] = cal["date"].dt.weekday
-
-    iso = cal["date"].dt.isocalendar()
-    cal["iso_year"] = iso.year.astype(int)
-    cal["iso_week"] = iso.week.astype(int)
-
-    cal["week_index"] = (
-        (cal["iso_year"] - cal["iso_year"].min()) * 53 + cal["iso_week"]
-    )
-
     heatmap = (
         alt.Chart(cal)
         .mark_rect()
@@ -72,33 +113,94 @@ else:
         .properties(height=160)
     )
 
-    st.altair_chart(heatmap, use_container_width=True)
+    with span("altair.calendar"):
+        st.altair_chart(heatmap, use_container_width=True)
 
 st.divider()
 
-st.header("Leaderboards (Last 30 Days)")
-
-st.subheader("By Person")
-st.dataframe(user_leaderboard(events_30d), use_container_width=True)
-
-st.subheader("By City")
-st.dataframe(city_leaderboard(events_30d), use_container_width=True)
+# "sql" runs every aggregate query in the database one after another;
+# "parallel" sends them concurrently and waits for the slowest.
+if engine in ("sql", "parallel"):
+    source = replica if EVENTS_SOURCE == "replica" else get_engine()
+    since = since_30d
+    queries = {
+        "fun_benchmarks": lambda: sql_stats.fun_benchmarks(source, since=since),
+        "dominance_stats": lambda: sql_stats.dominance_stats(source, since=since),
+        "bender_stats": lambda: sql_stats.bender_stats(
+            source, threshold=7, since=since, limit=PAGE_SIZE
+        ),
+        "bender_count": lambda: sql_stats.bender_count(source, threshold=7, since=since),
+    }
+    for name in LEADERBOARD_KEYS:
+        queries[name] = functools.partial(
+            getattr(sql_stats, name), source, since=since, limit=PAGE_SIZE
+        )
+        queries[f"{name}_count"] = functools.partial(
+            sql_stats.leaderboard_count, source, name, since=since
+        )
+    run = sql_stats.run_queries(queries, max_workers=1 if engine == "sql" else None)
+
+    first_pages = {name: run.results[name] for name in LEADERBOARD_KEYS}
+    counts = {name: run.results[f"{name}_count"] for name in LEADERBOARD_KEYS}
+    fetch = {
+        name: functools.partial(getattr(sql_stats, name), source, since=since, limit=PAGE_SIZE)
+        for name in LEADERBOARD_KEYS
+    }
+    benchmarks = run.results["fun_benchmarks"]
+    dom = run.results["dominance_stats"]
+    benders = run.results["bender_stats"]
+    benders_total = run.results["bender_count"]
+    fetch_benders = functools.partial(
+        sql_stats.bender_stats, source, threshold=7, since=since, limit=PAGE_SIZE
+    )
+    st.caption(
+        f"{len(run.timings_ms)} queries on {run.workers} worker(s): "
+        f"{run.wall_ms:.0f} ms wall clock, {run.serial_ms:.0f} ms of query time."
+    )
+else:
+    summary = compute_stats(agg_30d, bender_threshold=7, limit=PAGE_SIZE)
+    first_pages = {
+        name: getattr(summary, name)
+        if boards_30d[name] is agg_30d
+        else getattr(stats, name)(boards_30d[name], limit=PAGE_SIZE)
+        for name in LEADERBOARD_KEYS
+    }
+    counts = {name: leaderboard_count(boards_30d[name], name) for name in LEADERBOARD_KEYS}
+    fetch = {
+        name: functools.partial(getattr(stats, name), boards_30d[name], limit=PAGE_SIZE)
+        for name in LEADERBOARD_KEYS
+    }
+    benchmarks = summary.benchmarks
+    dom = summary.dominance
+    if agg_30d is events_30d:
+        benders = summary.benders
+    else:
+        benders = bender_stats(events_30d, threshold=7, limit=PAGE_SIZE)
+    benders_total = bender_count(events_30d, threshold=7)
+    fetch_benders = functools.partial(bender_stats, events_30d, threshold=7, limit=PAGE_SIZE)
 
-st.subheader("By Beer Type")
-st.dataframe(beer_type_leaderboard(events_30d), use_container_width=True)
+st.header("Leaderboards (Last 30 Days)")
 
-st.subheader("By Bar")
-bar_lb = bar_leaderboard(events_30d)
-if bar_lb.empty:
-    st.info("No bars logged yet.")
-else:
-    st.dataframe(bar_lb, use_container_width=True)
+# Session keys differ from the all-time page so each keeps its own place.
+for name, title, empty_message in [
+    ("user_leaderboard", "By Person", None),
+    ("city_leaderboard", "By City", None),
+    ("beer_type_leaderboard", "By Beer Type", None),
+    ("bar_leaderboard", "By Bar", "No bars logged yet."),
+]:
+    st.subheader(title)
+    render_paged_table(
+        f"{name}_30d",
+        lambda after, name=name: fetch[name](after=after),
+        counts[name],
+        first_page=first_pages[name],
+        empty_message=empty_message,
+    )
 
 st.divider()
 
 st.header("Fun Stats (Last 30 Days)")
 
-benchmarks = fun_benchmarks(events_30d)
 col1, col2, col3, col4, col5, col6 = st.columns(6)
 
 with col1:
@@ -117,7 +219,6 @@ with col6:
 st.divider()
 
 st.header("Dominance (Last 30 Days)")
-dom = dominance_stats(events_30d)
 
 d1, d2, d3 = st.columns(3)
 with d1:
@@ -129,10 +230,15 @@ with d3:
 
 st.divider()
 
-st.header("Bender Detection (Last 30 Days)")
-benders = bender_stats(events_30d, threshold=7)
+st.header("Bender Detection (7+ beers in one session, Last 30 Days)")
 
-if benders.empty:
-    st.info("No benders logged yet. Hard to believe.")
-else:
-    st.dataframe(benders, use_container_width=True)
+render_paged_table(
+    "bender_stats_30d",
+    lambda after: fetch_benders(after=after),
+    benders_total,
+    first_page=benders,
+    empty_message="No benders logged yet. Hard to believe.",
+)
+
+end_trace()
+render_trace_panel()
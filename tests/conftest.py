@@ -0,0 +1,57 @@
+"""
+Shared fixtures.
+
+Tests that need a real Postgres run against the URL in
+BEER_TRACKER_TEST_DATABASE_URL, each module in a scratch schema that is
+dropped afterwards, and are skipped when it is unset.
+"""
+from __future__ import annotations
+
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+
+
+PG_URL_ENV = "BEER_TRACKER_TEST_DATABASE_URL"
+
+
+@pytest.fixture(scope="session")
+def services():
+    # backend.services reads SUPABASE_DATABASE_URL at import but only
+    # connects on first use; tests hand it their own engine.
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("SUPABASE_DATABASE_URL", os.environ.get(PG_URL_ENV, "postgresql://unused"))
+        from backend import services
+    return services
+
+
+@pytest.fixture(scope="module")
+def pg_engine():
+    url = os.environ.get(PG_URL_ENV)
+    if not url:
+        pytest.skip(f"{PG_URL_ENV} is not set")
+
+    schema = f"beer_tracker_test_{uuid.uuid4().hex[:12]}"
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={schema}"}, future=True)
+    with engine.begin() as conn:
+        conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+    yield engine
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+    engine.dispose()
+
+
+@pytest.fixture
+def pg_services(services, pg_engine, monkeypatch):
+    # backend.services on the scratch schema, migrated and emptied.
+    monkeypatch.setattr(services, "_engine", pg_engine)
+    monkeypatch.setattr(services, "_schema_ready", False)
+    services.ensure_schema()
+    with pg_engine.begin() as conn:
+        tables = ", ".join(["beer_events", *services.ROLLUP_TABLES])
+        conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY"))
+    services.reset_event_cache()
+    yield services
+    services.reset_event_cache()
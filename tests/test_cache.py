@@ -0,0 +1,110 @@
+"""
+VersionedCache: version checks, LRU eviction, TTL expiry and metrics.
+"""
+from __future__ import annotations
+
+import pytest
+
+from backend import cache as cache_module
+from backend.cache import VersionedCache
+
+
+class _Clock:
+    # Stand-in for time.monotonic that only moves when told to.
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+class _Counter:
+    # compute() stand-in that returns how often it has been called.
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self) -> int:
+        self.calls += 1
+        return self.calls
+
+
+def test_hit_for_same_version(clock):
+    cache, compute = VersionedCache(), _Counter()
+    assert cache.get_or_compute(("ns", 1), "v1", compute) == 1
+    assert cache.get_or_compute(("ns", 1), "v1", compute) == 1
+    assert compute.calls == 1
+    assert cache.metrics()["ns"] == {
+        "hits": 1,
+        "misses": 1,
+        "stale": 0,
+        "expired": 0,
+        "evictions": 0,
+        "invalidations": 0,
+        "hit_rate": 0.5,
+    }
+
+
+def test_version_mismatch_recomputes_in_place(clock):
+    cache, compute = VersionedCache(), _Counter()
+    cache.get_or_compute(("ns", 1), "v1", compute)
+    assert cache.get_or_compute(("ns", 1), "v2", compute) == 2
+    # The new version replaced the old entry instead of adding one.
+    assert len(cache) == 1
+    assert cache.get_or_compute(("ns", 1), "v2", compute) == 2
+    metrics = cache.metrics()["ns"]
+    assert (metrics["hits"], metrics["misses"], metrics["stale"]) == (1, 2, 1)
+
+
+def test_lru_eviction(clock):
+    cache, compute = VersionedCache(maxsize=2), _Counter()
+    cache.get_or_compute(("ns", "a"), 0, compute)
+    cache.get_or_compute(("ns", "b"), 0, compute)
+    # Touch "a" so "b" is the least recently used.
+    cache.get_or_compute(("ns", "a"), 0, compute)
+    cache.get_or_compute(("ns", "c"), 0, compute)
+
+    assert len(cache) == 2
+    assert cache.metrics()["ns"]["evictions"] == 1
+    calls = compute.calls
+    cache.get_or_compute(("ns", "a"), 0, compute)
+    assert compute.calls == calls
+    cache.get_or_compute(("ns", "b"), 0, compute)
+    assert compute.calls == calls + 1
+
+
+def test_ttl_expiry(clock):
+    cache, compute = VersionedCache(ttl=10), _Counter()
+    cache.get_or_compute(("ns", 1), 0, compute)
+    cache.get_or_compute(("short", 1), 0, compute, ttl=1)
+
+    clock.now += 5
+    cache.get_or_compute(("ns", 1), 0, compute)
+    cache.get_or_compute(("short", 1), 0, compute)
+    assert compute.calls == 3
+    assert cache.metrics()["short"]["expired"] == 1
+
+    clock.now += 10
+    cache.get_or_compute(("ns", 1), 0, compute)
+    assert compute.calls == 4
+    metrics = cache.metrics()["ns"]
+    assert (metrics["hits"], metrics["misses"], metrics["expired"]) == (1, 2, 1)
+
+
+def test_invalidate_by_namespace(clock):
+    cache, compute = VersionedCache(), _Counter()
+    for key in [("a", 1), ("a", 2), ("b", 1)]:
+        cache.get_or_compute(key, 0, compute)
+    assert cache.invalidate("a") == 2
+    assert len(cache) == 1
+    metrics = cache.metrics()
+    assert metrics["a"]["invalidations"] == 2
+    assert metrics["total"]["entries"] == 1
+    assert metrics["total"]["misses"] == 3
+    assert cache.invalidate() == 1
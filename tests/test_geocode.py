@@ -0,0 +1,164 @@
+"""
+GeocodeCache on a local SQLiteStore file, and GeocodeWorker with the
+offline FakeGeocoder.
+"""
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from backend.db import SQLiteStore
+from backend.geocode import FakeGeocoder, GeocodeWorker
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(tmp_path / "events.db")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def cache(store):
+    return store.geocode_cache()
+
+
+def test_store_shares_one_cache(store, cache):
+    assert store.geocode_cache() is cache
+
+
+def test_hit_and_miss(cache):
+    assert cache.get("Berlin", None, "Germany") is None
+    cache.put("Berlin", None, "Germany", 52.52, 13.405)
+    # Keys are normalized, so spacing and case do not matter.
+    assert cache.get("  berlin ", "", "GERMANY") == (52.52, 13.405)
+    counters = cache.stats()
+    assert (counters["lookups"], counters["hits"], counters["misses"]) == (2, 1, 1)
+
+
+def test_not_found_is_cached(cache):
+    cache.put("Atlantis", None, None, None, None)
+    assert cache.get("Atlantis", None, None) == (None, None)
+    assert cache.stats()["negative_hits"] == 1
+
+
+def test_entries_expire(cache):
+    cache.put("Paris", None, "France", 48.85, 2.35)
+    cache.hit_ttl = 0
+    time.sleep(0.01)
+    assert cache.get("Paris", None, "France") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_warm_keeps_existing_entries(cache):
+    cache.put("Rome", None, "Italy", 41.9, 12.5)
+    offered = cache.warm(
+        [
+            ("Rome", None, "Italy", 0.0, 0.0),
+            ("Milan", None, "Italy", 45.46, 9.19),
+            ("milan", None, "italy", 1.0, 1.0),
+            ("Nowhere", None, None, None, None),
+        ]
+    )
+    assert offered == 2
+    assert cache.get("Rome", None, "Italy") == (41.9, 12.5)
+    assert cache.get("Milan", None, "Italy") == (45.46, 9.19)
+
+
+def test_cache_persists_in_the_store_file(store, cache):
+    cache.put("Oslo", None, "Norway", 59.91, 10.75)
+    store.close()
+    reopened = SQLiteStore(store.db_path)
+    try:
+        assert reopened.geocode_cache().get("Oslo", None, "Norway") == (59.91, 10.75)
+    finally:
+        reopened.close()
+
+
+# ---------------------------------------------------------------------
+# GeocodeWorker
+# ---------------------------------------------------------------------
+
+class _Resolved:
+    # on_resolved stand-in that records what the worker wrote.
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, event_ids, latitude, longitude):
+        self.calls.append((event_ids, latitude, longitude))
+
+
+class _FlakyGeocoder(FakeGeocoder):
+    # Raises on the first `failures` calls, then answers normally.
+    def __init__(self, known, failures):
+        super().__init__(known)
+        self.failures = failures
+
+    def geocode(self, query, exactly_one=True, timeout=10):
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError(query)
+        return super().geocode(query, exactly_one, timeout)
+
+
+def _run(worker, jobs):
+    worker.start()
+    try:
+        for job in jobs:
+            worker.submit(*job)
+        worker.join()
+    finally:
+        worker.stop(timeout=5)
+
+
+def test_worker_resolves_and_caches(cache):
+    geocoder = FakeGeocoder({"Berlin, Germany": (52.52, 13.405)})
+    resolved = _Resolved()
+    worker = GeocodeWorker(geocoder, resolved, cache=cache, min_interval=0)
+    _run(worker, [([1, 2], "Berlin", None, "Germany"), ([3], "Atlantis", None, None)])
+
+    assert resolved.calls == [((1, 2), 52.52, 13.405)]
+    counters = worker.stats()
+    assert (counters["submitted"], counters["resolved"], counters["not_found"]) == (2, 1, 1)
+    assert counters["queue_depth"] == 0
+    assert cache.get("Atlantis", None, None) == (None, None)
+
+    # A second job for a cached location never reaches the geocoder.
+    _run(worker, [([4], "berlin", None, "germany")])
+    assert geocoder.queries == ["Berlin, Germany", "Atlantis"]
+    assert resolved.calls[-1] == ((4,), 52.52, 13.405)
+
+
+def test_worker_retries_then_gives_up():
+    resolved = _Resolved()
+    flaky = _FlakyGeocoder({"Rome, Italy": (41.9, 12.5)}, failures=1)
+    worker = GeocodeWorker(flaky, resolved, min_interval=0, max_attempts=3)
+    _run(worker, [([1], "Rome", None, "Italy")])
+    assert resolved.calls == [((1,), 41.9, 12.5)]
+    assert worker.stats()["retried"] == 1
+
+    down = _FlakyGeocoder({}, failures=10)
+    worker = GeocodeWorker(down, resolved, min_interval=0, max_attempts=2)
+    _run(worker, [([2], "Rome", None, "Italy")])
+    assert len(down.queries) == 0
+    assert worker.stats()["failed"] == 1
+    assert worker.queue_depth() == 0
+
+
+def test_worker_survives_a_failing_writer():
+    def on_resolved(event_ids, latitude, longitude):
+        raise RuntimeError("database is locked")
+
+    worker = GeocodeWorker(FakeGeocoder({"Oslo": (59.91, 10.75)}), on_resolved, min_interval=0)
+    _run(worker, [([1], "Oslo", None, None), ([2], "Oslo", None, None)])
+    assert worker.stats()["failed"] == 2
+
+
+def test_worker_throttles_network_calls():
+    geocoder = FakeGeocoder()
+    worker = GeocodeWorker(geocoder, _Resolved(), min_interval=0.05)
+    started = time.monotonic()
+    _run(worker, [([i], f"City {i}", None, None) for i in range(3)])
+    assert len(geocoder.queries) == 3
+    assert time.monotonic() - started >= 0.1
@@ -0,0 +1,109 @@
+"""
+ReadReplica against a local SQLite stand-in for the hosted beer_events.
+"""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from backend import sql_stats
+from backend.db import EVENT_COLUMNS, TIMESTAMP_FORMAT
+from backend.replica import ReadReplica
+from benchmarks.synthetic import generate_events
+
+
+def _upload(engine, df: pd.DataFrame) -> None:
+    df = df[EVENT_COLUMNS].assign(timestamp_utc=df["timestamp_utc"].dt.strftime(TIMESTAMP_FORMAT))
+    df.to_sql("beer_events", engine, if_exists="append", index=False)
+
+
+@pytest.fixture
+def raw() -> pd.DataFrame:
+    return generate_events(500, seed=5, days=60)
+
+
+@pytest.fixture
+def upstream(raw, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'upstream.db'}")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                CREATE TABLE beer_events (
+                    event_id INTEGER PRIMARY KEY,
+                    timestamp_utc TEXT NOT NULL,
+                    user_name TEXT NOT NULL,
+                    beer_count INTEGER NOT NULL,
+                    beer_type TEXT,
+                    bar_name TEXT,
+                    city TEXT,
+                    state TEXT,
+                    country TEXT,
+                    latitude REAL,
+                    longitude REAL
+                )
+                """
+            )
+        )
+    _upload(engine, raw)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def replica(upstream, tmp_path):
+    replica = ReadReplica(upstream=upstream, db_path=tmp_path / "replica.db", max_age=60)
+    yield replica
+    replica.close()
+
+
+def test_sync_copies_every_row(replica, raw):
+    assert replica.is_stale()
+    result = replica.sync(batch_size=64)
+    assert result.rows_pulled == len(raw)
+    assert result.last_event_id == len(raw)
+
+    events = replica.read_events()
+    assert events["event_id"].tolist() == raw["event_id"].tolist()
+    assert events["beer_count"].sum() == raw["beer_count"].sum()
+    pd.testing.assert_series_equal(
+        events["timestamp_utc"], raw["timestamp_utc"].astype(events["timestamp_utc"].dtype)
+    )
+    assert replica.freshness()["rows"] == len(raw)
+    assert not replica.is_stale()
+    assert replica.sync_if_stale() is None
+
+
+def test_sync_pulls_new_and_refreshed_rows(replica, upstream, raw):
+    replica.sync()
+    newer = generate_events(20, seed=6, days=1).assign(event_id=lambda df: df["event_id"] + len(raw))
+    _upload(upstream, newer)
+    with upstream.begin() as conn:
+        conn.execute(text("UPDATE beer_events SET latitude = 1.5, longitude = 2.5 WHERE event_id = 1"))
+    replica.sync()
+
+    events = replica.read_events()
+    assert len(events) == len(raw) + len(newer)
+    # Event 1 is inside the refreshed tail, so its new coordinates arrive.
+    assert events.loc[events["event_id"] == 1, ["latitude", "longitude"]].iloc[0].tolist() == [1.5, 2.5]
+
+
+def test_resync_drops_rows_deleted_upstream(replica, upstream, raw):
+    replica.sync()
+    with upstream.begin() as conn:
+        conn.execute(text("DELETE FROM beer_events WHERE event_id <= 10"))
+    replica.resync()
+    assert replica.freshness()["rows"] == len(raw) - 10
+
+
+def test_read_events_since(replica, raw):
+    replica.sync()
+    since = raw["timestamp_utc"].iloc[-1] - pd.Timedelta(days=7)
+    assert len(replica.read_events(since=since)) == int((raw["timestamp_utc"] >= since).sum())
+
+
+def test_sql_stats_run_on_the_replica(replica, raw):
+    replica.sync()
+    users = sql_stats.user_leaderboard(replica)
+    assert users["total_beers"].sum() == raw["beer_count"].sum()
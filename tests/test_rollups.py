@@ -0,0 +1,121 @@
+"""
+The per-grain daily rollups in backend.services against raw events, and
+the rollup streak board and heatmap pyramid kept current by polling.
+Needs Postgres (BEER_TRACKER_TEST_DATABASE_URL).
+"""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from backend import stats
+from backend.db import EVENT_COLUMNS
+from backend.spatial import HeatmapPyramid
+from backend.streaks import StreakBoard
+from benchmarks.synthetic import generate_events
+
+
+@pytest.fixture
+def raw() -> pd.DataFrame:
+    return generate_events(3000, seed=4, days=120)
+
+
+@pytest.fixture
+def loaded(pg_services, pg_engine, raw):
+    records = raw[EVENT_COLUMNS].drop(columns=["event_id"])
+    records = records.astype(object).where(records.notna(), None)
+    pg_services.bulk_insert_events([records.to_dict("records")])
+    # As if loaded a while ago, so polls only see what the test changes.
+    with pg_engine.begin() as conn:
+        for table in pg_services.ROLLUP_TABLES:
+            conn.execute(text(f"UPDATE {table} SET updated_at = updated_at - interval '1 hour'"))
+    return pg_services
+
+
+def _same_pyramid(got: HeatmapPyramid, expected: HeatmapPyramid) -> None:
+    for zoom in range(expected.min_zoom, expected.max_zoom + 1):
+        pd.testing.assert_frame_equal(
+            got.cells(zoom=zoom, max_cells=10**6), expected.cells(zoom=zoom, max_cells=10**6)
+        )
+
+
+def _same_streaks(got: StreakBoard, events: pd.DataFrame) -> None:
+    expected = StreakBoard.from_events(events).metrics().sort_values("user_name")
+    pd.testing.assert_frame_equal(
+        got.metrics().sort_values("user_name").reset_index(drop=True),
+        expected.reset_index(drop=True),
+    )
+
+
+def test_rollups_match_raw_events(loaded):
+    events = stats.EventTimeline(loaded.get_all_events())
+    for name, grain in loaded.LEADERBOARD_ROLLUPS.items():
+        rollup = loaded.get_daily_rollups(grain)
+        pd.testing.assert_frame_equal(
+            getattr(stats, name)(rollup),
+            getattr(stats, name)(events),
+            check_dtype=False,
+            check_categorical=False,
+        )
+        assert stats.leaderboard_count(rollup, name) == stats.leaderboard_count(events, name)
+
+    users = loaded.get_daily_rollups("user")
+    assert stats.fun_benchmarks(users) == stats.fun_benchmarks(events)
+    pd.testing.assert_frame_equal(
+        stats.daily_beer_counts(users), stats.daily_beer_counts(events), check_dtype=False
+    )
+    _same_pyramid(loaded.get_rollup_heatmap_pyramid(), HeatmapPyramid.from_events(events.frame))
+    _same_streaks(loaded.get_rollup_streak_board(), events.frame)
+
+    since = events.frame["timestamp_utc"].iloc[-1] - pd.Timedelta(days=30)
+    window = loaded.get_daily_rollups("user", since=since)
+    assert window["timestamp_utc"].iloc[0] == since.normalize()
+    assert window["beer_count"].sum() == events.between(since.normalize()).frame["beer_count"].sum()
+
+
+def test_polls_feed_only_changed_cells(loaded, raw, monkeypatch):
+    board = loaded.get_rollup_streak_board()
+    pyramid = loaded.get_rollup_heatmap_pyramid()
+    polled = []
+
+    def spy(fetch):
+        def recorded(since):
+            polled.append(fetch(since))
+            return polled[-1]
+        return recorded
+
+    for rollup in loaded._rollups.values():
+        monkeypatch.setattr(rollup, "_fetch", spy(rollup._fetch))
+
+    # A log in existing (user, day) and location cells, a new user, and a
+    # log the geocoder places afterwards: two changed cells per grain.
+    last = raw.dropna(subset=["latitude"]).iloc[-1]
+    when = last["timestamp_utc"].to_pydatetime()
+    loaded.insert_event(
+        timestamp_utc=when,
+        user_name=last["user_name"],
+        beer_count=3,
+        latitude=float(last["latitude"]),
+        longitude=float(last["longitude"]),
+    )
+    loaded.insert_event(timestamp_utc=when, user_name="zed", beer_count=2)
+    placed = loaded.insert_event(timestamp_utc=when, user_name="zed", beer_count=1, city="Rome")
+    loaded._apply_coordinates((placed,), 41.9, 12.5)
+
+    assert loaded.get_rollup_streak_board() is board
+    assert loaded.get_rollup_heatmap_pyramid() is pyramid
+    assert [len(changed) for changed in polled] == [2, 2]
+
+    events = loaded.get_all_events()
+    _same_streaks(board, events)
+    _same_pyramid(pyramid, HeatmapPyramid.from_events(events))
+    users = loaded.get_daily_rollups("user")
+    assert users["beer_count"].sum() == events["beer_count"].sum()
+    assert users["timestamp_utc"].is_monotonic_increasing
+
+    # A rebuild starts the views over, from the same totals.
+    loaded.rebuild_daily_rollups()
+    rebuilt = loaded.get_rollup_streak_board()
+    assert rebuilt is not board
+    _same_streaks(rebuilt, events)
@@ -0,0 +1,132 @@
+"""
+The incremental events poll in backend.services: _refresh_events over a
+stand-in for _fetch_events_after, and the real query on Postgres.
+"""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from backend.frames import compact_events
+from benchmarks.synthetic import generate_events
+
+
+class _Table:
+    # beer_events stand-in: rows become visible once committed, and polls
+    # are answered with the same predicate as the real query.
+    def __init__(self, grace: pd.Timedelta):
+        self.grace = grace
+        self.committed: list[pd.DataFrame] = []
+        self.polls = 0
+
+    def commit(self, rows: pd.DataFrame) -> None:
+        self.committed.append(rows)
+
+    def fetch(self, last_id: int, last_poll) -> pd.DataFrame:
+        self.polls += 1
+        df = pd.concat(self.committed, ignore_index=True)
+        if last_poll is not None:
+            since = last_poll - self.grace
+            df = df[(df["event_id"] > last_id) | (df["timestamp_utc"] > since)]
+        df = df.sort_values("timestamp_utc", kind="stable").reset_index(drop=True)
+        return compact_events(df)
+
+
+@pytest.fixture
+def table(services, monkeypatch):
+    table = _Table(services.WATERMARK_GRACE)
+    monkeypatch.setattr(services, "_fetch_events_after", table.fetch)
+    monkeypatch.setattr(services, "ensure_schema", lambda: None)
+    services.reset_event_cache()
+    yield table
+    services.reset_event_cache()
+
+
+@pytest.fixture
+def raw() -> pd.DataFrame:
+    # Older history, then a tail logged within the last minute, i.e.
+    # inside the grace window every poll re-reads.
+    now = pd.Timestamp.now(tz="UTC")
+    df = generate_events(60, seed=2, days=1, end=now - pd.Timedelta(minutes=10))
+    df.loc[50:, "timestamp_utc"] = [now - pd.Timedelta(seconds=5 * (60 - i)) for i in range(50, 60)]
+    return df
+
+
+def test_repeated_polls_add_no_duplicates(services, table, raw):
+    table.commit(raw)
+    board = services.get_streak_board()
+    events, version = services._refresh_events()
+    assert len(events) == len(raw)
+
+    for _ in range(3):
+        events, again = services._refresh_events()
+        assert again == version
+    assert events["event_id"].is_unique
+    assert events["event_id"].tolist() == raw["event_id"].tolist()
+    assert board.metrics()["total_beers"].sum() == raw["beer_count"].sum()
+
+
+def test_late_commit_inside_grace_window_is_picked_up(services, table, raw):
+    # Event 51 got its id before 52 but commits after it.
+    table.commit(raw.iloc[:50])
+    services._refresh_events()
+    table.commit(raw.iloc[51:52])
+    events, _ = services._refresh_events()
+    assert 51 not in events["event_id"].tolist()
+    assert services._events_last_id == 52
+
+    table.commit(raw.iloc[50:51])
+    events, _ = services._refresh_events()
+    assert sorted(events["event_id"]) == list(range(1, 53))
+    assert events["timestamp_utc"].is_monotonic_increasing
+
+
+def test_note_write_invalidates_versioned_events(services, table, raw):
+    table.commit(raw)
+    first, version = services.get_events_versioned()
+    assert services.get_events_versioned()[1] == version
+    assert table.polls == 1
+
+    services._note_write()
+    events, _ = services.get_events_versioned()
+    assert table.polls == 2
+    assert len(events) == len(first)
+
+
+# ---------------------------------------------------------------------
+# Postgres
+# ---------------------------------------------------------------------
+
+def _log(services, user: str) -> int:
+    return services.insert_event(
+        timestamp_utc=pd.Timestamp.now(tz="UTC").to_pydatetime(),
+        user_name=user,
+        beer_count=1,
+    )
+
+
+def test_postgres_poll_picks_up_late_commit(pg_services, pg_engine):
+    for user in ["ana", "ben", "cleo"]:
+        _log(pg_services, user)
+    events, _ = pg_services._refresh_events()
+    assert len(events) == 3
+
+    with pg_engine.connect() as late:
+        trans = late.begin()
+        late_id = late.execute(
+            text(
+                "INSERT INTO beer_events (timestamp_utc, user_name, beer_count) "
+                "VALUES (now(), 'dan', 2) RETURNING event_id"
+            )
+        ).scalar_one()
+        after_id = _log(pg_services, "eve")
+        assert late_id < after_id
+
+        events, _ = pg_services._refresh_events()
+        assert late_id not in events["event_id"].tolist()
+        trans.commit()
+
+    events, version = pg_services._refresh_events()
+    assert sorted(events["event_id"]) == [1, 2, 3, late_id, after_id]
+    assert pg_services._refresh_events()[1] == version
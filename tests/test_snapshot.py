@@ -0,0 +1,55 @@
+"""
+Parquet snapshots: restores are exact, reads for the stats pages compact.
+"""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from backend.bootstrap import import_snapshot
+from backend.db import SQLiteStore
+from backend.snapshot import iter_snapshot_batches, read_snapshot, write_snapshot
+from benchmarks.synthetic import generate_events
+
+
+@pytest.fixture
+def raw() -> pd.DataFrame:
+    df = generate_events(200, seed=3, days=90)
+    df.loc[0, ["latitude", "longitude"]] = [40.7128, -74.0060]
+    return df
+
+
+@pytest.mark.parametrize("partition_by_month", [False, True])
+def test_restore_keeps_exact_coordinates(raw, tmp_path, partition_by_month):
+    path = str(tmp_path / "events.parquet")
+    assert write_snapshot([raw.copy()], path, partition_by_month=partition_by_month) == len(raw)
+
+    restored = pd.concat(list(iter_snapshot_batches(path, batch_size=64)), ignore_index=True)
+    restored = restored.sort_values("event_id").reset_index(drop=True)
+    for col in ["latitude", "longitude"]:
+        assert restored[col].dtype == "float64"
+        pd.testing.assert_series_equal(restored[col], raw[col])
+
+
+def test_import_snapshot_round_trips(raw, tmp_path):
+    path = str(tmp_path / "events.parquet")
+    write_snapshot([raw.copy()], path)
+    store = SQLiteStore(tmp_path / "events.db")
+    try:
+        import_snapshot(path, target="sqlite", store=store)
+        stored = store.query(
+            "SELECT latitude, longitude FROM drink_events WHERE event_id = :id",
+            {"id": str(raw["event_id"].iloc[0])},
+        )
+    finally:
+        store.close()
+    assert stored.iloc[0].tolist() == [40.7128, -74.0060]
+
+
+def test_read_snapshot_is_compact(raw, tmp_path):
+    path = str(tmp_path / "events.parquet")
+    write_snapshot([raw.copy()], path)
+    events = read_snapshot(path)
+    assert events["latitude"].dtype == "float32"
+    assert events["timestamp_utc"].is_monotonic_increasing
+    assert len(events) == len(raw)
@@ -0,0 +1,186 @@
+"""
+backend.sql_stats against backend.stats on the same synthetic events.
+
+Both engines must return the same frames, counts and keyset pages, so
+the stats pages look the same whichever engine serves them. The SQL side
+runs on a SQLiteStore and, when BEER_TRACKER_TEST_DATABASE_URL is set,
+on Postgres (COLLATE "C", AT TIME ZONE, EXTRACT(EPOCH ...)).
+"""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from backend import sql_stats, stats
+from backend.db import EVENT_COLUMNS, SQLiteStore, frame_rows
+from benchmarks.synthetic import generate_events
+
+
+N_EVENTS = 3000
+LEADERBOARDS = list(sql_stats._LEADERBOARDS)
+PAGE_SIZES = [1, 7]
+
+# Names whose codepoint order differs from a case- or locale-aware one.
+ODD_NAMES = ["Bob", "bob", "_x", "a b", "a_b", "Zed", "éva"]
+
+
+@pytest.fixture(scope="module")
+def raw() -> pd.DataFrame:
+    df = generate_events(N_EVENTS, seed=11, days=120)
+    odd = df.index % 10 == 0
+    df.loc[odd, "user_name"] = [ODD_NAMES[i % len(ODD_NAMES)] for i in range(odd.sum())]
+    # A few long sessions so the bender list is not empty.
+    df.loc[df.index % 13 == 0, "beer_count"] = 9
+    return df
+
+
+@pytest.fixture(scope="module")
+def store(raw, tmp_path_factory) -> SQLiteStore:
+    store = SQLiteStore(tmp_path_factory.mktemp("sql_stats") / "events.db")
+    store.insert_batches([frame_rows(raw)])
+    yield store
+    store.close()
+
+
+@pytest.fixture(scope="module")
+def postgres(raw, services, pg_engine):
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(services, "_engine", pg_engine)
+        mp.setattr(services, "_schema_ready", False)
+        services.ensure_schema()
+    raw[EVENT_COLUMNS].to_sql("beer_events", pg_engine, if_exists="append", index=False)
+    return pg_engine
+
+
+@pytest.fixture(scope="module", params=["sqlite", "postgres"])
+def source(request):
+    return request.getfixturevalue("store" if request.param == "sqlite" else "postgres")
+
+
+@pytest.fixture(scope="module")
+def events(store) -> pd.DataFrame:
+    return store.fetch_events()
+
+
+@pytest.fixture(scope="module")
+def since(events) -> pd.Timestamp:
+    return events["timestamp_utc"].iloc[-1] - pd.Timedelta(days=30)
+
+
+def _walk(fetch, page_size: int) -> pd.DataFrame:
+    # Every page of a keyset-paginated table, concatenated.
+    pages, cursor = [], None
+    while True:
+        page = fetch(limit=page_size, after=cursor)
+        if page.empty:
+            break
+        assert len(page) <= page_size
+        pages.append(page)
+        cursor = stats.page_cursor(page)
+    return pd.concat(pages, ignore_index=True)
+
+
+@pytest.mark.parametrize("name", LEADERBOARDS)
+def test_leaderboard_matches(source, events, name):
+    expected = getattr(stats, name)(events)
+    pd.testing.assert_frame_equal(getattr(sql_stats, name)(source), expected)
+    assert sql_stats.leaderboard_count(source, name) == len(expected)
+
+
+@pytest.mark.parametrize("name", LEADERBOARDS)
+def test_leaderboard_since_matches(source, events, since, name):
+    window = stats.EventTimeline(events).since(since)
+    expected = getattr(stats, name)(window).reset_index(drop=True)
+    pd.testing.assert_frame_equal(getattr(sql_stats, name)(source, since=since), expected)
+    assert sql_stats.leaderboard_count(source, name, since=since) == len(expected)
+
+
+def test_window_bounds_on_an_event(source, events):
+    # Both bounds fall exactly on logged events: since is inclusive and
+    # until exclusive, as in EventTimeline.between().
+    start, end = events["timestamp_utc"].iloc[[1000, 2000]]
+    window = stats.EventTimeline(events).between(start, end)
+    assert window.frame["timestamp_utc"].iloc[0] == start
+    assert window.frame["timestamp_utc"].iloc[-1] < end
+
+    for name in LEADERBOARDS:
+        expected = getattr(stats, name)(window).reset_index(drop=True)
+        got = getattr(sql_stats, name)(source, since=start, until=end)
+        pd.testing.assert_frame_equal(got, expected)
+    assert sql_stats.fun_benchmarks(source, since=start, until=end) == stats.fun_benchmarks(window)
+
+
+@pytest.mark.parametrize("name", LEADERBOARDS)
+@pytest.mark.parametrize("page_size", PAGE_SIZES)
+def test_leaderboard_pages_match(source, events, name, page_size):
+    full = getattr(stats, name)(events)
+    pd.testing.assert_frame_equal(
+        _walk(lambda **page: getattr(sql_stats, name)(source, **page), page_size), full
+    )
+    pd.testing.assert_frame_equal(
+        _walk(lambda **page: getattr(stats, name)(events, **page), page_size), full
+    )
+
+
+def test_fun_benchmarks_match(source, events, since):
+    assert sql_stats.fun_benchmarks(source) == stats.fun_benchmarks(events)
+    window = stats.EventTimeline(events).since(since)
+    assert sql_stats.fun_benchmarks(source, since=since) == stats.fun_benchmarks(window)
+
+
+def test_dominance_stats_match(source, events):
+    assert sql_stats.dominance_stats(source) == pytest.approx(stats.dominance_stats(events))
+
+
+def test_bender_stats_match(source, events):
+    expected = stats.bender_stats(events)
+    got = sql_stats.bender_stats(source)
+    assert len(got) > 0
+    pd.testing.assert_frame_equal(
+        got, expected.assign(user_name=expected["user_name"].astype(str)), check_dtype=False
+    )
+    assert sql_stats.bender_count(source) == stats.bender_count(events) == len(got)
+
+
+def test_bender_pages_match(source):
+    full = sql_stats.bender_stats(source)
+    pd.testing.assert_frame_equal(
+        _walk(lambda **page: sql_stats.bender_stats(source, **page), 5), full
+    )
+
+
+def test_run_queries_matches_serial(source):
+    queries = {
+        name: (lambda fn=getattr(sql_stats, name): fn(source, limit=10)) for name in LEADERBOARDS
+    }
+    run = sql_stats.run_queries(queries, max_workers=2)
+    assert run.workers == 2
+    assert set(run.results) == set(run.timings_ms) == set(LEADERBOARDS)
+    for name, query in queries.items():
+        pd.testing.assert_frame_equal(run.results[name], query())
+
+
+def test_run_queries_reuses_its_threads(store):
+    # Reruns share one pool, so the store holds at most one connection
+    # per pool thread (plus this thread's), however many runs there are.
+    queries = {name: (lambda fn=getattr(sql_stats, name): fn(store)) for name in LEADERBOARDS}
+    for _ in range(5):
+        sql_stats.run_queries(queries, max_workers=3)
+    assert sql_stats._pool(3) is sql_stats._pool(3)
+    threads = sum(len(pool._threads) for pool in sql_stats._pools.values())
+    assert len(store._connections) <= threads + 1
+
+
+def test_run_queries_raises_after_every_query_finishes():
+    finished = []
+
+    def fail():
+        raise ValueError("boom")
+
+    def slow():
+        finished.append(True)
+        return 1
+
+    with pytest.raises(ValueError, match="boom"):
+        sql_stats.run_queries({"fail": fail, "slow": slow}, max_workers=2)
+    assert finished == [True]
@@ -0,0 +1,68 @@
+"""
+StreakBoard built in one go and fed incrementally must agree.
+"""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from backend.streaks import METRIC_COLUMNS, StreakBoard
+from benchmarks.synthetic import generate_events
+
+
+TODAY = pd.Timestamp("2025-06-30 12:00", tz="UTC")
+
+
+def _log(user: str, day: str, beers: int = 1) -> dict:
+    return {"user_name": user, "timestamp_utc": pd.Timestamp(day, tz="UTC"), "beer_count": beers}
+
+
+def _metrics(board: StreakBoard) -> pd.DataFrame:
+    return board.metrics(today=TODAY).sort_values("user_name").reset_index(drop=True)
+
+
+@pytest.fixture
+def history() -> pd.DataFrame:
+    return generate_events(2000, seed=8, days=90, end=TODAY)[["user_name", "timestamp_utc", "beer_count"]]
+
+
+@pytest.mark.parametrize("newest_first", [False, True])
+def test_add_in_batches_matches_from_events(history, newest_first):
+    # Newest-first batches make the board grow to the left too.
+    starts = list(range(0, len(history), 137))
+    board = StreakBoard()
+    for start in reversed(starts) if newest_first else starts:
+        board.add(history.iloc[start:start + 137])
+    pd.testing.assert_frame_equal(_metrics(board), _metrics(StreakBoard.from_events(history)))
+
+
+def test_add_new_user_and_streak_extension_matches_from_events():
+    history = pd.DataFrame(
+        [
+            _log("ana", "2025-06-26 20:00"),
+            _log("ana", "2025-06-27 21:00", 2),
+            # One idle day, then a run that the new logs below extend.
+            _log("ana", "2025-06-29 19:00"),
+            _log("ben", "2025-06-20 18:00", 3),
+            _log("ben", "2025-06-21 18:00"),
+        ]
+    )
+    new = pd.DataFrame(
+        [
+            # Bridges ana's idle day: 26th to 30th becomes one 5-day run.
+            _log("ana", "2025-06-28 22:00"),
+            _log("ana", "2025-06-30 08:00", 4),
+            _log("cleo", "2025-06-30 09:00", 2),
+        ]
+    )
+
+    board = StreakBoard.from_events(history)
+    board.add(new)
+    expected = StreakBoard.from_events(pd.concat([history, new], ignore_index=True))
+
+    got = _metrics(board)
+    pd.testing.assert_frame_equal(got, _metrics(expected))
+    assert list(got.columns) == METRIC_COLUMNS
+    ana = got.set_index("user_name").loc["ana"]
+    assert (ana["current_streak"], ana["longest_streak"]) == (5, 5)
+    assert got.set_index("user_name").loc["cleo", "total_beers"] == 2
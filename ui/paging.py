@@ -0,0 +1,66 @@
+"""
+Keyset-paginated tables for the stats pages.
+
+A table is fetched PAGE_SIZE rows at a time. Each page after the first
+starts after the sort key of the previous page's last row (see
+backend.stats.page_cursor), so a deep page costs the same as the first
+and rows logged meanwhile never shift it. The browser only receives the
+rows on screen; the exact row count is passed in separately.
+"""
+from __future__ import annotations
+
+from typing import Callable, Optional
+import os
+
+import pandas as pd
+import streamlit as st
+
+from backend.stats import page_cursor
+
+
+PAGE_SIZE = int(os.environ.get("BEER_TRACKER_PAGE_SIZE", "25"))
+
+# after-cursor -> the next PAGE_SIZE rows
+Fetch = Callable[[Optional[tuple]], pd.DataFrame]
+
+
+def render_paged_table(
+    key: str,
+    fetch: Fetch,
+    total: int,
+    first_page: Optional[pd.DataFrame] = None,
+    empty_message: Optional[str] = None,
+) -> None:
+    """
+    Show one page of a ranked table with Previous / Next buttons. The
+    cursors of the pages walked so far live in st.session_state under
+    `key`. `first_page`, when already loaded, saves the first fetch.
+    """
+    cursors = st.session_state.setdefault(f"{key}_cursors", [None])
+    after = cursors[-1]
+    page = first_page if after is None and first_page is not None else fetch(after)
+
+    if page.empty and len(cursors) > 1:
+        # The rows behind the cursor are gone; start over.
+        cursors[:] = [None]
+        page = first_page if first_page is not None else fetch(None)
+
+    if page.empty:
+        st.info(empty_message or "Nothing here yet.")
+        return
+
+    start = (len(cursors) - 1) * PAGE_SIZE
+    shown = page.set_axis(pd.RangeIndex(start + 1, start + len(page) + 1), axis=0)
+    st.dataframe(shown, use_container_width=True)
+
+    previous, caption, following = st.columns([1, 4, 1])
+    with caption:
+        st.caption(f"{start + 1:,}-{start + len(page):,} of {total:,}")
+    with previous:
+        if st.button("Previous", key=f"{key}_previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with following:
+        if st.button("Next", key=f"{key}_next", disabled=start + len(page) >= total):
+            cursors.append(page_cursor(page))
+            st.rerun()